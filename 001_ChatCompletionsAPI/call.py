@@ -1,6 +1,7 @@
 # Importando las bibliotecas necesarias para el funcionamiento del script.
 import os
 from openai import AzureOpenAI
+from common.rate_limit import rate_limited_http_client # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 from dotenv import load_dotenv
 
 # Creando un cliente para interactuar con la API de Azure OpenAI.
@@ -10,7 +11,8 @@ load_dotenv() # Carga las variables de entorno desde un archivo .env. Es una bue
 client = AzureOpenAI(
   azure_endpoint = os.getenv("OPENAI_API_BASE"), # Obtiene la URL del endpoint de Azure desde las variables de entorno.
   api_key=os.getenv("OPENAI_API_KEY"),          # Obtiene la clave de la API desde las variables de entorno para autenticación.
-  api_version="2024-02-15-preview"              # Especifica la versión de la API de OpenAI que se va a utilizar.
+  api_version="2024-02-15-preview",             # Especifica la versión de la API de OpenAI que se va a utilizar.
+  http_client=rate_limited_http_client()        # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
 )
 
 # Enviando una solicitud al modelo de Azure OpenAI para obtener una respuesta.
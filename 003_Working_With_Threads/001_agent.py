@@ -1,6 +1,7 @@
 # Importando las bibliotecas necesarias.
 import os, time
 from azure.ai.projects import AIProjectClient
+from common.rate_limit import azure_pipeline_kwargs # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 from azure.identity import DefaultAzureCredential
 from azure.ai.projects.models import MessageTextContent
 from dotenv import load_dotenv
@@ -13,7 +14,8 @@ load_dotenv()
 # La autenticación se maneja con las credenciales predeterminadas de Azure.
 project_client = AIProjectClient.from_connection_string(
     credential=DefaultAzureCredential(),
-    conn_str=os.getenv("PROJECT_CONNECTION_STRING") # Obtiene la cadena de conexión de las variables de entorno.
+    conn_str=os.getenv("PROJECT_CONNECTION_STRING"), # Obtiene la cadena de conexión de las variables de entorno.
+    **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
 )
 
 # Obtiene el nombre del despliegue del modelo desde las variables de entorno.
@@ -5,6 +5,7 @@ import json
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 from azure.ai.projects import AIProjectClient
+from common.rate_limit import azure_pipeline_kwargs # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
 
@@ -43,7 +44,8 @@ class ProductionAssistant:
         """Crea un nuevo cliente para cada operación"""
         return AIProjectClient.from_connection_string(
             credential=DefaultAzureCredential(),
-            conn_str=self.connection_string
+            conn_str=self.connection_string,
+            **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
         )
     
     def _verify_agent(self):
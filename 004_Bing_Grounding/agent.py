@@ -1,9 +1,12 @@
 # Importando las bibliotecas necesarias.
 import os
 from azure.ai.projects import AIProjectClient
+from common.rate_limit import azure_pipeline_kwargs # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 from azure.identity import DefaultAzureCredential
-from azure.ai.projects.models import BingGroundingTool # Importa la clase específica para la herramienta de búsqueda de Bing.
+from azure.ai.projects.models import BingGroundingTool, MessageRole # Herramienta de búsqueda de Bing y roles de los mensajes.
 from dotenv import load_dotenv
+from common.connections import ConnectionResolver # Resuelve conexiones del proyecto con caché.
+from common.grounding_cache import GroundingCache, url_citations # Caché de respuestas con caducidad según el tipo de consulta.
 
 # Carga las variables de entorno desde un archivo .env.
 load_dotenv()
@@ -11,7 +14,8 @@ load_dotenv()
 # Crea el cliente principal para interactuar con el proyecto de IA de Azure.
 project_client = AIProjectClient.from_connection_string(
     credential=DefaultAzureCredential(),
-    conn_str=os.getenv("PROJECT_CONNECTION_STRING")
+    conn_str=os.getenv("PROJECT_CONNECTION_STRING"),
+    **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
 )
 
 # Obtiene el nombre del despliegue del modelo desde las variables de entorno.
@@ -20,16 +24,25 @@ model=os.getenv("MODEL_DEPLOYMENT_NAME")
 # Obtiene el nombre de la conexión de Bing que ha sido preconfigurada en tu proyecto de Azure AI.
 bing_connection_name = os.getenv("BING_CONNECTION_NAME")
 
-# Obtiene el objeto de conexión de Bing usando el cliente del proyecto y el nombre de la conexión.
-bing_connection = project_client.connections.get(connection_name=bing_connection_name)
+# Obtiene la conexión de Bing a través del resolvedor con caché.
+# Solo la primera ejecución consulta el servicio; las siguientes leen la caché en memoria o en disco.
+resolver = ConnectionResolver(project_client, scope=os.getenv("PROJECT_CONNECTION_STRING"))
+bing_connection = resolver.get_by_name(bing_connection_name)
 # Extrae el ID de la conexión, que es necesario para inicializar la herramienta.
 conn_id = bing_connection.id
 
 # Inicializa la herramienta de búsqueda de Bing (BingGroundingTool) con el ID de la conexión.
 bing = BingGroundingTool(connection_id=conn_id)
 
-# El bloque 'with' asegura que el cliente se cierre correctamente al finalizar.
-with project_client:
+# Caché de respuestas con grounding: guarda la respuesta y las URLs citadas por consulta.
+# Una pregunta sobre el clima caduca en minutos; una de datos de referencia, en días. Si la entrada
+# caducó hace poco se muestra igualmente y se refresca en segundo plano.
+grounding_cache = GroundingCache(scope=model)
+query = "¿cuál es el clima en Guayaquil - Ecuador ahora?" # La pregunta del usuario.
+
+
+def search_with_bing(query: str):
+    """Ejecuta la consulta con un agente con grounding de Bing y devuelve (respuesta, URLs citadas)."""
     # Crea un agente (asistente) y le proporciona la herramienta de búsqueda de Bing.
     agent = project_client.agents.create_agent(
         model=model,
@@ -38,41 +51,59 @@ with project_client:
         tools=bing.definitions, # Aquí se le asigna la herramienta de Bing al agente para que pueda realizar búsquedas.
         headers={"x-ms-enable-preview": "true"}, # Cabecera necesaria para usar funcionalidades en vista previa.
     )
-
     print(f"Agente creado, ID: {agent.id}")
 
-    # Crea un hilo de conversación (thread) para la comunicación.
-    thread = project_client.agents.create_thread()
-    print(f"Hilo creado, ID: {thread.id}")
+    try:
+        # Crea un hilo de conversación (thread) para la comunicación.
+        thread = project_client.agents.create_thread()
+        print(f"Hilo creado, ID: {thread.id}")
 
-    # Crea y añade un mensaje del usuario al hilo.
-    message = project_client.agents.create_message(
-        thread_id=thread.id,
-        role="user",
-        content="¿cuál es el clima en Guayaquil - Ecuador ahora?", # La pregunta del usuario.
-    )
-    print(f"Mensaje creado, ID: {message.id}")
+        # Crea y añade un mensaje del usuario al hilo.
+        message = project_client.agents.create_message(
+            thread_id=thread.id,
+            role="user",
+            content=query,
+        )
+        print(f"Mensaje creado, ID: {message.id}")
+
+        # Inicia y procesa una ejecución del agente en el hilo.
+        # Esta función espera a que el agente use sus herramientas (si es necesario) y complete la respuesta.
+        run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
+        print(f"Ejecución finalizada con estado: {run.status}")
 
-    # Inicia y procesa una ejecución del agente en el hilo.
-    # Esta función espera a que el agente use sus herramientas (si es necesario) y complete la respuesta.
-    run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
-    print(f"Ejecución finalizada con estado: {run.status}")
+        # Manejo básico de errores por si la ejecución no termina bien.
+        # Se lanza una excepción para que una respuesta fallida no se guarde en la caché: si la ejecución
+        # se canceló, caducó o quedó incompleta, el último mensaje del hilo es la propia pregunta.
+        if run.status != "completed":
+            raise RuntimeError(f"La ejecución terminó con estado '{run.status}': {run.last_error}")
 
-    # Manejo básico de errores por si la ejecución falla.
-    if run.status == "failed":
-        print(f"La ejecución falló: {run.last_error}")
+        # Obtiene todos los mensajes del hilo después de que la ejecución haya finalizado.
+        messages = project_client.agents.list_messages(thread_id=thread.id)
+        # El último mensaje del agente contiene la respuesta de texto y, en sus "anotaciones",
+        # las URLs de las fuentes que utilizó.
+        answer = messages.get_last_text_message_by_role(MessageRole.AGENT)
+        if answer is None:
+            raise RuntimeError("El agente no devolvió ninguna respuesta de texto")
+        return answer.text.value, url_citations(messages.get_last_message_by_role(MessageRole.AGENT))
+    finally:
+        # Se elimina el agente aunque la ejecución falle, para no dejar uno huérfano por cada
+        # búsqueda (o refresco en segundo plano) que no está en la caché.
+        project_client.agents.delete_agent(agent.id)
+        print("Agente eliminado")
+
+
+# El bloque 'with' asegura que el cliente se cierre correctamente al finalizar.
+with project_client:
+    # Solo se crea el agente cuando la respuesta no está en la caché (o ha caducado del todo).
+    result = grounding_cache.get_or_fetch(query, fetch=search_with_bing)
+    print(f"Respuesta [{result.source}, clase '{result.query_class}', antigüedad {result.age_seconds:.0f}s]:")
 
-    # Obtiene todos los mensajes del hilo después de que la ejecución haya finalizado.
-    messages = project_client.agents.list_messages(thread_id=thread.id)
-    
     # Mostrando la respuesta del asistente.
-    # El mensaje más reciente (índice 0) contiene la respuesta de texto del asistente.
-    print(messages.data[0].content[0].text.value)
-    
-    # Mostrando la citación de la URL.
-    # La respuesta del agente puede incluir "anotaciones" con las fuentes que utilizó.
-    content = messages['data'][0]['content'][0]['text']['annotations']
-    # Itera a través de las anotaciones para extraer y mostrar las URLs de las fuentes.
-    for annotation in content:
-        url_citation = annotation['url_citation']['url']
-        print(f"Fuente (URL): {url_citation}")
\ No newline at end of file
+    print(result.answer)
+
+    # Mostrando la citación de las URLs.
+    for url_citation in result.citations:
+        print(f"Fuente (URL): {url_citation}")
+
+    # Si la respuesta se sirvió caducada, se espera al refresco en segundo plano antes de cerrar el cliente.
+    grounding_cache.wait_for_refreshes()
@@ -1,6 +1,7 @@
 # Importando las bibliotecas necesarias.
 import os
 from azure.ai.projects import AIProjectClient
+from common.rate_limit import azure_pipeline_kwargs # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 from azure.identity import DefaultAzureCredential
 # Importa clases para definir herramientas que el agente puede usar.
 from azure.ai.projects.models import FunctionTool, ToolSet
@@ -19,6 +20,7 @@ project_connection_string = os.getenv("PROJECT_CONNECTION_STRING")
 project_client = AIProjectClient.from_connection_string(
     credential=DefaultAzureCredential(),
     conn_str=project_connection_string,
+    **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
 )
 
 # El bloque 'with' asegura que el cliente se cierre correctamente al finalizar.
@@ -1,6 +1,7 @@
 import os
 import jsonref # Una biblioteca para cargar archivos JSON que pueden contener referencias internas.
 from azure.ai.projects import AIProjectClient
+from common.rate_limit import azure_pipeline_kwargs # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 from azure.identity import DefaultAzureCredential
 # Importa clases para definir herramientas basadas en una especificación OpenAPI.
 from azure.ai.projects.models import OpenApiTool, OpenApiAnonymousAuthDetails
@@ -15,6 +16,7 @@ model=os.getenv("MODEL_DEPLOYMENT_NAME")
 project_client = AIProjectClient.from_connection_string(
     credential=DefaultAzureCredential(),
     conn_str=project_connection_string,
+    **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
 )
 # [INICIO create_agent_with_openapi]
 
@@ -3,6 +3,7 @@ import json
 import requests
 import openai
 from openai import AzureOpenAI # El cliente específico para interactuar con Azure OpenAI.
+from common.rate_limit import rate_limited_http_client # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 import os # Para interactuar con el sistema operativo y leer variables de entorno.
 from dotenv import load_dotenv # Para cargar variables desde un archivo .env.
 
@@ -16,7 +17,8 @@ deployment_name = os.getenv('get_embed_model')
 client = AzureOpenAI(
   api_key = os.getenv("get_oai_key"),      # Obtiene la clave de la API para la autenticación.
   api_version = "2024-02-15-preview",      # Especifica la versión de la API que se va a utilizar.
-  azure_endpoint =os.getenv("get_oai_base") # Obtiene la URL del endpoint de tu servicio en Azure.
+  azure_endpoint =os.getenv("get_oai_base"), # Obtiene la URL del endpoint de tu servicio en Azure.
+  http_client=rate_limited_http_client() # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
 )
 
 # Este es el texto de entrada que queremos convertir en un embedding.
@@ -1,91 +1,143 @@
 # Importando las bibliotecas y utilidades necesarias.
-import os
+import os, time
 from azure.ai.projects import AIProjectClient
+from common.rate_limit import azure_pipeline_kwargs # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 from azure.identity import DefaultAzureCredential
 # Importa la clase para la herramienta de Azure AI Search y los tipos de conexión.
 from azure.ai.projects.models import AzureAISearchTool, ConnectionType
+# Importa las clases para usar la búsqueda local como una función del agente.
+from azure.ai.projects.models import FunctionTool, ToolSet
 from dotenv import load_dotenv
+from common.connections import ConnectionResolver # Resuelve conexiones del proyecto con caché.
+from local_search import local_index_available, search_functions # Búsqueda BM25 local sobre los folletos.
+from semantic_cache import SemanticCache # Caché semántica de respuestas ya generadas.
 
 
 # Carga las variables de entorno desde un archivo .env.
 load_dotenv()
-project_connection_string = os.getenv("PROJECT_CONNECTION_STRING")
-model = os.getenv("MODEL_DEPLOYMENT_NAME")
-# El nombre del índice específico dentro de tu servicio de Azure AI Search que el agente consultará.
-index_name=os.getenv("AI_SEARCH_INDEX_NAME")
-
-# Crea el cliente principal para interactuar con el proyecto de IA de Azure.
-project_client = AIProjectClient.from_connection_string(
-    credential=DefaultAzureCredential(),
-    conn_str=project_connection_string,
-)
-
-# [INICIO create_agent_with_azure_ai_search_tool]
-# Busca en la lista de conexiones del proyecto para encontrar la que corresponde a Azure AI Search.
-conn_list = project_client.connections.list()
-conn_id = ""
-for conn in conn_list:
-    # Comprueba si el tipo de conexión es el de Azure AI Search.
-    if conn.connection_type == ConnectionType.AZURE_AI_SEARCH:
-        # Guarda el ID de la conexión cuando la encuentra.
-        conn_id = conn.id
-        break
-
-print(f"ID de la conexión encontrada: {conn_id}")
-
-# Inicializa la herramienta de Azure AI Search.
-# Se le pasa el ID de la conexión y el nombre del índice para que sepa dónde buscar.
-ai_search = AzureAISearchTool(index_connection_id=conn_id, index_name=index_name)
-
-# El bloque 'with' asegura que el cliente se cierre correctamente al finalizar.
-with project_client:
-    # Crea un agente y le proporciona la herramienta de Azure AI Search.
-    agent = project_client.agents.create_agent(
-        model=model,
-        name="ai-search-assistant",
-        instructions="Eres un asistente útil",
-        tools=ai_search.definitions, # Define las capacidades de la herramienta.
-        tool_resources=ai_search.resources, # Proporciona los recursos necesarios para que la herramienta funcione (ej. la conexión).
-        headers={"x-ms-enable-preview": "true"}, # Cabecera para funcionalidades en vista previa.
-    )
-    # [FIN create_agent_with_azure_ai_search_tool]
-    print(f"Agente creado, ID: {agent.id}")
-
-    # Crea un hilo de conversación para la comunicación.
-    thread = project_client.agents.create_thread()
-    print(f"Hilo creado, ID: {thread.id}")
-
-    # Crea y añade un mensaje del usuario al hilo.
-    message = project_client.agents.create_message(
-        thread_id=thread.id,
-        role="user",
-        content="¿cuáles son los hoteles que ofrece Margie's Travel en Las Vegas?",
+
+
+def main():
+    """Responde la pregunta con el agente de búsqueda, o desde la caché semántica si ya se respondió una equivalente."""
+    project_connection_string = os.getenv("PROJECT_CONNECTION_STRING")
+    model = os.getenv("MODEL_DEPLOYMENT_NAME")
+    # El nombre del índice específico dentro de tu servicio de Azure AI Search que el agente consultará.
+    index_name=os.getenv("AI_SEARCH_INDEX_NAME")
+
+    # La pregunta del usuario.
+    question = "¿cuáles son los hoteles que ofrece Margie's Travel en Las Vegas?"
+
+    # Antes de crear el agente se consulta la caché semántica: si ya se respondió una pregunta
+    # equivalente (aunque esté redactada de otra forma), se devuelve esa respuesta directamente.
+    semantic_cache = SemanticCache()
+    cached = semantic_cache.lookup(question)
+    if cached is not None:
+        print(f"Respuesta desde la caché (similitud {cached.similarity:.3f}, ~{cached.latency_saved:.1f}s ahorrados):")
+        print(cached.answer)
+        for url in cached.citations:
+            print(f"URL de la fuente: {url}")
+        print(f"Estadísticas de la caché: {semantic_cache.stats.as_dict()}")
+        return
+
+    # Crea el cliente principal para interactuar con el proyecto de IA de Azure.
+    project_client = AIProjectClient.from_connection_string(
+        credential=DefaultAzureCredential(),
+        conn_str=project_connection_string,
+        **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
     )
-    print(f"Mensaje creado, ID: {message.id}")
-
-    # Inicia y procesa una ejecución del agente.
-    # El agente usará la herramienta de búsqueda para consultar el índice y encontrar la respuesta.
-    run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
-    print(f"Ejecución finalizada con estado: {run.status}")
-
-    # Manejo de errores.
-    if run.status == "failed":
-        print(f"La ejecución falló: {run.last_error}")
-
-    # Elimina el asistente una vez que hemos terminado. Es una buena práctica para limpiar recursos.
-    project_client.agents.delete_agent(agent.id)
-    print("Agente eliminado")
-
-    # Obtiene todos los mensajes del hilo.
-    messages = project_client.agents.list_messages(thread_id=thread.id)
-    print(f"Mensajes: {messages}")
-    print("\n")
-    
-    # Imprime la respuesta del asistente, que se basa en los datos encontrados en el índice de búsqueda.
-    print(f"Respuesta del Asistente: {messages.data[0].content[0].text.value}")
-    print("\n")
-    
-    # Mostrando la citación de la URL - ¡la citación de URL no funciona muy bien por ahora!
-    content = messages['data'][0]['content'][0]
-    url_citation = content['text']['annotations'][0]['url_citation']['url']
-    print(f"URL de la fuente: {url_citation}")
\ No newline at end of file
+
+    # [INICIO create_agent_with_azure_ai_search_tool]
+    # Conjunto de herramientas del agente.
+    toolset = ToolSet()
+    instructions = "Eres un asistente útil"
+
+    # Si existe un índice local (generado con 'ingest.py'), el agente busca primero en él:
+    # la búsqueda BM25 local responde en milisegundos, sin pasar por la red.
+    if local_index_available():
+        toolset.add(FunctionTool(search_functions))
+        instructions = ("Eres un asistente útil. Para preguntas sobre Margie's Travel usa primero la función "
+                        "'search_margies_travel'; usa Azure AI Search solo si esa función no devuelve resultados.")
+        print("Índice local disponible: el agente usará la búsqueda local")
+
+    # La herramienta remota de Azure AI Search queda como respaldo cuando hay un índice configurado.
+    if index_name:
+        # Busca la conexión del proyecto que corresponde a Azure AI Search.
+        # El resolvedor guarda el resultado en memoria y en disco, así que solo la primera
+        # ejecución recorre la lista de conexiones del servicio.
+        resolver = ConnectionResolver(project_client, scope=project_connection_string)
+        conn_id = resolver.get_by_type(ConnectionType.AZURE_AI_SEARCH).id
+
+        print(f"ID de la conexión encontrada: {conn_id}")
+
+        # Inicializa la herramienta de Azure AI Search.
+        # Se le pasa el ID de la conexión y el nombre del índice para que sepa dónde buscar.
+        ai_search = AzureAISearchTool(index_connection_id=conn_id, index_name=index_name)
+        toolset.add(ai_search)
+
+    # El bloque 'with' asegura que el cliente se cierre correctamente al finalizar.
+    with project_client:
+        # Crea un agente y le proporciona el conjunto de herramientas de búsqueda.
+        # El toolset incluye tanto las definiciones como los recursos (ej. la conexión) de cada herramienta.
+        agent = project_client.agents.create_agent(
+            model=model,
+            name="ai-search-assistant",
+            instructions=instructions,
+            toolset=toolset, # Asigna la búsqueda local y/o la herramienta de Azure AI Search.
+            headers={"x-ms-enable-preview": "true"}, # Cabecera para funcionalidades en vista previa.
+        )
+        # [FIN create_agent_with_azure_ai_search_tool]
+        print(f"Agente creado, ID: {agent.id}")
+
+        # Crea un hilo de conversación para la comunicación.
+        thread = project_client.agents.create_thread()
+        print(f"Hilo creado, ID: {thread.id}")
+
+        # Crea y añade un mensaje del usuario al hilo.
+        message = project_client.agents.create_message(
+            thread_id=thread.id,
+            role="user",
+            content=question,
+        )
+        print(f"Mensaje creado, ID: {message.id}")
+
+        # Inicia y procesa una ejecución del agente.
+        # El agente usará la herramienta de búsqueda para consultar el índice y encontrar la respuesta.
+        start = time.perf_counter()
+        run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
+        latency = time.perf_counter() - start
+        print(f"Ejecución finalizada con estado: {run.status}")
+
+        # Manejo de errores.
+        if run.status == "failed":
+            print(f"La ejecución falló: {run.last_error}")
+
+        # Elimina el asistente una vez que hemos terminado. Es una buena práctica para limpiar recursos.
+        project_client.agents.delete_agent(agent.id)
+        print("Agente eliminado")
+
+        # Obtiene todos los mensajes del hilo.
+        messages = project_client.agents.list_messages(thread_id=thread.id)
+        print(f"Mensajes: {messages}")
+        print("\n")
+
+        # Imprime la respuesta del asistente, que se basa en los datos encontrados en el índice de búsqueda.
+        print(f"Respuesta del Asistente: {messages.data[0].content[0].text.value}")
+        print("\n")
+
+        # Mostrando la citación de la URL - ¡la citación de URL no funciona muy bien por ahora!
+        # Las respuestas obtenidas desde el índice local no incluyen anotaciones.
+        content = messages['data'][0]['content'][0]
+        annotations = content['text']['annotations']
+        if annotations:
+            url_citation = annotations[0]['url_citation']['url']
+            print(f"URL de la fuente: {url_citation}")
+
+        # Guarda la respuesta y sus citas en la caché semántica para las próximas preguntas equivalentes.
+        if run.status == "completed":
+            citations = [annotation['url_citation']['url'] for annotation in annotations if 'url_citation' in annotation]
+            semantic_cache.store(question, messages.data[0].content[0].text.value, citations, latency)
+            print(f"Estadísticas de la caché: {semantic_cache.stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
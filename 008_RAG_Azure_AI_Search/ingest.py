@@ -0,0 +1,411 @@
+# Ingesta incremental de los folletos PDF de Margie's Travel en el índice de búsqueda.
+#
+# Los PDF se leen directamente desde 'collateral.zip' (sin extraerlos a disco), las páginas
+# se procesan en paralelo con un pool de procesos, el texto se divide en fragmentos ("chunks"),
+# se generan sus embeddings y los documentos se envían al índice en lotes.
+# Un manifiesto con el hash del contenido de cada PDF permite reprocesar solo los archivos
+# nuevos o modificados en ejecuciones posteriores. El manifiesto tiene una sección por
+# configuración (destino, índice y modelo de embeddings): un destino o modelo nuevo empieza
+# con su sección vacía y se indexa completo.
+#
+# Uso:
+#   python ingest.py                     # índice local (local_index.jsonl)
+#   python ingest.py --target azure      # índice de Azure AI Search
+#   python ingest.py --no-embed --force  # sin embeddings, reprocesando todo
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Carga las variables de entorno desde un archivo .env.
+load_dotenv()
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ZIP_PATH = os.path.join(CURRENT_DIR, "collateral.zip")
+DEFAULT_MANIFEST_PATH = os.path.join(CURRENT_DIR, ".ingest_manifest.json")
+DEFAULT_LOCAL_INDEX_PATH = os.path.join(CURRENT_DIR, "local_index.jsonl")
+
+# Tamaño de lectura al calcular el hash de cada PDF dentro del zip.
+READ_BLOCK_SIZE = 64 * 1024
+
+
+# ==============================================================================
+# LECTURA DEL ZIP Y MANIFIESTO
+# ==============================================================================
+
+def iter_zip_pdfs(zip_path: str) -> Iterator[Tuple[str, bytes, str]]:
+    """
+    Recorre los PDF contenidos en el zip sin extraerlos a disco.
+
+    Args:
+        zip_path: Ruta al archivo zip con los folletos.
+
+    Returns:
+        Un iterador de tuplas (nombre del PDF, contenido en bytes, hash sha256 del contenido).
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                continue
+            digest = hashlib.sha256()
+            buffer = io.BytesIO()
+            # Se lee el PDF por bloques directamente desde el zip, calculando el hash al vuelo.
+            with archive.open(info) as stream:
+                for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b""):
+                    digest.update(block)
+                    buffer.write(block)
+            yield os.path.basename(info.filename), buffer.getvalue(), digest.hexdigest()
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Dict[str, Dict]]:
+    """
+    Carga el manifiesto de PDFs ya indexados (vacío si no existe).
+
+    Returns:
+        Un diccionario {clave de configuración: {nombre del PDF: entrada}}. Un manifiesto del
+        formato anterior (sin secciones) se descarta: no se sabe con qué configuración se generó.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if any("sha256" in entry for entry in manifest.values()):
+        return {}
+    return manifest
+
+
+def manifest_key(sink, embedder: Optional["Embedder"]) -> str:
+    """
+    Clave de la sección del manifiesto para un destino y un modelo de embeddings.
+
+    Así, indexar primero en local y después en Azure, o sin embeddings y después con ellos,
+    no da por indexados en un destino los PDF que solo se enviaron al otro.
+    """
+    model = embedder.model if embedder else "none"
+    return f"{sink.key}|embeddings={model}"
+
+
+def local_sink_key(path: str = DEFAULT_LOCAL_INDEX_PATH) -> str:
+    """Identificador del índice local en las claves del manifiesto."""
+    return f"local:{os.path.abspath(path)}"
+
+
+def azure_sink_key(endpoint: Optional[str], index_name: Optional[str]) -> str:
+    """Identificador de un índice de Azure AI Search en las claves del manifiesto."""
+    return f"azure:{endpoint}/{index_name}"
+
+
+def save_manifest(manifest_path: str, manifest: Dict[str, Dict[str, Dict]]):
+    """Guarda el manifiesto de forma atómica para no dejarlo corrupto si el proceso se interrumpe."""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+# ==============================================================================
+# PARSING Y FRAGMENTACIÓN
+# ==============================================================================
+
+def parse_pdf(name: str, data: bytes) -> Tuple[str, List[Tuple[int, str]]]:
+    """
+    Extrae el texto de cada página de un PDF en memoria.
+
+    Se define a nivel de módulo para que el pool de procesos pueda serializarla.
+
+    Args:
+        name: Nombre del PDF (se devuelve tal cual para identificar el resultado).
+        data: Contenido del PDF en bytes.
+
+    Returns:
+        Una tupla (nombre, [(número de página, texto), ...]).
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    pages = []
+    for page_number, page in enumerate(reader.pages, start=1):
+        text = (page.extract_text() or "").strip()
+        if text:
+            pages.append((page_number, text))
+    return name, pages
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """
+    Divide un texto en fragmentos de aproximadamente 'chunk_size' caracteres,
+    cortando en espacios y con un solapamiento de 'overlap' caracteres entre fragmentos.
+    """
+    words = text.split()
+    chunks: List[str] = []
+    current: List[str] = []
+    length = 0
+    for word in words:
+        if current and length + len(word) + 1 > chunk_size:
+            chunks.append(" ".join(current))
+            # Conserva las últimas palabras del fragmento como contexto del siguiente.
+            tail: List[str] = []
+            tail_length = 0
+            for previous in reversed(current):
+                if tail_length + len(previous) + 1 > overlap:
+                    break
+                tail.insert(0, previous)
+                tail_length += len(previous) + 1
+            current, length = tail, tail_length
+        current.append(word)
+        length += len(word) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def document_id(source: str, page: int, chunk: int) -> str:
+    """Genera una clave válida para Azure AI Search (letras, dígitos, '_', '-' o '=')."""
+    source_key = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    return f"{source_key}-{page}-{chunk}"
+
+
+def build_documents(source: str, content_hash: str, pages: List[Tuple[int, str]]) -> List[Dict]:
+    """Convierte las páginas de un PDF en documentos listos para indexar."""
+    documents = []
+    for page_number, text in pages:
+        for chunk_number, chunk in enumerate(chunk_text(text)):
+            documents.append({
+                "id": document_id(source, page_number, chunk_number),
+                "source": source,
+                "page": page_number,
+                "chunk": chunk_number,
+                "content": chunk,
+                "content_hash": content_hash,
+            })
+    return documents
+
+
+# ==============================================================================
+# EMBEDDINGS
+# ==============================================================================
+
+class Embedder:
+    """Genera embeddings por lotes usando el despliegue de embeddings de Azure OpenAI."""
+
+    def __init__(self, batch_size: int = 16):
+        # Se usan las mismas variables de entorno que en '007_Basic_RAG/program.py'.
+        from openai import AzureOpenAI
+        from common.rate_limit import rate_limited_http_client
+
+        self.client = AzureOpenAI(
+            api_key=os.getenv("get_oai_key"),
+            api_version="2024-02-15-preview",
+            azure_endpoint=os.getenv("get_oai_base"),
+            # Los lotes de embeddings respetan las cuotas de peticiones y tokens por minuto.
+            http_client=rate_limited_http_client(),
+        )
+        self.model = os.getenv("get_embed_model")
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Devuelve un embedding por texto, respetando el orden de entrada."""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = self.client.embeddings.create(input=batch, model=self.model)
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
+
+
+# ==============================================================================
+# DESTINOS DEL ÍNDICE
+# ==============================================================================
+
+class LocalIndexSink:
+    """
+    Sustituto local del índice de búsqueda: guarda los documentos en un archivo JSONL.
+    Útil para desarrollar sin un servicio de Azure AI Search y como fuente para la búsqueda local.
+    """
+
+    def __init__(self, path: str = DEFAULT_LOCAL_INDEX_PATH):
+        self.path = path
+        self.key = local_sink_key(path)
+        self.documents: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        document = json.loads(line)
+                        self.documents[document["id"]] = document
+
+    def upload(self, documents: List[Dict]):
+        for document in documents:
+            self.documents[document["id"]] = document
+
+    def delete(self, ids: List[str]):
+        for doc_id in ids:
+            self.documents.pop(doc_id, None)
+
+    def close(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for document in self.documents.values():
+                f.write(json.dumps(document, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+class AzureSearchSink:
+    """Envía los documentos a un índice existente de Azure AI Search."""
+
+    def __init__(self, index_name: Optional[str] = None):
+        from azure.core.credentials import AzureKeyCredential
+        from azure.search.documents import SearchClient
+
+        endpoint = os.getenv("AI_SEARCH_ENDPOINT")
+        index_name = index_name or os.getenv("AI_SEARCH_INDEX_NAME")
+        self.key = azure_sink_key(endpoint, index_name)
+        self.client = SearchClient(
+            endpoint=endpoint,
+            index_name=index_name,
+            credential=AzureKeyCredential(os.getenv("AI_SEARCH_KEY")),
+        )
+
+    def upload(self, documents: List[Dict]):
+        results = self.client.merge_or_upload_documents(documents=documents)
+        failed = [result.key for result in results if not result.succeeded]
+        if failed:
+            raise RuntimeError(f"No se pudieron indexar {len(failed)} documentos: {failed[:5]}")
+
+    def delete(self, ids: List[str]):
+        if ids:
+            self.client.delete_documents(documents=[{"id": doc_id} for doc_id in ids])
+
+    def close(self):
+        self.client.close()
+
+
+# ==============================================================================
+# PROCESO DE INGESTA
+# ==============================================================================
+
+def ingest(
+    zip_path: str = DEFAULT_ZIP_PATH,
+    sink=None,
+    manifest_path: str = DEFAULT_MANIFEST_PATH,
+    embedder: Optional[Embedder] = None,
+    batch_size: int = 100,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    Ingresa en el índice los PDF nuevos o modificados del zip.
+
+    Args:
+        zip_path: Ruta al zip con los PDF.
+        sink: Destino de los documentos (LocalIndexSink o AzureSearchSink).
+        manifest_path: Ruta del manifiesto de hashes (se usa la sección del destino y el modelo).
+        embedder: Generador de embeddings (None para indexar solo texto).
+        batch_size: Número de documentos por lote enviado al índice.
+        workers: Número de procesos para el parsing (por defecto, los núcleos disponibles).
+        force: Si True, reprocesa todos los PDF aunque no hayan cambiado.
+
+    Returns:
+        Estadísticas de la ejecución.
+    """
+    sink = sink or LocalIndexSink()
+    sections = load_manifest(manifest_path)
+    key = manifest_key(sink, embedder)
+    if key not in sections:
+        print(f"ℹ️ Sin entradas en el manifiesto para '{key}': se indexan todos los PDF.")
+    manifest = sections.setdefault(key, {})
+    stats = {"pdfs": 0, "skipped": 0, "processed": 0, "removed": 0, "documents": 0}
+    seen = set()
+    pending: List[Tuple[str, bytes, str]] = []
+
+    # 1. Detecta qué PDFs son nuevos o han cambiado comparando su hash con el manifiesto.
+    for name, data, content_hash in iter_zip_pdfs(zip_path):
+        stats["pdfs"] += 1
+        seen.add(name)
+        if not force and manifest.get(name, {}).get("sha256") == content_hash:
+            stats["skipped"] += 1
+            continue
+        pending.append((name, data, content_hash))
+
+    # 2. Elimina del índice los documentos de PDFs que ya no están en el zip.
+    for name in [name for name in manifest if name not in seen]:
+        sink.delete(manifest[name].get("ids", []))
+        del manifest[name]
+        stats["removed"] += 1
+
+    try:
+        # 3. Procesa en paralelo los PDFs pendientes y envía sus documentos por lotes.
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            hashes = {name: content_hash for name, _, content_hash in pending}
+            futures = [pool.submit(parse_pdf, name, data) for name, data, _ in pending]
+            for future in futures:
+                name, pages = future.result()
+                documents = build_documents(name, hashes[name], pages)
+                if embedder and documents:
+                    vectors = embedder.embed([document["content"] for document in documents])
+                    for document, vector in zip(documents, vectors):
+                        document["content_vector"] = vector
+
+                # Los fragmentos que ya no existen en la nueva versión del PDF se eliminan.
+                new_ids = [document["id"] for document in documents]
+                stale_ids = set(manifest.get(name, {}).get("ids", [])) - set(new_ids)
+                sink.delete(sorted(stale_ids))
+                for start in range(0, len(documents), batch_size):
+                    sink.upload(documents[start:start + batch_size])
+
+                manifest[name] = {
+                    "sha256": hashes[name],
+                    "ids": new_ids,
+                    "indexed_at": datetime.now(timezone.utc).isoformat(),
+                }
+                # El manifiesto se guarda tras cada PDF para poder reanudar si algo falla.
+                save_manifest(manifest_path, sections)
+                stats["processed"] += 1
+                stats["documents"] += len(documents)
+                print(f"📄 {name}: {len(pages)} páginas, {len(documents)} fragmentos indexados")
+    finally:
+        sink.close()
+
+    save_manifest(manifest_path, sections)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta incremental de los PDF de collateral.zip")
+    parser.add_argument("--zip", default=DEFAULT_ZIP_PATH, help="Ruta al zip con los PDF")
+    parser.add_argument("--target", choices=["local", "azure"], default="local", help="Destino de los documentos")
+    parser.add_argument("--local-index", default=DEFAULT_LOCAL_INDEX_PATH, help="Archivo JSONL del índice local")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="Ruta del manifiesto de hashes")
+    parser.add_argument("--batch-size", type=int, default=100, help="Documentos por lote")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para el parsing de PDFs")
+    parser.add_argument("--no-embed", action="store_true", help="No generar embeddings")
+    parser.add_argument("--force", action="store_true", help="Reprocesar todos los PDF")
+    args = parser.parse_args()
+
+    sink = AzureSearchSink() if args.target == "azure" else LocalIndexSink(args.local_index)
+    embedder = None if args.no_embed else Embedder()
+
+    start = time.perf_counter()
+    stats = ingest(
+        zip_path=args.zip,
+        sink=sink,
+        manifest_path=args.manifest,
+        embedder=embedder,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        force=args.force,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Ingesta finalizada en {elapsed:.1f}s: {json.dumps(stats)}")
+
+
+if __name__ == "__main__":
+    main()
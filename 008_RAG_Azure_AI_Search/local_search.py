@@ -0,0 +1,319 @@
+# Motor de búsqueda local sobre los fragmentos de los folletos de Margie's Travel.
+#
+# Construye un índice invertido BM25 comprimido a partir de 'local_index.jsonl' (generado por
+# 'ingest.py') y, si los documentos tienen embeddings, combina el ranking léxico con el
+# ranking vectorial mediante Reciprocal Rank Fusion (RRF).
+# La función 'search_margies_travel' es compatible con FunctionTool, de modo que el agente
+# puede responder desde el índice local en milisegundos y usar Azure AI Search solo cuando
+# el índice local no tenga resultados.
+import base64
+import gzip
+import json
+import math
+import os
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from common.text import normalize_text
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE_PATH = os.path.join(CURRENT_DIR, "local_index.jsonl")
+DEFAULT_INDEX_PATH = os.path.join(CURRENT_DIR, "local_index.bm25.gz")
+
+# Palabras vacías frecuentes en español e inglés (los folletos están en inglés y las preguntas en español).
+STOPWORDS = {
+    "a", "al", "como", "con", "cual", "cuales", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "por", "que", "se", "su", "sus", "un", "una", "y", "o", "para", "me", "mi",
+    "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "the", "to", "with", "what", "which",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Normaliza (minúsculas, sin tildes) y divide el texto en términos, descartando palabras vacías."""
+    return [token for token in normalize_text(text).split() if token not in STOPWORDS and len(token) > 1]
+
+
+# ==============================================================================
+# CODIFICACIÓN DE LISTAS DE POSTINGS
+# ==============================================================================
+
+def encode_postings(postings: List[Tuple[int, int]]) -> bytes:
+    """
+    Codifica una lista ordenada de (id de documento, frecuencia) como enteros de longitud
+    variable (varint), guardando la diferencia entre ids consecutivos en lugar del id completo.
+    """
+    output = bytearray()
+    previous = 0
+    for doc_index, frequency in postings:
+        for value in (doc_index - previous, frequency):
+            while value >= 0x80:
+                output.append((value & 0x7F) | 0x80)
+                value >>= 7
+            output.append(value)
+        previous = doc_index
+    return bytes(output)
+
+
+def decode_postings(data: bytes) -> List[Tuple[int, int]]:
+    """Operación inversa de 'encode_postings'."""
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    postings = []
+    doc_index = 0
+    for position in range(0, len(values), 2):
+        doc_index += values[position]
+        postings.append((doc_index, values[position + 1]))
+    return postings
+
+
+# ==============================================================================
+# ÍNDICE BM25
+# ==============================================================================
+
+class BM25Index:
+    """
+    Índice invertido BM25 con listas de postings comprimidas.
+
+    Uso:
+        index = BM25Index.load_or_build()
+        results = index.search("hoteles en Las Vegas", top=5)
+    """
+
+    def __init__(self, documents: List[Dict], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # Solo se guardan los metadatos necesarios para devolver resultados.
+        self.documents = [
+            {key: document.get(key) for key in ("id", "source", "page", "content")}
+            for document in documents
+        ]
+        self.postings: Dict[str, bytes] = {}
+        self.doc_lengths = np.zeros(len(documents), dtype=np.int32)
+        self.vectors: Optional[np.ndarray] = None
+        self.signature: Optional[Dict] = None
+
+        term_postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc_index, document in enumerate(documents):
+            counts = Counter(tokenize(document.get("content", "")))
+            self.doc_lengths[doc_index] = sum(counts.values())
+            for term, frequency in counts.items():
+                term_postings[term].append((doc_index, frequency))
+        self.postings = {term: encode_postings(postings) for term, postings in term_postings.items()}
+        self.document_frequency = {term: len(postings) for term, postings in term_postings.items()}
+
+        # Los embeddings (si existen) se normalizan una sola vez para calcular similitudes coseno.
+        if documents and all(document.get("content_vector") for document in documents):
+            vectors = np.asarray([document["content_vector"] for document in documents], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self.vectors = vectors / np.where(norms == 0, 1, norms)
+
+    @property
+    def average_length(self) -> float:
+        return float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    # --- Búsqueda ---
+
+    def bm25_scores(self, query: str) -> Dict[int, float]:
+        """Calcula la puntuación BM25 de los documentos que contienen algún término de la consulta."""
+        scores: Dict[int, float] = defaultdict(float)
+        total = len(self.documents)
+        average_length = self.average_length or 1.0
+        for term in set(tokenize(query)):
+            data = self.postings.get(term)
+            if data is None:
+                continue
+            frequency_in_docs = self.document_frequency[term]
+            idf = math.log(1 + (total - frequency_in_docs + 0.5) / (frequency_in_docs + 0.5))
+            for doc_index, frequency in decode_postings(data):
+                length_ratio = self.doc_lengths[doc_index] / average_length
+                denominator = frequency + self.k1 * (1 - self.b + self.b * length_ratio)
+                scores[doc_index] += idf * frequency * (self.k1 + 1) / denominator
+        return scores
+
+    def vector_ranking(self, query_vector: List[float], top: int) -> List[int]:
+        """Devuelve los índices de los documentos más similares al vector de la consulta."""
+        if self.vectors is None:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        similarities = self.vectors @ query
+        top = min(top, len(similarities))
+        candidates = np.argpartition(-similarities, top - 1)[:top]
+        return [int(index) for index in candidates[np.argsort(-similarities[candidates])]]
+
+    def search(
+        self,
+        query: str,
+        top: int = 5,
+        query_vector: Optional[List[float]] = None,
+        rrf_k: int = 60,
+    ) -> List[Dict]:
+        """
+        Busca los documentos más relevantes para la consulta.
+
+        Args:
+            query: Texto de la consulta.
+            top: Número máximo de resultados.
+            query_vector: Embedding de la consulta; si se indica, se fusiona el ranking BM25
+                con el vectorial mediante Reciprocal Rank Fusion.
+            rrf_k: Constante de suavizado de RRF.
+
+        Returns:
+            Lista de documentos con su puntuación, de mayor a menor relevancia.
+        """
+        bm25 = self.bm25_scores(query)
+        lexical_ranking = sorted(bm25, key=bm25.get, reverse=True)
+
+        if query_vector is None or self.vectors is None:
+            ranking = [(doc_index, bm25[doc_index]) for doc_index in lexical_ranking[:top]]
+        else:
+            # Reciprocal Rank Fusion: cada ranking aporta 1 / (k + posición) a cada documento.
+            depth = max(top * 4, 20)
+            fused: Dict[int, float] = defaultdict(float)
+            for ranking_list in (lexical_ranking[:depth], self.vector_ranking(query_vector, depth)):
+                for position, doc_index in enumerate(ranking_list, start=1):
+                    fused[doc_index] += 1.0 / (rrf_k + position)
+            ranking = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top]
+
+        return [dict(self.documents[doc_index], score=round(float(score), 4)) for doc_index, score in ranking]
+
+    # --- Persistencia ---
+
+    def save(self, path: str = DEFAULT_INDEX_PATH):
+        """Guarda el índice en un archivo JSON comprimido con gzip."""
+        payload = {
+            "k1": self.k1,
+            "b": self.b,
+            "signature": self.signature,
+            "documents": self.documents,
+            "doc_lengths": self.doc_lengths.tolist(),
+            "document_frequency": self.document_frequency,
+            "postings": {term: base64.b64encode(data).decode("ascii") for term, data in self.postings.items()},
+            "vectors": self.vectors.tolist() if self.vectors is not None else None,
+        }
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_PATH) -> "BM25Index":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls([], k1=payload["k1"], b=payload["b"])
+        index.signature = payload["signature"]
+        index.documents = payload["documents"]
+        index.doc_lengths = np.asarray(payload["doc_lengths"], dtype=np.int32)
+        index.document_frequency = payload["document_frequency"]
+        index.postings = {term: base64.b64decode(data) for term, data in payload["postings"].items()}
+        if payload["vectors"] is not None:
+            index.vectors = np.asarray(payload["vectors"], dtype=np.float32)
+        return index
+
+    @classmethod
+    def load_or_build(cls, source_path: str = DEFAULT_SOURCE_PATH, index_path: str = DEFAULT_INDEX_PATH) -> "BM25Index":
+        """
+        Carga el índice desde disco o lo reconstruye si 'local_index.jsonl' cambió desde
+        la última construcción (se compara el tamaño y la fecha de modificación).
+        """
+        stat = os.stat(source_path)
+        signature = {"size": stat.st_size, "mtime": stat.st_mtime}
+        if os.path.exists(index_path):
+            index = cls.load(index_path)
+            if index.signature == signature:
+                return index
+
+        with open(source_path, "r", encoding="utf-8") as f:
+            documents = [json.loads(line) for line in f if line.strip()]
+        index = cls(documents)
+        index.signature = signature
+        index.save(index_path)
+        return index
+
+
+# ==============================================================================
+# FUNCIÓN PARA EL AGENTE
+# ==============================================================================
+
+_index: Optional[BM25Index] = None
+
+
+def get_index() -> BM25Index:
+    """Devuelve el índice local, cargándolo (o reconstruyéndolo) solo la primera vez."""
+    global _index
+    if _index is None or _index.signature != _current_signature():
+        _index = BM25Index.load_or_build()
+    return _index
+
+
+_embedder = None
+
+
+def _get_embedder():
+    global _embedder
+    if _embedder is None:
+        from ingest import Embedder
+
+        _embedder = Embedder()
+    return _embedder
+
+
+def _current_signature() -> Dict:
+    stat = os.stat(DEFAULT_SOURCE_PATH)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def local_index_available() -> bool:
+    """Indica si existe un índice local generado con 'ingest.py'."""
+    return os.path.exists(DEFAULT_SOURCE_PATH)
+
+
+def search_margies_travel(query: str, top: int = 5) -> str:
+    """
+    Busca información en los folletos de Margie's Travel (hoteles, destinos, precios) usando el índice local.
+
+    :param query (str): La pregunta o los términos de búsqueda.
+    :param top (int): El número máximo de fragmentos a devolver.
+    :return: Los fragmentos más relevantes como una cadena de texto JSON.
+    :rtype: str
+    """
+    index = get_index()
+    query_vector = None
+    # Búsqueda híbrida opcional: requiere embeddings en el índice y una llamada al modelo de embeddings.
+    if index.vectors is not None and os.getenv("LOCAL_SEARCH_HYBRID", "false").lower() == "true":
+        query_vector = _get_embedder().embed([query])[0]
+    results = index.search(query, top=top, query_vector=query_vector)
+    if not results:
+        # Sin resultados locales: se indica al agente que puede recurrir a la búsqueda remota.
+        return json.dumps({"results": [], "message": "Sin resultados en el índice local."})
+    return json.dumps({"results": results}, ensure_ascii=False)
+
+
+# Conjunto de funciones para FunctionTool, igual que en '005_Function_Calling/functions.py'.
+search_functions: Set[Callable[..., Any]] = {
+    search_margies_travel
+}
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    query = " ".join(sys.argv[1:]) or "hoteles en Las Vegas"
+    index = get_index()
+    start = time.perf_counter()
+    results = index.search(query)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"🔎 '{query}': {len(results)} resultados en {elapsed_ms:.2f} ms")
+    for result in results:
+        print(f"  - [{result['score']}] {result['source']} (pág. {result['page']}): {result['content'][:100]}...")
@@ -0,0 +1,256 @@
+# Caché semántica de respuestas para el agente RAG de Margie's Travel.
+#
+# Los usuarios repiten la misma pregunta con distintas palabras ("hoteles en Las Vegas",
+# "¿qué hoteles hay en Las Vegas?"). La caché guarda el embedding de cada pregunta ya
+# respondida junto con la respuesta y sus citas; ante una pregunta nueva busca la más
+# parecida y, si la similitud coseno supera el umbral, devuelve la respuesta guardada sin
+# crear un hilo ni una ejecución del agente.
+# Las entradas se invalidan cuando cambia la versión del índice (por ejemplo, tras ejecutar
+# 'ingest.py' de nuevo). Si no está configurado el despliegue de embeddings, la caché solo
+# reconoce preguntas idénticas tras normalizarlas.
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from common.text import normalize_text
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(CURRENT_DIR, ".semantic_cache.json")
+DEFAULT_MANIFEST_PATH = os.path.join(CURRENT_DIR, ".ingest_manifest.json")
+# Similitud coseno mínima para considerar que dos preguntas son equivalentes.
+DEFAULT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Variables de entorno que necesita el 'Embedder' de 'ingest.py'.
+EMBEDDING_SETTINGS = ("get_oai_key", "get_oai_base", "get_embed_model")
+
+
+def queried_index_keys() -> List[str]:
+    """
+    Identificadores (los de las secciones del manifiesto de 'ingest.py') de los índices que
+    consulta el agente: el índice local, si existe, y el índice de Azure AI Search configurado.
+    """
+    from ingest import DEFAULT_LOCAL_INDEX_PATH, azure_sink_key, local_sink_key
+
+    keys = []
+    if os.path.exists(DEFAULT_LOCAL_INDEX_PATH):
+        keys.append(local_sink_key(DEFAULT_LOCAL_INDEX_PATH))
+    index_name = os.getenv("AI_SEARCH_INDEX_NAME")
+    if index_name:
+        keys.append(azure_sink_key(os.getenv("AI_SEARCH_ENDPOINT"), index_name))
+    return keys
+
+
+def current_index_version(manifest_path: str = DEFAULT_MANIFEST_PATH, index_keys: Optional[List[str]] = None) -> str:
+    """
+    Devuelve la versión actual del índice.
+
+    Se puede fijar con la variable de entorno AI_SEARCH_INDEX_VERSION (útil para índices
+    remotos); si no, se usa el hash de las secciones del manifiesto de 'ingest.py' que
+    corresponden a los índices consultados, que cambia cada vez que se reindexa un PDF en
+    ellos. Reindexar otro destino (u otro modelo de embeddings en un índice que no se
+    consulta) no invalida la caché.
+
+    Args:
+        manifest_path: Ruta del manifiesto de 'ingest.py'.
+        index_keys: Índices consultados (por defecto, los de 'queried_index_keys').
+    """
+    version = os.getenv("AI_SEARCH_INDEX_VERSION")
+    if version:
+        return version
+    if index_keys is None:
+        index_keys = queried_index_keys()
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        # Las secciones se identifican como "<índice>|embeddings=<modelo>".
+        sections = {key: section for key, section in manifest.items()
+                    if isinstance(section, dict) and key.split("|", 1)[0] in index_keys}
+        if sections:
+            payload = json.dumps(sections, sort_keys=True, ensure_ascii=False).encode("utf-8")
+            return hashlib.sha256(payload).hexdigest()[:16]
+    return os.getenv("AI_SEARCH_INDEX_NAME", "default")
+
+
+def default_embed() -> Optional[Callable[[List[str]], List[List[float]]]]:
+    """
+    Crea la función de embeddings con el despliegue de Azure OpenAI de 'ingest.py'.
+
+    Returns:
+        La función, o None si faltan las variables de entorno del despliegue de embeddings.
+    """
+    missing = [name for name in EMBEDDING_SETTINGS if not os.getenv(name)]
+    if missing:
+        print(f"ℹ️ Caché semántica desactivada (faltan {', '.join(missing)}): solo se reutilizan preguntas idénticas")
+        return None
+    from ingest import Embedder
+
+    return Embedder().embed
+
+
+@dataclass
+class CachedAnswer:
+    """Respuesta servida desde la caché."""
+    question: str
+    answer: str
+    citations: List[str]
+    similarity: float
+    latency_saved: float
+
+
+@dataclass
+class CacheStats:
+    """Estadísticas de uso de la caché durante el proceso actual."""
+    hits: int = 0
+    misses: int = 0
+    latency_saved: float = 0.0
+    lookup_time: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "latency_saved_seconds": round(self.latency_saved, 2),
+            "lookup_seconds": round(self.lookup_time, 3),
+        }
+
+
+class SemanticCache:
+    """
+    Caché de respuestas indexada por el embedding de la pregunta.
+
+    Uso:
+        cache = SemanticCache()
+        cached = cache.lookup(question)
+        if cached is None:
+            ... # ejecutar el agente
+            cache.store(question, answer, citations, latency_seconds)
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        threshold: float = DEFAULT_THRESHOLD,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        index_version: Optional[str] = None,
+    ):
+        """
+        Args:
+            path: Archivo JSON donde se persisten las entradas.
+            threshold: Similitud coseno mínima para servir una respuesta cacheada.
+            embed: Función que convierte textos en embeddings (por defecto, el despliegue
+                de embeddings de Azure OpenAI usado en 'ingest.py'; si no está configurado,
+                solo se reconocen preguntas idénticas tras normalizarlas).
+            index_version: Versión del índice; las entradas de otras versiones se descartan.
+        """
+        self.path = path
+        self.threshold = threshold
+        # El cliente de embeddings se crea al empezar, no después de una ejecución del agente.
+        self._embed = embed or default_embed()
+        self.index_version = index_version or current_index_version()
+        self.stats = CacheStats()
+        self.entries: List[Dict] = []
+        self.vector_entries: List[Dict] = []  # Entradas con embedding, en el orden de las filas de 'vectors'.
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._load()
+
+    # --- API pública ---
+
+    def lookup(self, question: str) -> Optional[CachedAnswer]:
+        """Devuelve la respuesta cacheada más parecida a la pregunta, o None si no hay ninguna suficientemente similar."""
+        start = time.perf_counter()
+        try:
+            if not self.entries:
+                self.stats.misses += 1
+                return None
+
+            # Coincidencia exacta tras normalizar: no hace falta calcular el embedding.
+            normalized = normalize_text(question)
+            for entry in self.entries:
+                if entry["normalized"] == normalized:
+                    return self._hit(entry, 1.0)
+
+            if self._embed is not None and self.vector_entries:
+                vector = self._normalize(self._embed([question])[0])
+                similarities = self.vectors @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    return self._hit(self.vector_entries[best], float(similarities[best]))
+            self.stats.misses += 1
+            return None
+        finally:
+            self.stats.lookup_time += time.perf_counter() - start
+
+    def store(self, question: str, answer: str, citations: Optional[List[str]] = None, latency_seconds: float = 0.0):
+        """Guarda la respuesta a una pregunta junto con las citas y el tiempo que tardó en generarse."""
+        entry = {
+            "question": question,
+            "normalized": normalize_text(question),
+            "answer": answer,
+            "citations": citations or [],
+            "latency_seconds": latency_seconds,
+            "created_at": time.time(),
+        }
+        if self._embed is not None:
+            vector = self._normalize(self._embed([question])[0])
+            entry["vector"] = vector.tolist()
+            self.vector_entries.append(entry)
+            self.vectors = np.vstack([self.vectors.reshape(-1, len(vector)), vector])
+        self.entries.append(entry)
+        self._save()
+
+    def clear(self):
+        """Elimina todas las entradas de la caché."""
+        self.entries = []
+        self.vector_entries = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._save()
+
+    # --- Implementación ---
+
+    def _hit(self, entry: Dict, similarity: float) -> CachedAnswer:
+        self.stats.hits += 1
+        self.stats.latency_saved += entry["latency_seconds"]
+        return CachedAnswer(
+            question=entry["question"],
+            answer=entry["answer"],
+            citations=entry["citations"],
+            similarity=similarity,
+            latency_saved=entry["latency_seconds"],
+        )
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        return array / (np.linalg.norm(array) or 1.0)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Si el índice se reconstruyó, las respuestas guardadas pueden estar desactualizadas.
+        if data.get("index_version") != self.index_version:
+            print("♻️ El índice cambió: se invalida la caché semántica")
+            self._save()
+            return
+        self.entries = data.get("entries", [])
+        # Las entradas guardadas sin embedding solo sirven para coincidencias exactas.
+        self.vector_entries = [entry for entry in self.entries if "vector" in entry]
+        if self.vector_entries:
+            self.vectors = np.asarray([entry["vector"] for entry in self.vector_entries], dtype=np.float32)
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"index_version": self.index_version, "entries": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -1,102 +1,157 @@
 # Importando las bibliotecas y utilidades necesarias.
 import os
 from azure.ai.projects import AIProjectClient
+from common.rate_limit import azure_pipeline_kwargs # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 # Importa clases clave para manejar el Intérprete de Código, adjuntar archivos y definir roles.
 from azure.ai.projects.models import CodeInterpreterTool, MessageAttachment
 from azure.ai.projects.models import FilePurpose, MessageRole
 from azure.identity import DefaultAzureCredential
 from pathlib import Path
 from dotenv import load_dotenv
+from file_registry import FileUploadRegistry # Evita volver a subir archivos cuyo contenido no ha cambiado.
+from common.artifacts import ArtifactFetcher, collect_artifacts # Descarga en paralelo de los archivos generados.
+# Motor tabular local: responde preguntas agregadas sobre el CSV en milisegundos, sin el Intérprete de Código.
+from azure.ai.projects.models import FunctionTool, ToolSet
+from tabular import tabular_functions
+from profiling import prepare_upload # Perfil y muestra estratificada para CSV muy grandes.
+from result_cache import ResultCache, agent_definition_hash # Caché de respuestas y gráficos ya generados.
+import shutil
+import time
 
 # Carga las variables de entorno.
 load_dotenv()
 
-model = os.getenv("MODEL_DEPLOYMENT_NAME")
-project_connection_string = os.getenv("PROJECT_CONNECTION_STRING")
 
-# Crea el cliente principal para interactuar con el proyecto de IA de Azure.
-project_client = AIProjectClient.from_connection_string(
-    credential=DefaultAzureCredential(),
-    conn_str=project_connection_string
-)
+def main():
+    """Analiza el CSV con el agente, o devuelve la respuesta y los gráficos de la caché si no ha cambiado nada."""
+    model = os.getenv("MODEL_DEPLOYMENT_NAME")
+    project_connection_string = os.getenv("PROJECT_CONNECTION_STRING")
 
-# El bloque 'with' asegura que el cliente se cierre correctamente al finalizar.
-with project_client:
     # Construye una ruta absoluta al archivo CSV para asegurar que siempre se encuentre.
     current_dir = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(current_dir, "electronics_products.csv")
-    
-    # Sube el archivo y espera a que sea procesado y esté listo para usar.
-    # 'FilePurpose.AGENTS' especifica que este archivo será utilizado por un agente.
-    file = project_client.agents.upload_file_and_poll(
-        file_path=path, purpose=FilePurpose.AGENTS
-    )
-    print(f"Archivo subido, ID del archivo: {file.id}")
+
+    # Si el CSV es muy grande, en lugar del archivo completo se suben una muestra estratificada y
+    # un perfil con el esquema y las estadísticas del conjunto completo (calculados en una sola pasada).
+    # Con UPLOAD_FULL_DATASET=true se sube siempre el archivo completo.
+    upload_full = os.getenv("UPLOAD_FULL_DATASET", "false").lower() == "true"
+    upload_paths = prepare_upload(path, full=upload_full)
 
     # [INICIO create_agent_and_message_with_code_interpreter_file_attachment]
+    # El conjunto de herramientas combina el motor tabular local (para agregados, filtros y ordenación)
+    # con el Intérprete de Código (para gráficos y análisis libres).
+    toolset = ToolSet()
+    toolset.add(FunctionTool(tabular_functions))
     # Ten en cuenta que el CodeInterpreter debe estar habilitado al crear el agente;
     # de lo contrario, el agente no podrá ver el archivo adjunto para interpretarlo con código.
-    agent = project_client.agents.create_agent(
-        model=model,
-        name="code-interpreter-assistant",
-        instructions="Eres un asistente útil destinado a responder la consulta del usuario analizando el archivo que se te proporciona",
-        # Habilita la herramienta CodeInterpreter para que el agente pueda ejecutar código Python.
-        tools=CodeInterpreterTool().definitions,
-    )
-    print(f"Agente creado, ID del agente: {agent.id}")
-
-    thread = project_client.agents.create_thread()
-    print(f"Hilo creado, ID del hilo: {thread.id}")
-
-    # Crea un objeto "adjunto" (attachment).
-    # Esto vincula el ID del archivo subido con la herramienta CodeInterpreter.
-    attachment = MessageAttachment(file_id=file.id, tools=CodeInterpreterTool().definitions)
-
-    # Crea un mensaje de usuario.
-    message = project_client.agents.create_message(
-        thread_id=thread.id,
-        role="user",
-        content="¿Podrías crear un gráfico de columnas con los productos en el eje X y sus respectivos precios en el eje Y?",
-        # Adjunta el archivo al mensaje para que el agente sepa que debe usarlo para esta consulta específica.
-        attachments=[attachment],
-    )
-    # [FIN create_agent_and_message_with_code_interpreter_file_attachment]
-    print(f"Mensaje creado, ID del mensaje: {message.id}")
-
-    # Inicia y procesa la ejecución. El agente leerá la pregunta, verá el archivo CSV,
-    # y usará su herramienta CodeInterpreter para escribir y ejecutar código Python que genere el gráfico.
-    run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
-    print(f"Ejecución finalizada con estado: {run.status}")
-
-    # Manejo de errores.
-    if run.status == "failed":
-        # Comprueba si el error es "Rate limit is exceeded." (Límite de peticiones excedido), en cuyo caso necesitarías más cuota.
-        print(f"La ejecución falló: {run.last_error}")
+    toolset.add(CodeInterpreterTool())
+    instructions = ("Eres un asistente útil destinado a responder la consulta del usuario analizando el archivo que se te proporciona. "
+                    "Para preguntas de agregados, filtros u ordenación sobre el conjunto de datos 'electronics_products' usa "
+                    "las funciones 'describe_dataset', 'query_dataset' y 'list_rows'; usa el Intérprete de Código solo para "
+                    "gráficos o análisis que esas funciones no cubran.")
 
-    # Obtiene todos los mensajes del hilo, que ahora incluirán la respuesta del agente.
-    messages = project_client.agents.list_messages(thread_id=thread.id)
-    print(f"Mensajes: {messages}")
-
-    # Obtiene el último mensaje de texto enviado por el agente.
-    last_msg = messages.get_last_text_message_by_role(MessageRole.AGENT)
-    if last_msg:
-        print(f"Último Mensaje: {last_msg.text.value}")
+    content = "¿Podrías crear un gráfico de columnas con los productos en el eje X y sus respectivos precios en el eje Y?"
+    if len(upload_paths) > 1:
+        # Se avisa al agente de que trabaja con una muestra para que use el perfil en los totales.
+        content += (" Nota: el CSV adjunto es una muestra estratificada; el JSON adjunto contiene el esquema y las "
+                    "estadísticas del conjunto completo, úsalo para conteos, rangos y totales.")
 
     # Define el directorio de salida en la misma carpeta que el script.
     output_dir = Path(current_dir)
     output_dir.mkdir(parents=True, exist_ok=True) # Crea el directorio si no existe.
 
-    # Itera sobre cualquier contenido de imagen en la respuesta (el gráfico generado).
-    for image_content in messages.image_contents:
-        print(f"ID del archivo de imagen: {image_content.image_file.file_id}")
-        file_name = f"{image_content.image_file.file_id}_image_file.png"
-        
-        # Construye la ruta final para guardar el archivo.
-        file_path = output_dir / file_name
-
-        # Descarga y guarda el archivo de imagen en la ruta especificada.
-        project_client.agents.save_file(
-            file_id=image_content.image_file.file_id,
-            file_name=str(file_path)
+    # Antes de crear nada en el servicio se consulta la caché de resultados: si los archivos de entrada,
+    # la pregunta y la definición del agente no han cambiado, se reutilizan la respuesta y los gráficos.
+    result_cache = ResultCache()
+    cache_key = result_cache.key(upload_paths, content, agent_definition_hash(model, instructions, toolset.definitions))
+    cached = result_cache.lookup(cache_key)
+    if cached is not None:
+        print(f"Respuesta desde la caché (~{cached.latency_saved:.1f}s ahorrados):")
+        print(f"Último Mensaje: {cached.text}")
+        for artifact_path in cached.artifacts:
+            target = output_dir / os.path.basename(artifact_path)
+            if not target.exists():
+                shutil.copyfile(artifact_path, target)
+            print(f"Archivo guardado en: {target}")
+        return
+    start = time.perf_counter()
+
+    # Crea el cliente principal para interactuar con el proyecto de IA de Azure.
+    project_client = AIProjectClient.from_connection_string(
+        credential=DefaultAzureCredential(),
+        conn_str=project_connection_string,
+        **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
+    )
+
+    # El bloque 'with' asegura que el cliente se cierre correctamente al finalizar.
+    with project_client:
+        # Sube los archivos (solo si su contenido no se había subido antes) y obtiene sus IDs.
+        # El registro guarda el hash del contenido y el ID del archivo en el servicio, así que en
+        # ejecuciones posteriores con el mismo CSV se omiten la subida y la espera del procesamiento.
+        # 'FilePurpose.AGENTS' especifica que estos archivos serán utilizados por un agente.
+        registry = FileUploadRegistry(project_client, scope=project_connection_string)
+        file_ids = [registry.get_or_upload(upload_path, purpose=FilePurpose.AGENTS) for upload_path in upload_paths]
+        print(f"Archivos disponibles, IDs de los archivos: {file_ids}")
+
+        agent = project_client.agents.create_agent(
+            model=model,
+            name="code-interpreter-assistant",
+            instructions=instructions,
+            # Asigna el conjunto de herramientas (funciones locales e Intérprete de Código).
+            toolset=toolset,
         )
-        print(f"Archivo de imagen guardado en: {file_path}")
\ No newline at end of file
+        print(f"Agente creado, ID del agente: {agent.id}")
+
+        thread = project_client.agents.create_thread()
+        print(f"Hilo creado, ID del hilo: {thread.id}")
+
+        # Crea un objeto "adjunto" (attachment) por archivo.
+        # Esto vincula el ID de cada archivo subido con la herramienta CodeInterpreter.
+        attachments = [MessageAttachment(file_id=file_id, tools=CodeInterpreterTool().definitions) for file_id in file_ids]
+
+        # Crea un mensaje de usuario.
+        message = project_client.agents.create_message(
+            thread_id=thread.id,
+            role="user",
+            content=content,
+            # Adjunta los archivos al mensaje para que el agente sepa que debe usarlos para esta consulta específica.
+            attachments=attachments,
+        )
+        # [FIN create_agent_and_message_with_code_interpreter_file_attachment]
+        print(f"Mensaje creado, ID del mensaje: {message.id}")
+
+        # Inicia y procesa la ejecución. El agente leerá la pregunta, verá el archivo CSV,
+        # y usará su herramienta CodeInterpreter para escribir y ejecutar código Python que genere el gráfico.
+        run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
+        print(f"Ejecución finalizada con estado: {run.status}")
+
+        # Manejo de errores.
+        if run.status == "failed":
+            # Comprueba si el error es "Rate limit is exceeded." (Límite de peticiones excedido), en cuyo caso necesitarías más cuota.
+            print(f"La ejecución falló: {run.last_error}")
+
+        # Obtiene todos los mensajes del hilo, que ahora incluirán la respuesta del agente.
+        messages = project_client.agents.list_messages(thread_id=thread.id)
+        print(f"Mensajes: {messages}")
+
+        # Obtiene el último mensaje de texto enviado por el agente.
+        last_msg = messages.get_last_text_message_by_role(MessageRole.AGENT)
+        if last_msg:
+            print(f"Último Mensaje: {last_msg.text.value}")
+
+        # Descarga en paralelo todos los archivos generados en la respuesta (los gráficos y otros adjuntos).
+        # Cada archivo se escribe en disco por bloques a medida que llega y se omiten los que ya existen.
+        fetcher = ArtifactFetcher(project_client, output_dir=output_dir, max_concurrency=4)
+        manifest = fetcher.fetch(collect_artifacts(messages))
+        for artifact in manifest:
+            print(f"Archivo {artifact.file_id} [{artifact.status}] guardado en: {artifact.path}")
+
+        # Guarda la respuesta y los archivos generados para servirlos en la próxima ejecución idéntica.
+        # Solo se cachean ejecuciones completadas con respuesta de texto.
+        if run.status == "completed" and last_msg:
+            artifact_paths = [artifact.path for artifact in manifest if artifact.status != "failed"]
+            result_cache.store(cache_key, content, last_msg.text.value, artifact_paths, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
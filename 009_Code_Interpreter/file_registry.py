@@ -0,0 +1,176 @@
+# Registro de archivos subidos al servicio de Agentes, indexado por el hash de su contenido.
+#
+# 'upload_file_and_poll' sube el archivo y espera a que se procese en cada ejecución, aunque
+# el CSV no haya cambiado. El registro guarda la relación "hash del contenido -> ID del archivo
+# en el servicio" en un archivo JSON local, de modo que ejecuciones, agentes e hilos distintos
+# reutilizan el mismo archivo y solo se vuelve a subir cuando el contenido cambia.
+# La existencia del archivo en el servicio se verifica de forma perezosa: solo cuando la última
+# verificación tiene más de 'verify_ttl_seconds'.
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from azure.ai.projects.models import FilePurpose
+from azure.core.exceptions import ResourceNotFoundError
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REGISTRY_PATH = os.path.join(CURRENT_DIR, ".file_registry.json")
+
+# Tamaño de bloque para leer y comprimir archivos grandes sin cargarlos en memoria.
+CHUNK_SIZE = 1024 * 1024
+# A partir de este tamaño (bytes) el archivo se comprime con gzip antes de subirlo.
+DEFAULT_COMPRESS_THRESHOLD = int(os.getenv("UPLOAD_COMPRESS_THRESHOLD", str(50 * 1024 * 1024)))
+# Extensiones que el Intérprete de Código puede leer comprimidas (p. ej. pandas.read_csv con .gz).
+COMPRESSIBLE_EXTENSIONS = {".csv", ".tsv", ".txt", ".json", ".jsonl"}
+
+
+def file_sha256(path: str) -> str:
+    """Calcula el hash sha256 de un archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileUploadRegistry:
+    """
+    Sube archivos al servicio de Agentes solo cuando su contenido no se ha subido antes.
+
+    Uso:
+        registry = FileUploadRegistry(project_client, scope=project_connection_string)
+        file_id = registry.get_or_upload("electronics_products.csv")
+    """
+
+    def __init__(
+        self,
+        project_client,
+        scope: Optional[str] = None,
+        path: str = DEFAULT_REGISTRY_PATH,
+        verify_ttl_seconds: int = 3600,
+        compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD,
+    ):
+        """
+        Args:
+            project_client: Cliente AIProjectClient con el que se suben los archivos.
+            scope: Identifica el proyecto (por ejemplo, su cadena de conexión), ya que los IDs
+                de archivo solo son válidos dentro de un proyecto.
+            path: Archivo JSON donde se persiste el registro.
+            verify_ttl_seconds: Segundos durante los que un ID se considera válido sin consultar el servicio.
+            compress_threshold: Tamaño en bytes a partir del cual se comprime el archivo con gzip.
+        """
+        self.project_client = project_client
+        self.scope = hashlib.sha256((scope or "").encode("utf-8")).hexdigest()[:16]
+        self.path = path
+        self.verify_ttl_seconds = verify_ttl_seconds
+        self.compress_threshold = compress_threshold
+        self._lock = threading.Lock()
+
+    def get_or_upload(self, file_path: str, purpose: FilePurpose = FilePurpose.AGENTS, compress: Optional[bool] = None) -> str:
+        """
+        Devuelve el ID del archivo en el servicio, subiéndolo solo si su contenido es nuevo.
+
+        Args:
+            file_path: Ruta local del archivo.
+            purpose: Propósito del archivo en el servicio.
+            compress: True/False para forzar o evitar la compresión; None la decide según el tamaño y la extensión.
+
+        Returns:
+            El ID del archivo en el servicio de Agentes.
+        """
+        if compress is None:
+            extension = os.path.splitext(file_path)[1].lower()
+            compress = extension in COMPRESSIBLE_EXTENSIONS and os.path.getsize(file_path) >= self.compress_threshold
+
+        content_hash = file_sha256(file_path)
+        purpose_name = getattr(purpose, "value", purpose)
+        key = f"{self.scope}|{purpose_name}|{content_hash}|{'gz' if compress else 'raw'}"
+
+        with self._lock:
+            entry = self._read().get(key)
+        if entry is not None:
+            verified_at = entry.get("verified_at", 0)
+            if self._is_valid(entry):
+                # Si hubo que verificar el archivo en el servicio, se guarda la nueva fecha de verificación.
+                if entry["verified_at"] != verified_at:
+                    self._update(key, entry)
+                print(f"♻️ Reutilizando archivo ya subido: {entry['file_id']} ({os.path.basename(file_path)})")
+                return entry["file_id"]
+
+        file_id = self._upload(file_path, purpose, compress)
+        self._update(key, {
+            "file_id": file_id,
+            "file_name": os.path.basename(file_path),
+            "size": os.path.getsize(file_path),
+            "compressed": compress,
+            "uploaded_at": time.time(),
+            "verified_at": time.time(),
+        })
+        return file_id
+
+    def forget(self, file_id: str):
+        """Elimina del registro las entradas que apuntan a un ID de archivo (p. ej. tras borrarlo del servicio)."""
+        with self._lock:
+            data = self._read()
+            for key in [key for key, entry in data.items() if entry["file_id"] == file_id]:
+                del data[key]
+            self._write(data)
+
+    # --- Implementación ---
+
+    def _is_valid(self, entry: Dict) -> bool:
+        """Comprueba (solo si la última verificación expiró) que el archivo sigue existiendo en el servicio."""
+        if time.time() - entry.get("verified_at", 0) < self.verify_ttl_seconds:
+            return True
+        try:
+            self.project_client.agents.get_file(file_id=entry["file_id"])
+        except ResourceNotFoundError:
+            print(f"⚠️ El archivo {entry['file_id']} ya no existe en el servicio, se volverá a subir")
+            return False
+        entry["verified_at"] = time.time()
+        return True
+
+    def _upload(self, file_path: str, purpose: FilePurpose, compress: bool) -> str:
+        file_name = os.path.basename(file_path)
+        if not compress:
+            # El archivo se envía como un flujo: el SDK lo lee por bloques sin cargarlo entero en memoria.
+            with open(file_path, "rb") as f:
+                uploaded = self.project_client.agents.upload_file_and_poll(file=f, filename=file_name, purpose=purpose)
+        else:
+            # Se comprime por bloques en un archivo temporal y se sube el resultado (.gz).
+            with tempfile.TemporaryFile() as compressed:
+                with open(file_path, "rb") as source, gzip.GzipFile(fileobj=compressed, mode="wb") as target:
+                    shutil.copyfileobj(source, target, CHUNK_SIZE)
+                compressed.seek(0)
+                uploaded = self.project_client.agents.upload_file_and_poll(
+                    file=compressed, filename=f"{file_name}.gz", purpose=purpose
+                )
+        print(f"⬆️ Archivo subido: {uploaded.id} ({file_name}{'.gz' if compress else ''})")
+        return uploaded.id
+
+    def _update(self, key: str, entry: Dict):
+        with self._lock:
+            data = self._read()
+            data[key] = entry
+            self._write(data)
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data: Dict[str, Dict]):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
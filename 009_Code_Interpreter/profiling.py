@@ -0,0 +1,265 @@
+# Perfilado y muestreo de CSV muy grandes antes de subirlos al Intérprete de Código.
+#
+# Subir una exportación de varios GB tarda mucho y ralentiza el arranque del sandbox.
+# Este módulo recorre el CSV una sola vez (sin cargarlo en memoria) y calcula:
+#   - el esquema (tipo inferido de cada columna),
+#   - estadísticas por columna: conteos, nulos, mínimo/máximo, media, cuantiles aproximados
+#     y las categorías más frecuentes,
+#   - una muestra estratificada por una columna categórica.
+# Para explorar los datos se sube la muestra compacta junto con el perfil; el conjunto completo
+# solo se envía cuando se pide explícitamente (o cuando el archivo es pequeño).
+import csv
+import hashlib
+import json
+import math
+import os
+import random
+from typing import Dict, List, Optional
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = os.path.join(CURRENT_DIR, ".prepared")
+# Por debajo de este tamaño (bytes) se sube el archivo completo sin muestrear.
+DEFAULT_SAMPLE_THRESHOLD = int(os.getenv("SAMPLE_THRESHOLD_BYTES", str(100 * 1024 * 1024)))
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class ColumnProfile:
+    """Estadísticas de una columna calculadas en una sola pasada con memoria acotada."""
+
+    def __init__(self, name: str, reservoir_size: int = 10000, top_k_capacity: int = 1000, rng: Optional[random.Random] = None):
+        self.name = name
+        self.count = 0
+        self.missing = 0
+        self.numeric = True
+        # Media y varianza con el algoritmo de Welford.
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        # Muestra de reservorio de los valores numéricos para estimar cuantiles.
+        self.reservoir: List[float] = []
+        self.reservoir_size = reservoir_size
+        self.numeric_seen = 0
+        # Conteo de categorías frecuentes con memoria acotada a 'top_k_capacity' valores.
+        self.counters: Dict[str, int] = {}
+        self.truncated = False
+        self.top_k_capacity = top_k_capacity
+        self.rng = rng or random.Random(0)
+
+    def add(self, value: str):
+        self.count += 1
+        if value == "":
+            self.missing += 1
+            return
+        self._count_category(value)
+        if not self.numeric:
+            return
+        try:
+            number = float(value)
+        except ValueError:
+            # Al primer valor no numérico la columna pasa a considerarse de texto.
+            self.numeric = False
+            self.reservoir = []
+            return
+        self.numeric_seen += 1
+        delta = number - self.mean
+        self.mean += delta / self.numeric_seen
+        self.m2 += delta * (number - self.mean)
+        self.minimum = min(self.minimum, number)
+        self.maximum = max(self.maximum, number)
+        if len(self.reservoir) < self.reservoir_size:
+            self.reservoir.append(number)
+        else:
+            position = self.rng.randrange(self.numeric_seen)
+            if position < self.reservoir_size:
+                self.reservoir[position] = number
+
+    def _count_category(self, value: str):
+        if value in self.counters:
+            self.counters[value] += 1
+            return
+        if len(self.counters) >= self.top_k_capacity:
+            # Al llenarse se descarta de una vez la mitad menos frecuente (coste amortizado bajo
+            # incluso en columnas con millones de valores distintos, como los identificadores).
+            self.truncated = True
+            keep = sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[: self.top_k_capacity // 2]
+            self.counters = dict(keep)
+        self.counters[value] = 1
+
+    def as_dict(self, top_k: int = 10) -> Dict:
+        profile = {
+            "type": "número" if self.numeric and self.numeric_seen else "texto",
+            "count": self.count,
+            "missing": self.missing,
+            # Si hubo que descartar valores, solo se sabe que hay más de 'top_k_capacity' distintos.
+            "distinct": f">{self.top_k_capacity}" if self.truncated else len(self.counters),
+            "top_values": sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[:top_k],
+        }
+        if profile["type"] == "número":
+            ordered = sorted(self.reservoir)
+            profile.update({
+                "min": self.minimum,
+                "max": self.maximum,
+                "mean": self.mean,
+                "std": math.sqrt(self.m2 / (self.numeric_seen - 1)) if self.numeric_seen > 1 else 0.0,
+                "quantiles": {str(q): ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES},
+            })
+        return profile
+
+
+def profile_csv(
+    csv_path: str,
+    sample_size: int = 10000,
+    strata_column: Optional[str] = None,
+    max_strata: int = 50,
+    seed: int = 0,
+) -> Dict:
+    """
+    Recorre el CSV una vez y devuelve su perfil junto con una muestra estratificada.
+
+    Args:
+        csv_path: Ruta del CSV.
+        sample_size: Número aproximado de filas de la muestra.
+        strata_column: Columna por la que estratificar; si es None se elige automáticamente
+            la columna de texto con menor número de categorías (entre 2 y 'max_strata').
+        max_strata: Número máximo de estratos (a partir de ahí se usa una muestra aleatoria simple).
+        seed: Semilla para que la muestra sea reproducible.
+
+    Returns:
+        Un diccionario con las claves "profile", "header" y "sample" (lista de filas).
+    """
+    rng = random.Random(seed)
+    if strata_column is None:
+        strata_column = guess_strata_column(csv_path, max_strata=max_strata)
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [ColumnProfile(name, rng=rng) for name in header]
+        strata_index = header.index(strata_column) if strata_column else None
+        # Un reservorio por estrato; si hay demasiados estratos se usa uno solo (clave None).
+        reservoirs: Dict[Optional[str], List[List[str]]] = {}
+        seen: Dict[Optional[str], int] = {}
+        rows = 0
+        for row in reader:
+            rows += 1
+            for column, value in zip(columns, row):
+                column.add(value)
+            key = row[strata_index] if strata_index is not None and strata_index < len(row) else None
+            if key is not None and key not in reservoirs and len(reservoirs) >= max_strata:
+                key = None
+            seen[key] = seen.get(key, 0) + 1
+            reservoir = reservoirs.setdefault(key, [])
+            if len(reservoir) < sample_size:
+                reservoir.append(row)
+            else:
+                position = rng.randrange(seen[key])
+                if position < sample_size:
+                    reservoir[position] = row
+
+    sample = _allocate(reservoirs, seen, sample_size, rng)
+    profile = {
+        "file": os.path.basename(csv_path),
+        "size_bytes": os.path.getsize(csv_path),
+        "rows": rows,
+        "schema": {column.name: column.as_dict()["type"] for column in columns},
+        "columns": {column.name: column.as_dict() for column in columns},
+        "sample": {
+            "rows": len(sample),
+            "strata_column": strata_column,
+            "strata": {str(key): count for key, count in seen.items()} if strata_column else {},
+        },
+    }
+    return {"profile": profile, "header": header, "sample": sample}
+
+
+def guess_strata_column(csv_path: str, probe_rows: int = 5000, max_strata: int = 50) -> Optional[str]:
+    """
+    Elige la columna por la que estratificar leyendo solo las primeras 'probe_rows' filas:
+    la columna de texto con menos categorías distintas (entre 2 y 'max_strata').
+    """
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return None
+        columns = [ColumnProfile(name, reservoir_size=0, top_k_capacity=max_strata + 1) for name in header]
+        for index, row in enumerate(reader):
+            if index >= probe_rows:
+                break
+            for column, value in zip(columns, row):
+                column.add(value)
+    candidates = [
+        column for column in columns
+        if not (column.numeric and column.numeric_seen) and not column.truncated and 2 <= len(column.counters) <= max_strata
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda column: len(column.counters)).name
+
+
+def _allocate(reservoirs: Dict, seen: Dict, sample_size: int, rng: random.Random) -> List[List[str]]:
+    """Reparte 'sample_size' filas entre los estratos en proporción a su tamaño (al menos una por estrato)."""
+    total = sum(seen.values())
+    sample: List[List[str]] = []
+    for key, reservoir in reservoirs.items():
+        quota = max(1, round(sample_size * seen[key] / total)) if total else 0
+        sample.extend(reservoir if len(reservoir) <= quota else rng.sample(reservoir, quota))
+    return sample
+
+
+def prepare_upload(
+    csv_path: str,
+    full: bool = False,
+    threshold_bytes: int = DEFAULT_SAMPLE_THRESHOLD,
+    sample_size: int = 10000,
+    strata_column: Optional[str] = None,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+) -> List[str]:
+    """
+    Decide qué archivos subir para un CSV.
+
+    Args:
+        csv_path: Ruta del CSV original.
+        full: Si True, se sube siempre el conjunto completo.
+        threshold_bytes: Tamaño a partir del cual se sube la muestra en lugar del archivo completo.
+        sample_size: Número aproximado de filas de la muestra.
+        strata_column: Columna por la que estratificar la muestra.
+        output_dir: Directorio donde se guardan la muestra y el perfil.
+
+    Returns:
+        La lista de rutas a subir: [csv_path] o [muestra.csv, perfil.json].
+    """
+    if full or os.path.getsize(csv_path) < threshold_bytes:
+        return [csv_path]
+
+    # La muestra y el perfil se reutilizan mientras el CSV no cambie.
+    stat = os.stat(csv_path)
+    key = hashlib.sha256(
+        f"{os.path.abspath(csv_path)}|{stat.st_size}|{stat.st_mtime_ns}|{sample_size}|{strata_column}".encode("utf-8")
+    ).hexdigest()[:16]
+    base_name = os.path.splitext(os.path.basename(csv_path))[0]
+    target_dir = os.path.join(output_dir, key)
+    sample_path = os.path.join(target_dir, f"{base_name}_sample.csv")
+    profile_path = os.path.join(target_dir, f"{base_name}_profile.json")
+    if os.path.exists(sample_path) and os.path.exists(profile_path):
+        return [sample_path, profile_path]
+
+    print(f"📊 Perfilando {os.path.basename(csv_path)} y generando una muestra estratificada...")
+    result = profile_csv(csv_path, sample_size=sample_size, strata_column=strata_column)
+    os.makedirs(target_dir, exist_ok=True)
+    with open(sample_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(result["header"])
+        writer.writerows(result["sample"])
+    with open(profile_path, "w", encoding="utf-8") as f:
+        json.dump(result["profile"], f, indent=2, ensure_ascii=False)
+    print(f"✅ Muestra de {len(result['sample'])} filas de {result['profile']['rows']} guardada en {target_dir}")
+    return [sample_path, profile_path]
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(CURRENT_DIR, "electronics_products.csv")
+    print(json.dumps(profile_csv(path, sample_size=10)["profile"], indent=2, ensure_ascii=False))
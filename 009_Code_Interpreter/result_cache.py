@@ -0,0 +1,165 @@
+# Caché de resultados del Intérprete de Código.
+#
+# El mismo gráfico (por ejemplo, el de precios por producto) se regeneraba en cada ejecución:
+# subir el archivo, crear el agente, el hilo y la ejecución, y esperar a que el sandbox ejecute
+# el código. Esta caché guarda la respuesta final y los archivos generados (imágenes) en disco,
+# indexados por:
+#   - el hash del contenido de los archivos de entrada,
+#   - la pregunta normalizada,
+#   - el hash de la definición del agente (modelo, instrucciones y herramientas).
+# Si los tres coinciden, el resultado se sirve sin crear hilo ni ejecución. Cuando la caché supera
+# el número de entradas o el tamaño máximo, se eliminan las entradas usadas hace más tiempo (LRU).
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from common.text import normalize_text
+from file_registry import file_sha256
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(CURRENT_DIR, ".result_cache")
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "100"))
+DEFAULT_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+
+def agent_definition_hash(model: str, instructions: str, tool_definitions: Iterable) -> str:
+    """
+    Calcula el hash de la definición de un agente.
+
+    Args:
+        model: Nombre del despliegue del modelo.
+        instructions: Instrucciones del agente.
+        tool_definitions: Definiciones de herramientas (p. ej. 'toolset.definitions').
+    """
+    tools = [definition.as_dict() if hasattr(definition, "as_dict") else definition for definition in tool_definitions]
+    payload = json.dumps({"model": model, "instructions": instructions, "tools": tools}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedResult:
+    """Resultado servido desde la caché."""
+    question: str
+    text: str
+    artifacts: List[str]  # Rutas de los archivos guardados en la caché.
+    latency_saved: float
+
+
+class ResultCache:
+    """
+    Caché LRU en disco de respuestas y archivos generados por el Intérprete de Código.
+
+    Uso:
+        cache = ResultCache()
+        key = cache.key([csv_path], question, agent_definition_hash(model, instructions, toolset.definitions))
+        cached = cache.lookup(key)
+        if cached is None:
+            ... # ejecutar el agente y descargar los archivos generados
+            cache.store(key, question, text, artifact_paths, latency_seconds)
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir: Directorio donde se guardan el índice y los archivos de cada entrada.
+            max_entries: Número máximo de entradas.
+            max_bytes: Tamaño máximo total (en bytes) de los archivos guardados.
+        """
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(file_paths: Iterable[str], question: str, definition_hash: str) -> str:
+        """Construye la clave a partir del contenido de los archivos, la pregunta y la definición del agente."""
+        file_hashes = sorted(file_sha256(path) for path in file_paths)
+        payload = "|".join([*file_hashes, normalize_text(question), definition_hash])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def lookup(self, key: str) -> Optional[CachedResult]:
+        """Devuelve el resultado guardado para la clave (y lo marca como usado), o None si no existe."""
+        with self._lock:
+            index = self._read()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            entry_dir = os.path.join(self.cache_dir, key)
+            artifacts = [os.path.join(entry_dir, name) for name in entry["artifacts"]]
+            # Si falta algún archivo (borrado a mano), la entrada deja de ser válida.
+            if not all(os.path.exists(path) for path in artifacts):
+                self._remove(index, key)
+                self._write(index)
+                return None
+            entry["last_access"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._write(index)
+        return CachedResult(question=entry["question"], text=entry["text"], artifacts=artifacts, latency_saved=entry["latency_seconds"])
+
+    def store(self, key: str, question: str, text: str, artifact_paths: Iterable[str] = (), latency_seconds: float = 0.0):
+        """Guarda la respuesta y una copia de los archivos generados, y aplica la política LRU."""
+        entry_dir = os.path.join(self.cache_dir, key)
+        os.makedirs(entry_dir, exist_ok=True)
+        names, size = [], 0
+        for path in artifact_paths:
+            name = os.path.basename(path)
+            shutil.copyfile(path, os.path.join(entry_dir, name))
+            names.append(name)
+            size += os.path.getsize(path)
+        with self._lock:
+            index = self._read()
+            index[key] = {
+                "question": question,
+                "text": text,
+                "artifacts": names,
+                "bytes": size,
+                "latency_seconds": latency_seconds,
+                "created_at": time.time(),
+                "last_access": time.time(),
+                "hits": 0,
+            }
+            self._evict(index, keep=key)
+            self._write(index)
+
+    def clear(self):
+        """Elimina todas las entradas de la caché."""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    # --- Implementación ---
+
+    def _evict(self, index: Dict[str, Dict], keep: str):
+        """Elimina las entradas menos usadas recientemente hasta cumplir los límites."""
+        by_age = sorted((key for key in index if key != keep), key=lambda key: index[key]["last_access"])
+        total = sum(entry["bytes"] for entry in index.values())
+        while by_age and (len(index) > self.max_entries or total > self.max_bytes):
+            oldest = by_age.pop(0)
+            total -= index[oldest]["bytes"]
+            self._remove(index, oldest)
+            print(f"🧹 Resultado expulsado de la caché: {oldest}")
+
+    def _remove(self, index: Dict[str, Dict], key: str):
+        index.pop(key, None)
+        shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, index: Dict[str, Dict]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
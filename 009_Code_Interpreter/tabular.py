@@ -0,0 +1,316 @@
+# Motor tabular local para responder preguntas agregadas sobre los CSV sin el Intérprete de Código.
+#
+# Preguntas como "precio medio por color" no necesitan un sandbox de Python: basta con una
+# agrupación sobre una columna. Este módulo carga cada CSV una sola vez en una caché columnar
+# de arrays de NumPy (guardada en un archivo .npz junto al CSV e invalidada cuando el CSV
+# cambia) y expone filtros, agrupaciones, ordenación y agregados vectorizados como funciones
+# compatibles con FunctionTool. El Intérprete de Código queda para gráficos y análisis libres.
+import csv
+import hashlib
+import json
+import operator
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Conjuntos de datos disponibles para el agente (nombre -> ruta del CSV).
+DATASETS: Dict[str, str] = {
+    "electronics_products": os.path.join(CURRENT_DIR, "electronics_products.csv"),
+}
+
+AGGREGATES = {"count", "sum", "mean", "min", "max", "median"}
+FILTER_PATTERN = re.compile(r"^\s*(\w+)\s*(==|!=|>=|<=|>|<|contains)\s*(.+?)\s*$")
+COMPARISONS = {
+    "==": operator.eq, "!=": operator.ne,
+    ">": operator.gt, ">=": operator.ge,
+    "<": operator.lt, "<=": operator.le,
+}
+
+
+class ColumnarTable:
+    """
+    Tabla en memoria con una columna por array de NumPy.
+
+    Las columnas numéricas se guardan como float64 y las de texto como categorías:
+    un array de códigos enteros más la lista de valores distintos, lo que hace que
+    los filtros por igualdad y las agrupaciones sean operaciones vectorizadas.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], categories: Dict[str, np.ndarray]):
+        self.columns = columns
+        self.categories = categories
+
+    @property
+    def row_count(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    # --- Carga y caché ---
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> "ColumnarTable":
+        """Lee el CSV en una sola pasada e infiere el tipo de cada columna."""
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            raw: List[List[str]] = [[] for _ in header]
+            for row in reader:
+                for position, value in enumerate(row[:len(header)]):
+                    raw[position].append(value)
+
+        columns: Dict[str, np.ndarray] = {}
+        categories: Dict[str, np.ndarray] = {}
+        for name, values in zip(header, raw):
+            try:
+                columns[name] = np.asarray([float(value) if value != "" else np.nan for value in values], dtype=np.float64)
+            except ValueError:
+                # Columna de texto: se codifica como categorías.
+                uniques, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+                columns[name] = codes.astype(np.int32)
+                categories[name] = uniques
+        return cls(columns, categories)
+
+    @classmethod
+    def load(cls, csv_path: str) -> "ColumnarTable":
+        """Carga la tabla desde la caché .npz o la construye si el CSV cambió."""
+        cache_path = os.path.join(os.path.dirname(csv_path), f".{os.path.basename(csv_path)}.columns.npz")
+        fingerprint = _fingerprint(csv_path)
+        if os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=False) as data:
+                if str(data["__fingerprint__"]) == fingerprint:
+                    columns = {key[4:]: data[key] for key in data.files if key.startswith("col:")}
+                    categories = {key[4:]: data[key] for key in data.files if key.startswith("cat:")}
+                    return cls(columns, categories)
+
+        table = cls.from_csv(csv_path)
+        arrays = {f"col:{name}": values for name, values in table.columns.items()}
+        arrays.update({f"cat:{name}": values for name, values in table.categories.items()})
+        # Se escribe con un nombre temporal terminado en .npz para que NumPy no añada la extensión.
+        tmp_path = cache_path[:-4] + ".tmp.npz"
+        np.savez_compressed(tmp_path, __fingerprint__=np.asarray(fingerprint), **arrays)
+        os.replace(tmp_path, cache_path)
+        return table
+
+    # --- Operaciones ---
+
+    def schema(self) -> Dict[str, str]:
+        return {name: ("texto" if name in self.categories else "número") for name in self.columns}
+
+    def values(self, name: str, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Devuelve los valores legibles de una columna (decodificando las categorías)."""
+        self._check_column(name)
+        column = self.columns[name] if mask is None else self.columns[name][mask]
+        return self.categories[name][column] if name in self.categories else column
+
+    def filter_mask(self, filters: List[str]) -> np.ndarray:
+        """Construye una máscara booleana a partir de condiciones como 'price > 100' o 'colour == Red'."""
+        mask = np.ones(self.row_count, dtype=bool)
+        for condition in filters:
+            match = FILTER_PATTERN.match(condition)
+            if not match:
+                raise ValueError(f"Condición no válida: '{condition}'")
+            name, op, raw_value = match.groups()
+            self._check_column(name)
+            raw_value = raw_value.strip("'\"")
+            if name in self.categories:
+                labels = self.categories[name]
+                if op == "contains":
+                    selected = np.flatnonzero(np.char.find(np.char.lower(labels), raw_value.lower()) >= 0)
+                elif op in ("==", "!="):
+                    selected = np.flatnonzero(np.char.lower(labels) == raw_value.lower())
+                else:
+                    raise ValueError(f"El operador '{op}' no se puede usar con la columna de texto '{name}'")
+                matches = np.isin(self.columns[name], selected)
+                mask &= ~matches if op == "!=" else matches
+            else:
+                if op == "contains":
+                    raise ValueError(f"El operador 'contains' no se puede usar con la columna numérica '{name}'")
+                mask &= COMPARISONS[op](self.columns[name], float(raw_value))
+        return mask
+
+    def aggregate(self, aggregate: str, column: Optional[str], group_by: Optional[str], mask: np.ndarray) -> List[Dict[str, Any]]:
+        """Calcula un agregado sobre 'column' (opcionalmente agrupado por 'group_by') para las filas de 'mask'."""
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Agregado no válido: '{aggregate}'. Usa uno de {sorted(AGGREGATES)}")
+        if aggregate != "count":
+            self._check_column(column)
+            if column in self.categories:
+                raise ValueError(f"La columna '{column}' no es numérica")
+        values = self.columns[column][mask] if aggregate != "count" else None
+
+        if not group_by:
+            return [{aggregate: _reduce(aggregate, values, int(mask.sum()))}]
+
+        self._check_column(group_by)
+        if not mask.any():
+            return []
+        # Los grupos se obtienen como códigos enteros para poder usar np.bincount y reduceat.
+        keys, codes = np.unique(self.columns[group_by][mask], return_inverse=True)
+        counts = np.bincount(codes, minlength=len(keys))
+        if aggregate == "count":
+            results = counts.astype(float)
+        elif aggregate in ("sum", "mean"):
+            sums = np.bincount(codes, weights=values, minlength=len(keys))
+            results = sums if aggregate == "sum" else sums / counts
+        else:
+            order = np.argsort(codes, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            sorted_values = values[order]
+            if aggregate == "min":
+                results = np.minimum.reduceat(sorted_values, starts)
+            elif aggregate == "max":
+                results = np.maximum.reduceat(sorted_values, starts)
+            else:
+                results = np.asarray([np.median(group) for group in np.split(sorted_values, starts[1:])])
+
+        labels = self.categories[group_by][keys] if group_by in self.categories else keys
+        return [
+            {group_by: _to_python(label), aggregate: int(result) if aggregate == "count" else round(float(result), 4), "rows": int(count)}
+            for label, result, count in zip(labels, results, counts)
+        ]
+
+    def _check_column(self, name: Optional[str]):
+        if name not in self.columns:
+            raise ValueError(f"Columna desconocida: '{name}'. Columnas disponibles: {list(self.columns)}")
+
+
+def _reduce(aggregate: str, values: Optional[np.ndarray], count: int) -> Optional[float]:
+    if aggregate == "count":
+        return count
+    if len(values) == 0:
+        return None
+    return round(float(getattr(np, aggregate)(values)), 4)
+
+
+def _to_python(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+def _fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return hashlib.sha256(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")).hexdigest()
+
+
+# Tablas ya cargadas en este proceso (la caché .npz evita volver a leer el CSV entre ejecuciones).
+_tables: Dict[str, ColumnarTable] = {}
+
+
+def get_table(dataset: str) -> ColumnarTable:
+    if dataset not in DATASETS:
+        raise ValueError(f"Conjunto de datos desconocido: '{dataset}'. Disponibles: {list(DATASETS)}")
+    if dataset not in _tables:
+        _tables[dataset] = ColumnarTable.load(DATASETS[dataset])
+    return _tables[dataset]
+
+
+# ==============================================================================
+# FUNCIONES PARA EL AGENTE
+# ==============================================================================
+
+def describe_dataset(dataset: str = "electronics_products") -> str:
+    """
+    Describe las columnas (nombre y tipo) y el número de filas de un conjunto de datos tabular.
+
+    :param dataset (str): El nombre del conjunto de datos.
+    :return: El esquema del conjunto de datos como una cadena de texto JSON.
+    :rtype: str
+    """
+    try:
+        table = get_table(dataset)
+        return json.dumps({"dataset": dataset, "rows": table.row_count, "columns": table.schema()}, ensure_ascii=False)
+    except ValueError as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+
+def query_dataset(
+    dataset: str = "electronics_products",
+    aggregate: str = "count",
+    column: str = "",
+    group_by: str = "",
+    filters: str = "",
+    sort_descending: bool = True,
+    limit: int = 20,
+) -> str:
+    """
+    Calcula agregados (count, sum, mean, min, max, median) sobre un conjunto de datos tabular,
+    con filtros y agrupación opcionales. Úsala para preguntas como "precio medio por color".
+
+    :param dataset (str): El nombre del conjunto de datos.
+    :param aggregate (str): El agregado a calcular: count, sum, mean, min, max o median.
+    :param column (str): La columna numérica sobre la que se calcula el agregado (vacía para count).
+    :param group_by (str): La columna por la que agrupar (vacía para no agrupar).
+    :param filters (str): Condiciones separadas por ';', p. ej. "price > 100; colour == Red". Operadores: ==, !=, >, >=, <, <=, contains.
+    :param sort_descending (bool): Si True, ordena los grupos de mayor a menor valor del agregado.
+    :param limit (int): El número máximo de grupos a devolver.
+    :return: El resultado como una cadena de texto JSON.
+    :rtype: str
+    """
+    start = time.perf_counter()
+    try:
+        table = get_table(dataset)
+        conditions = [condition for condition in filters.split(";") if condition.strip()]
+        mask = table.filter_mask(conditions)
+        rows = table.aggregate(aggregate, column or None, group_by or None, mask)
+        if group_by:
+            rows.sort(key=lambda row: row[aggregate], reverse=sort_descending)
+            rows = rows[:limit]
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+        return json.dumps({"rows": rows, "matched_rows": int(mask.sum()), "elapsed_ms": elapsed_ms}, ensure_ascii=False)
+    except ValueError as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+
+def list_rows(
+    dataset: str = "electronics_products",
+    filters: str = "",
+    sort_by: str = "",
+    sort_descending: bool = False,
+    limit: int = 10,
+) -> str:
+    """
+    Devuelve filas de un conjunto de datos tabular, con filtros y ordenación opcionales.
+
+    :param dataset (str): El nombre del conjunto de datos.
+    :param filters (str): Condiciones separadas por ';', p. ej. "price > 100; colour == Red".
+    :param sort_by (str): La columna por la que ordenar (vacía para mantener el orden original).
+    :param sort_descending (bool): Si True, ordena de mayor a menor.
+    :param limit (int): El número máximo de filas a devolver.
+    :return: Las filas como una cadena de texto JSON.
+    :rtype: str
+    """
+    try:
+        table = get_table(dataset)
+        conditions = [condition for condition in filters.split(";") if condition.strip()]
+        indices = np.flatnonzero(table.filter_mask(conditions))
+        if sort_by:
+            keys = table.values(sort_by, indices)
+            order = np.argsort(keys, kind="stable")
+            indices = indices[order[::-1] if sort_descending else order]
+        matched_rows = len(indices)
+        indices = indices[:limit]
+        rows = [
+            {name: _to_python(value) for name, value in zip(table.columns, values)}
+            for values in zip(*(table.values(name, indices) for name in table.columns))
+        ]
+        return json.dumps({"rows": rows, "matched_rows": matched_rows}, ensure_ascii=False)
+    except ValueError as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+
+# Conjunto de funciones para FunctionTool, igual que en '005_Function_Calling/functions.py'.
+tabular_functions: Set[Callable[..., Any]] = {
+    describe_dataset,
+    query_dataset,
+    list_rows,
+}
+
+
+if __name__ == "__main__":
+    # Ejemplo: precio medio por color, sin crear agentes ni hilos.
+    print(describe_dataset())
+    print(query_dataset(aggregate="mean", column="price", group_by="colour"))
+    print(list_rows(filters="price > 400", sort_by="price", sort_descending=True, limit=3))
@@ -1,12 +1,16 @@
 # Importando las bibliotecas y utilidades necesarias.
 import os
 from azure.ai.projects import AIProjectClient
+from common.rate_limit import azure_pipeline_kwargs # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
 from azure.identity import DefaultAzureCredential
 # Importa las clases para manejar herramientas de función, conjuntos de herramientas y la herramienta de Bing.
 from azure.ai.projects.models import FunctionTool, ToolSet
 from .functions import user_functions # Importa tus funciones personalizadas (ej. get_user_info).
 from dotenv import load_dotenv
 from azure.ai.projects.models import BingGroundingTool
+from common.connections import ConnectionResolver # Resuelve conexiones del proyecto con caché.
+from common.tool_router import ToolRouter # Envía a cada ejecución solo las herramientas relevantes.
+import time
 
 # Carga las variables de entorno.
 load_dotenv()
@@ -17,11 +21,14 @@ project_connection_string = os.getenv("PROJECT_CONNECTION_STRING")
 project_client = AIProjectClient.from_connection_string(
     credential=DefaultAzureCredential(),
     conn_str=project_connection_string,
+    **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
 )
 
 # --- Configuración de la herramienta de Búsqueda de Bing ---
 bing_connection_name=os.getenv("BING_CONNECTION_NAME")
-bing_connection = project_client.connections.get(connection_name=bing_connection_name)
+# La conexión se resuelve una sola vez y se reutiliza desde la caché en ejecuciones posteriores.
+resolver = ConnectionResolver(project_client, scope=project_connection_string)
+bing_connection = resolver.get_by_name(bing_connection_name)
 conn_id = bing_connection.id
 # Inicializa el objeto de la herramienta de Bing.
 bing = BingGroundingTool(connection_id=conn_id)
@@ -40,6 +47,13 @@ with project_client:
     # 4. Añade la herramienta de Búsqueda de Bing al MISMO conjunto.
     toolset.add(bing)
     
+    # 5. Registra las mismas herramientas en el enrutador, con palabras clave que suelen aparecer en
+    #    las consultas que las necesitan. En cada ejecución solo se enviarán las relevantes.
+    router = ToolRouter()
+    router.register("usuarios", functions, keywords=["usuario", "id", "email", "correo", "detalles"])
+    router.register("bing", bing, description="Búsqueda en internet de información pública y actual",
+                    keywords=["buscar", "búsqueda", "internet", "web", "noticias", "actual"])
+
     # Crea un agente y le asigna el conjunto de herramientas combinado.
     # Ahora el agente puede tanto buscar usuarios como navegar por internet.
     agent = project_client.agents.create_agent(
@@ -56,10 +70,11 @@ with project_client:
     print(f"Hilo creado, ID: {thread.id}")
 
     # Crea un mensaje de usuario que requiere el uso de AMBAS herramientas.
+    content = "¿cuáles son los detalles del usuario con id 1 y realiza una búsqueda en internet sobre el nombre asociado a ese id de usuario?"
     message = project_client.agents.create_message(
         thread_id=thread.id,
         role="user",
-        content="¿cuáles son los detalles del usuario con id 1 y realiza una búsqueda en internet sobre el nombre asociado a ese id de usuario?",
+        content=content,
     )
     print(f"Mensaje creado, ID: {message.id}")
 
@@ -68,10 +83,19 @@ with project_client:
     # 1. Entenderá que primero debe buscar al usuario con ID 1, llamando a la función 'get_user_info'.
     # 2. Usará el nombre obtenido ("Alice") de esa función como término de búsqueda para la segunda herramienta (Bing).
     # 3. Sintetizará los resultados de ambas acciones en una respuesta final.
+    # El enrutador elige las herramientas según el mensaje y la ejecución recibe solo ese subconjunto
+    # ('toolset' sustituye a las herramientas del agente para esta ejecución), lo que reduce los tokens
+    # de prompt y el tiempo de planificación cuando la consulta no necesita todas las herramientas.
+    decision = router.route(content)
+    print(decision.report())
+    start = time.perf_counter()
     # [INICIO create_and_process_run]
-    run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
+    run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id, toolset=decision.toolset)
     # [FIN create_and_process_run]
-    print(f"Ejecución finalizada con estado: {run.status}")
+    print(f"Ejecución finalizada con estado: {run.status} en {time.perf_counter() - start:.2f}s")
+    if run.usage:
+        print(f"Tokens de la ejecución: prompt={run.usage.prompt_tokens}, respuesta={run.usage.completion_tokens} "
+              f"(~{decision.tokens_saved} tokens de definiciones ahorrados)")
 
     # Manejo de errores.
     if run.status == "failed":
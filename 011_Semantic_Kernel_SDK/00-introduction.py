@@ -1,11 +1,18 @@
 # Importando las bibliotecas necesarias de Semantic Kernel y otras utilidades.
 from semantic_kernel import Kernel
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from common.rate_limit import azure_openai_client # Cliente de Azure OpenAI con el limitador compartido de peticiones y tokens por minuto.
 from semantic_kernel.functions import KernelArguments
 import os
 import asyncio # Biblioteca para ejecutar código de forma asíncrona.
 import time
 from dotenv import load_dotenv
+# Invocación en lote con concurrencia adaptativa y resultados en orden.
+from batch_invoke import BatchInvoker, rows_from_csv
+# Plugins de plantillas de prompt precompilados (evita leer y validar cada config.json y skprompt.txt en cada arranque).
+from common.plugin_bundle import load_plugin
+# Invocación en streaming con métricas de tiempo hasta el primer token.
+from common.streaming import metrics, stream_function
 
 # 1. Se crea una instancia del Kernel. Este es el objeto central que orquestará todo.
 kernel = Kernel()
@@ -32,15 +39,18 @@ kernel.add_service(
     AzureChatCompletion(service_id=service_id,
                         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
                         deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
-                        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+                        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
+                        # Las llamadas al modelo respetan las cuotas del despliegue y las pausas de 'retry-after'.
+                        async_client=azure_openai_client(os.getenv("AZURE_OPENAI_ENDPOINT"), os.getenv("AZURE_OPENAI_API_KEY"), async_client=True),
     )
 )
 
 # 3. Se añade un "Plugin" al Kernel.
 # Un plugin es una colección de funciones (habilidades).
 # Aquí, se carga un plugin llamado "basic_plugin" desde un directorio local
-# que contiene plantillas de prompts.
-plugin = kernel.add_plugin(parent_directory = os.path.join(os.path.dirname(__file__), "plugins", "prompt_templates"), plugin_name = "basic_plugin")
+# que contiene plantillas de prompts. 'load_plugin' equivale a 'kernel.add_plugin(parent_directory=...)',
+# pero lee las plantillas de un paquete compilado que solo se regenera si cambian los archivos.
+plugin = load_plugin(kernel, os.path.join(os.path.dirname(__file__), "plugins", "prompt_templates"), "basic_plugin")
 
 # 4. Se selecciona una función específica del plugin.
 # Estamos obteniendo la función llamada "greeting" del "basic_plugin".
@@ -49,11 +59,17 @@ greeting_function = plugin["greeting"]
 # Definimos una función asíncrona para ejecutar la habilidad.
 async def greeting():
     try:
-        # 5. Se invoca la función a través del Kernel.
+        # 5. Se invoca la función a través del Kernel, en streaming.
         # El Kernel tomará la plantilla de prompt de 'greeting_function',
         # llenará los marcadores de posición con los 'KernelArguments' (nombre y edad),
-        # enviará el prompt completo al servicio de IA y devolverá la respuesta.
-        return await kernel.invoke(greeting_function, KernelArguments(name="Raul Sanchez", age="42"))
+        # enviará el prompt completo al servicio de IA y devolverá la respuesta por fragmentos,
+        # que se muestran en cuanto llegan (en lugar de esperar a la respuesta completa).
+        response = ""
+        async for text in stream_function(kernel, greeting_function, KernelArguments(name="Raul Sanchez", age="42")):
+            print(text, end="", flush=True)
+            response += text
+        print()
+        return response
     except Exception as e:
         print(f"Error detallado al invocar la función: {e}")
         print(f"Tipo de error: {type(e)}")
@@ -61,8 +77,24 @@ async def greeting():
             print(f"Causa del error: {e.__cause__}")
         raise
 
-# 6. Se ejecuta la función asíncrona y se obtiene el resultado.
+# 6. Se ejecuta la función asíncrona; la respuesta se imprime mientras se genera.
 greeting_response =  asyncio.run(greeting())
 
-# Se imprime la respuesta final generada por el modelo de IA.
-print(greeting_response)
\ No newline at end of file
+# Se imprimen el tiempo hasta el primer token, la latencia entre fragmentos y la duración total.
+print(f"\n{metrics.summary()}")
+
+# 7. Saludos para todos los clientes de un CSV.
+# En lugar de un 'kernel.invoke' por cliente en un bucle, 'BatchInvoker' procesa las filas en
+# paralelo (con reintentos por fila; las cuotas las aplica el limitador del proceso) y mantiene el orden del CSV.
+async def greetings():
+    invoker = BatchInvoker(kernel, greeting_function, max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "8")))
+    customers = rows_from_csv(
+        os.path.join(os.path.dirname(__file__), "data", "customers.csv"),
+        columns={"name": "name", "age": "age"},
+    )
+    results = await invoker.run(customers)
+    for item in results:
+        print(f"\n[{item.index}] {item.output if item.ok else 'Error: ' + str(item.error)}")
+    print(f"\n{invoker.report.summary()}")
+
+asyncio.run(greetings())
\ No newline at end of file
@@ -1,9 +1,16 @@
 from semantic_kernel import Kernel
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from common.rate_limit import azure_openai_client # Cliente de Azure OpenAI con el limitador compartido de peticiones y tokens por minuto.
 from semantic_kernel.functions import KernelArguments
 import os
 from dotenv import load_dotenv
 import asyncio
+# Invocación en lote con concurrencia adaptativa y resultados en orden.
+from batch_invoke import BatchInvoker, rows_from_csv
+# Plugins de plantillas de prompt precompilados (evita leer y validar cada config.json y skprompt.txt en cada arranque).
+from common.plugin_bundle import load_plugin
+# Invocación en streaming con métricas de tiempo hasta el primer token.
+from common.streaming import metrics, stream_function
 
 # 1. Se crea una instancia del Kernel.
 kernel = Kernel()
@@ -17,21 +24,25 @@ kernel.add_service(
     AzureChatCompletion(service_id=service_id,
                         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
                         deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
-                        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+                        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
+                        # Las llamadas al modelo respetan las cuotas del despliegue y las pausas de 'retry-after'.
+                        async_client=azure_openai_client(os.getenv("AZURE_OPENAI_ENDPOINT"), os.getenv("AZURE_OPENAI_API_KEY"), async_client=True),
     )
 )
 
-# 3. Se carga el plugin que contiene nuestras funciones.
-plugin = kernel.add_plugin(parent_directory = os.path.join(os.path.dirname(__file__), "plugins", "prompt_templates"), plugin_name = "basic_plugin")
+# 3. Se carga el plugin que contiene nuestras funciones (desde su paquete compilado).
+plugin = load_plugin(kernel, os.path.join(os.path.dirname(__file__), "plugins", "prompt_templates"), "basic_plugin")
 
 # 4. Se selecciona la función específica 'contact_information' del plugin.
 contact_function = plugin["contact_information"]
 
 # Define la función asíncrona que ejecutará la llamada al Kernel.
 async def contact():
-    # 5. Se invoca la función, pasando todos los datos de contacto como argumentos.
-    # El Kernel usará estos argumentos para rellenar la plantilla del prompt.
-    return await kernel.invoke(
+    # 5. Se invoca la función en streaming, pasando todos los datos de contacto como argumentos.
+    # El Kernel usará estos argumentos para rellenar la plantilla del prompt y la respuesta se
+    # imprime a medida que llega.
+    async for text in stream_function(
+        kernel,
         contact_function, 
         KernelArguments(
             name="Raul Sanchez", 
@@ -39,7 +50,28 @@ async def contact():
             email_id="hello@gmail.com", 
             address="1234, 5th Avenue, New York, NY 10001"
         )
+    ):
+        print(text, end="", flush=True)
+    print()
+
+# 6. Se ejecuta la función asíncrona (el resultado se imprime mientras se genera) y se muestran
+# el tiempo hasta el primer token y la duración de la llamada.
+asyncio.run(contact())
+print(f"\n{metrics.summary()}")
+
+# 7. La misma función para un CSV completo de clientes.
+# 'BatchInvoker' lee el CSV fila a fila, lanza varias invocaciones a la vez (el limitador del proceso
+# adapta la concurrencia real si el servicio responde 429), reintenta las filas que fallan y devuelve
+# las fichas en el mismo orden que el CSV.
+async def contact_cards():
+    invoker = BatchInvoker(kernel, contact_function, max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "8")))
+    customers = rows_from_csv(
+        os.path.join(os.path.dirname(__file__), "data", "customers.csv"),
+        columns={"name": "name", "contact_number": "contact_number", "email_id": "email_id", "address": "address"},
     )
+    async for item in invoker.stream(customers):
+        print(f"\n[{item.index}] {item.arguments['name']} ({item.attempts} intento(s), {item.seconds:.2f}s)")
+        print(item.output if item.ok else f"Error: {item.error}")
+    return invoker.report
 
-# 6. Se ejecuta la función asíncrona y se imprime el resultado final.
-print(asyncio.run(contact()))
\ No newline at end of file
+print(f"\n{asyncio.run(contact_cards()).summary()}")
\ No newline at end of file
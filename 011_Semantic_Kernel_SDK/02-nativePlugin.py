@@ -2,12 +2,18 @@ import asyncio
 import os
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from common.rate_limit import azure_openai_client # Cliente de Azure OpenAI con el limitador compartido de peticiones y tokens por minuto.
 from semantic_kernel import Kernel
 import math
 from typing import Annotated
 
 # Importa el decorador que convierte una función de Python en una habilidad del Kernel.
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
+from semantic_kernel.functions import KernelArguments, KernelFunctionFromPrompt
+# Invocación en streaming con métricas de tiempo hasta el primer token.
+from common.streaming import metrics, stream_function
+# Evaluador aritmético seguro y operaciones vectorizadas con NumPy.
+from common.safe_math import elementwise, evaluate, to_expression
 
 # --- Configuración Inicial ---
 kernel = Kernel()
@@ -19,7 +25,9 @@ kernel.add_service(
     AzureChatCompletion(service_id=service_id,
                         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
                         deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
-                        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+                        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
+                        # Las llamadas al modelo respetan las cuotas del despliegue y las pausas de 'retry-after'.
+                        async_client=azure_openai_client(os.getenv("AZURE_OPENAI_ENDPOINT"), os.getenv("AZURE_OPENAI_API_KEY"), async_client=True),
     )
 )
 
@@ -37,6 +45,7 @@ class Math:
         {{math.Subtract}} => Devuelve la resta de la entrada y 'amount' (proporcionados en KernelArguments)
         {{math.Multiply}} => Devuelve la multiplicación de la entrada y 'number2' (proporcionados en KernelArguments)
         {{math.Divide}} => Devuelve la división de la entrada y 'number2' (proporcionados en KernelArguments)
+        {{math.Evaluate}} => Devuelve el resultado de la expresión 'expression' (p. ej. "(5 + 2) * sqrt(16)")
     """
 
     # El decorador '@kernel_function' expone este método al Kernel como una habilidad.
@@ -93,6 +102,59 @@ class Math:
     ) -> Annotated[float, "la salida es un número flotante"]:
         return float(number1) - float(number2)
 
+    # --- Cálculos completos y operaciones sobre listas ---
+    # Con 'Evaluate' el modelo resuelve un cálculo de varios pasos en una sola llamada, en lugar de
+    # encadenar una llamada por operación. El evaluador no usa 'eval': solo admite aritmética.
+    @kernel_function(
+        description="Evalúa una expresión aritmética completa, p. ej. '(5 + 2) * sqrt(16) / 3' o 'base = 1200 * 1.21; base - 50'. Úsala para resolver un cálculo de varios pasos en una sola llamada.",
+        name="Evaluate",
+    )
+    def evaluate_expression(
+        self,
+        expression: Annotated[str, "la expresión aritmética (admite + - * / ** %, paréntesis, sqrt, abs, round, min, max, log, exp, pi y pasos con variables separados por ';')"],
+    ) -> Annotated[float, "el resultado de la expresión"]:
+        return float(evaluate(expression))
+
+    # Versiones vectorizadas (NumPy): operan elemento a elemento sobre listas de números.
+    @kernel_function(description="Suma dos listas de números elemento a elemento.", name="AddVectors")
+    def add_vectors(
+        self,
+        numbers1: Annotated[list[float], "la primera lista de números"],
+        numbers2: Annotated[list[float], "la segunda lista de números (o un único número para sumarlo a todos)"],
+    ) -> Annotated[list[float], "la lista de sumas"]:
+        return elementwise("add", numbers1, numbers2)
+
+    @kernel_function(description="Resta dos listas de números elemento a elemento.", name="SubtractVectors")
+    def subtract_vectors(
+        self,
+        numbers1: Annotated[list[float], "la lista de números"],
+        numbers2: Annotated[list[float], "la lista de números a restar (o un único número para restarlo a todos)"],
+    ) -> Annotated[list[float], "la lista de diferencias"]:
+        return elementwise("subtract", numbers1, numbers2)
+
+    @kernel_function(description="Multiplica dos listas de números elemento a elemento.", name="MultiplyVectors")
+    def multiply_vectors(
+        self,
+        numbers1: Annotated[list[float], "la primera lista de números"],
+        numbers2: Annotated[list[float], "la segunda lista de números (o un único número para multiplicar todos)"],
+    ) -> Annotated[list[float], "la lista de productos"]:
+        return elementwise("multiply", numbers1, numbers2)
+
+    @kernel_function(description="Divide dos listas de números elemento a elemento.", name="DivideVectors")
+    def divide_vectors(
+        self,
+        numbers1: Annotated[list[float], "la lista de dividendos"],
+        numbers2: Annotated[list[float], "la lista de divisores (o un único número para dividir todos)"],
+    ) -> Annotated[list[float], "la lista de cocientes"]:
+        return elementwise("divide", numbers1, numbers2)
+
+    @kernel_function(description="Calcula la raíz cuadrada de cada número de una lista.", name="SqrtVector")
+    def sqrt_vector(
+        self,
+        numbers: Annotated[list[float], "la lista de números"],
+    ) -> Annotated[list[float], "la lista de raíces cuadradas"]:
+        return elementwise("sqrt", numbers)
+
 # --- Uso del Plugin ---
 # Se crea una instancia de la clase Math y se añade al Kernel como un plugin llamado "Math".
 math_plugin = kernel.add_plugin(Math(), "Math")
@@ -106,4 +168,39 @@ async def square_root():
     return await kernel.invoke(sqrt_function, number1=4)
 
 # Ejecuta la función y muestra el resultado.
-print(asyncio.run(square_root()))
\ No newline at end of file
+print(asyncio.run(square_root()))
+
+# --- Cálculos locales, sin llamar al modelo ---
+# Las peticiones que son un cálculo sencillo ("suma 5 y 2") se traducen a una expresión y se
+# resuelven en local con 'Math.Evaluate'; solo las demás necesitarían ir al LLM.
+evaluate_function = math_plugin["Evaluate"]
+
+async def calculate(question: str):
+    expression = to_expression(question)
+    if expression is None:
+        return None
+    return await kernel.invoke(evaluate_function, expression=expression)
+
+for question in ["suma 5 y 2", "raíz cuadrada de 16", "cuánto es (5 + 2) * 3 / 7?"]:
+    print(f"{question} => {asyncio.run(calculate(question))}")
+
+# Las versiones vectorizadas operan sobre listas completas en una sola llamada.
+print(asyncio.run(kernel.invoke(math_plugin["MultiplyVectors"], numbers1=[10, 20, 30], numbers2=[1.21])))
+
+# --- Respuesta al usuario en streaming ---
+# Una función de prompt puede llamar a funciones nativas desde su plantilla ('{{Math.Sqrt ...}}').
+# La respuesta del modelo se muestra por fragmentos a medida que llega y se registra el tiempo
+# hasta el primer token de cada función.
+explain_function = KernelFunctionFromPrompt(
+    function_name="ExplainSqrt",
+    plugin_name="Math",
+    prompt="La raíz cuadrada de {{$number}} es {{Math.Sqrt number1=$number}}. Explica en dos frases cómo se comprueba este resultado.",
+)
+
+async def explain_square_root():
+    async for text in stream_function(kernel, explain_function, KernelArguments(number=4)):
+        print(text, end="", flush=True)
+    print()
+
+asyncio.run(explain_square_root())
+print(f"\n{metrics.summary()}")
\ No newline at end of file
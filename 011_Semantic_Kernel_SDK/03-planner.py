@@ -2,9 +2,19 @@ from semantic_kernel import Kernel
 import os
 import asyncio
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from common.rate_limit import azure_openai_client # Cliente de Azure OpenAI con el limitador compartido de peticiones y tokens por minuto.
 from dotenv import load_dotenv
 # Importa la clase del planificador secuencial.
 from semantic_kernel.planners import SequentialPlanner
+from semantic_kernel.functions import KernelArguments
+# Caché de planes: evita pedir al LLM el mismo plan en cada ejecución.
+from plan_cache import PlanCache
+# Ejecutor que lanza en paralelo los pasos del plan que no dependen entre sí.
+from plan_executor import PlanExecutor
+# Resumen map-reduce para documentos que no caben (o tardarían demasiado) en una sola llamada.
+from map_reduce_summary import MapReduceSummarizer
+# Plugins de plantillas de prompt precompilados (evita leer y validar cada config.json y skprompt.txt en cada arranque).
+from common.plugin_bundle import load_plugin
 
 # --- Configuración Inicial ---
 kernel = Kernel()
@@ -14,7 +24,9 @@ kernel.add_service(
     AzureChatCompletion(service_id=service_id,
                         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
                         deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
-                        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+                        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
+                        # Las llamadas al modelo respetan las cuotas del despliegue y las pausas de 'retry-after'.
+                        async_client=azure_openai_client(os.getenv("AZURE_OPENAI_ENDPOINT"), os.getenv("AZURE_OPENAI_API_KEY"), async_client=True),
     )
 )
 
@@ -28,7 +40,7 @@ planner = SequentialPlanner(
 # 2. Se cargan las herramientas que el planificador podrá usar.
 # Este 'writerPlugin' debe contener funciones como 'Summarize' y 'Email'.
 #kernel.add_plugin(parent_directory="../plugins/prompt_templates/", plugin_name="writerPlugin")
-kernel.add_plugin(parent_directory = os.path.join(os.path.dirname(__file__), "plugins", "prompt_templates"), plugin_name = "writerPlugin")
+load_plugin(kernel, os.path.join(os.path.dirname(__file__), "plugins", "prompt_templates"), "writerPlugin")
 
 # (Opcional) Imprime todas las funciones disponibles para que veas qué herramientas tiene el planificador.
 print("Funciones cargadas en el Kernel:")
@@ -37,23 +49,44 @@ for plugin_name, plugin in kernel.plugins.items():
         print(f"  - Plugin: {plugin_name}, Función: {function_name}")
         
 # 3. Se prepara la entrada de datos.
+# El documento se lee por fragmentos y, si no cabe en uno, se resumen los fragmentos en paralelo y
+# se combinan los resúmenes por niveles hasta que el texto cabe en un fragmento; el paso de resumen
+# del plan hace la reducción final. Los resúmenes parciales se guardan por hash del fragmento, así
+# que al editar una sección solo se vuelve a resumir esa parte. Un documento corto (como este) se
+# pasa tal cual, sin llamadas extra al modelo.
 file_path = os.path.join(os.path.dirname(__file__), "data", "chatgpt.txt")
-text=" "
-with open(file_path, "r") as file:
-    chatgpt = file.read()
-    text = text+chatgpt
-    
+summarizer = MapReduceSummarizer(
+    kernel,
+    kernel.get_function("writerPlugin", "summarise"),
+    max_concurrency=int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4")),
+)
+text = asyncio.run(summarizer.condense(file_path))
+stats = summarizer.stats
+print(
+    f"\nDocumento: {stats.chunks} fragmento(s), {stats.levels} nivel(es) de resumen, "
+    f"{stats.llm_calls} llamada(s) al modelo, {stats.cache_hits} resumen(es) de la caché, {stats.seconds:.2f}s"
+)
+
 # 4. Se define el OBJETIVO de alto nivel en lenguaje natural.
-goal = f"resume este texto: {text} y envíalo por correo a sam@gmail.com"
+# El objetivo es una plantilla con variables: el planificador recibe '$text' y '$email' en lugar de
+# sus valores, de modo que el mismo plan sirve para cualquier texto o destinatario (y el prompt
+# del planificador no incluye el texto completo).
+goal_template = "resume este texto: {text} y envíalo por correo a {email}"
+variables = {"text": text, "email": "sam@gmail.com"}
+
+# Caché de planes en disco, indexada por la plantilla del objetivo, los plugins cargados y el modelo.
+plan_cache = PlanCache(model=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"))
         
 # Define una función asíncrona para que el planificador cree el plan.
 async def call_planner():
-    # 5. Se le pide al planificador que cree un plan para alcanzar el objetivo.
-    # El planificador analizará el objetivo y seleccionará las funciones necesarias del 'writerPlugin'.
-    return await planner.create_plan(goal)
+    # 5. Se obtiene el plan de la caché o, si no existe (o cambiaron los plugins), se le pide al
+    # planificador que lo cree. El planificador analizará el objetivo y seleccionará las funciones
+    # necesarias del 'writerPlugin'.
+    return await plan_cache.get_or_create(planner, kernel, goal_template, variables)
 
 # Ejecuta la creación del plan.
-sequential_plan = asyncio.run(call_planner())
+sequential_plan, from_cache = asyncio.run(call_planner())
+print(f"\nPlan {'recuperado de la caché' if from_cache else 'generado por el planificador'}")
 
 # 6. Se imprime el plan generado para que podamos ver los pasos que la IA ha decidido seguir.
 print("\nLos pasos del plan son:")
@@ -65,11 +98,20 @@ for step in sequential_plan._steps:
 # Define una función asíncrona para ejecutar el plan.
 async def generate_answer():
     # 7. Se ejecuta el plan completo.
-    # El Kernel llamará a cada función en la secuencia, pasando la salida de un paso como entrada al siguiente.
-    return await sequential_plan.invoke(kernel)
+    # En lugar de 'sequential_plan.invoke(kernel)', que ejecuta los pasos uno detrás de otro, el
+    # ejecutor construye un grafo con las variables que lee y escribe cada paso y lanza a la vez
+    # los pasos independientes (con un límite de concurrencia). Los pasos que sí dependen de otro
+    # siguen recibiendo su salida, igual que con 'invoke'.
+    executor = PlanExecutor(kernel, max_concurrency=int(os.getenv("PLAN_MAX_CONCURRENCY", "4")))
+    # Los resultados intermedios se muestran en cuanto termina cada paso.
+    async for step_result in executor.stream(sequential_plan, KernelArguments(**variables)):
+        print(f"\n[Paso {step_result.index}: {step_result.name} -> {step_result.status} en {step_result.seconds:.2f}s]")
+        print(step_result.output if step_result.status == "completed" else step_result.error)
+    return executor.report
 
 # Ejecuta el plan y obtiene el resultado final.
-result = asyncio.run(generate_answer())
+report = asyncio.run(generate_answer())
 
-# Imprime el resultado final de la ejecución de todo el plan.
-print(f"\nResultado final:\n{result}")
\ No newline at end of file
+# Imprime los tiempos de cada paso y el resultado final de la ejecución de todo el plan.
+print(f"\n{report.summary()}")
+print(f"\nResultado final:\n{report.result}")
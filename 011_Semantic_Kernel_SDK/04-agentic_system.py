@@ -16,6 +16,15 @@ from semantic_kernel.functions.kernel_function_decorator import kernel_function
 from azure.ai.projects import AIProjectClient  # El cliente para interactuar con el servicio de Agentes de Azure AI.
 from azure.identity import DefaultAzureCredential  # Para manejar la autenticación con Azure.
 from azure.ai.projects.models import BingGroundingTool  # La herramienta específica para la búsqueda con Bing.
+from common.rate_limit import azure_openai_client, azure_pipeline_kwargs, limiter_stats  # Limitador compartido de peticiones y tokens por minuto (respuestas 429).
+from common.connections import ConnectionResolver  # Resuelve conexiones del proyecto con caché en memoria y en disco.
+from common.grounding_cache import GroundingCache, url_citations  # Caché de búsquedas con caducidad según el tipo de consulta.
+from azure.ai.projects.aio import AIProjectClient as AsyncAIProjectClient  # Cliente asíncrono: no bloquea el bucle de eventos del kernel.
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
+from common.agent_pool import AgentPool, WorkerSpec  # Agentes trabajadores de larga duración con hilos reutilizables.
+from semantic_kernel.functions import KernelArguments
+from plan_cache import PlanCache  # Caché en disco de planes para objetivos recurrentes.
+from news_pipeline import NewsPipeline  # Búsqueda y guion en streaming para varios temas a la vez.
 
 # --- Cargando las variables de entorno ---
 # Carga las claves y configuraciones desde tu archivo .env para mantenerlas seguras.
@@ -27,12 +36,52 @@ ai_project_connection_string = os.getenv("AI_PROJECT_CONNECTION_STRING")  # La c
 bing_connection_name = os.getenv("BING_CONNECTION_NAME")  # El nombre de tu conexión de Bing preconfigurada en Azure.
 
 # --- Creando el cliente de Azure AI ---
-# Este objeto se usará para crear los agentes "trabajadores" o "especialistas".
+# Este cliente síncrono solo se usa para resolver la conexión de Bing (normalmente desde la caché).
 project_client = AIProjectClient.from_connection_string(
         credential=DefaultAzureCredential(), # Usa tus credenciales de Azure para autenticarte.
-        conn_str=ai_project_connection_string # Usa la cadena de conexión para apuntar al servicio correcto.
+        conn_str=ai_project_connection_string, # Usa la cadena de conexión para apuntar al servicio correcto.
+        **azure_pipeline_kwargs(), # Cada petición pasa por el limitador del proceso (cuotas y 'retry-after').
         )
 
+# --- Resolvedor de conexiones con caché ---
+# Evita consultar la conexión de Bing al servicio en cada invocación de la herramienta.
+connection_resolver = ConnectionResolver(project_client, scope=ai_project_connection_string)
+# La herramienta de Bing se prepara una sola vez y la comparten todas las búsquedas.
+bing = BingGroundingTool(connection_id=connection_resolver.get_by_name(bing_connection_name).id)
+
+# --- Cliente asíncrono y grupo de agentes trabajadores ---
+# Los agentes "especialistas" se crean una sola vez (la primera vez que se usan) y se reutilizan,
+# junto con un grupo de hilos, en todas las invocaciones. Todas las llamadas van por un único cliente
+# asíncrono, así que los pasos del plan no bloquean el bucle de eventos del kernel.
+async_credential = AsyncDefaultAzureCredential()
+async_project_client = AsyncAIProjectClient.from_connection_string(
+        credential=async_credential,
+        conn_str=ai_project_connection_string,
+        **azure_pipeline_kwargs(async_client=True), # El mismo limitador, en su versión asíncrona.
+        )
+worker_pool = AgentPool(async_project_client, size=int(os.getenv("AGENT_POOL_SIZE", "2")))
+worker_pool.register("web", WorkerSpec(
+    name="bing-assistant",
+    model=azure_openai_deployment_name,
+    instructions="Eres un asistente útil",
+    tools=bing.definitions, # La única herramienta que tendrá es la búsqueda de Bing.
+    headers={"x-ms-enable-preview": "true"},
+))
+worker_pool.register("reporter", WorkerSpec(
+    name="news-reporter",
+    model=azure_openai_deployment_name,
+    # Las instrucciones son muy detalladas para asegurar que el resultado sea de alta calidad.
+    instructions="""Eres un asistente útil destinado a preparar un guion para un reportero de noticias basado en la información más reciente sobre un tema específico, los cuales se te proporcionarán.
+                El canal de noticias se llama MSinghTV y el reportero se llama John. Se te dará el tema y la información más reciente para ese tema. Prepara un guion para el reportero John basado en esta información.""",
+    headers={"x-ms-enable-preview": "true"}, # No tiene herramientas, solo instrucciones.
+))
+
+# --- Caché de búsquedas con grounding ---
+# Evita repetir la misma búsqueda en Bing dentro de su periodo de vigencia (minutos para el clima,
+# una hora para las noticias, días para datos de referencia); las entradas recién caducadas se
+# sirven al momento y se refrescan en segundo plano.
+grounding_cache = GroundingCache(scope=azure_openai_deployment_name)
+
 # ==============================================================================
 # SECCIÓN 2: DEFINICIÓN DEL PLUGIN DE AGENTES (LOS "ESPECIALISTAS")
 # ==============================================================================
@@ -51,55 +100,40 @@ class Agents:
         # El nombre es cómo el Planificador se referirá a esta herramienta en el plan.
         name="WebSearchAgent"
     )
-    def web_search_agent(
+    async def web_search_agent(
         self, # Parámetro estándar en los métodos de una clase.
         # 'Annotated' permite describir cada parámetro. Esto también ayuda al Planificador.
         query: Annotated[str, "La consulta del usuario para la cual se necesita obtener información contextual de la web"]
     ) -> Annotated[str, "La respuesta del agente de búsqueda web"]:
         """
         Esta función completa es el 'Departamento de Investigación'. Cuando se invoca,
-        crea un agente de Azure AI desde cero, le da la herramienta de Bing, le asigna
-        la tarea de buscar la 'query', y devuelve el resultado.
+        busca primero la 'query' en la caché de búsquedas; si no está (o ha caducado del todo),
+        toma un trabajador del grupo (un agente de Azure AI con la herramienta de Bing y un hilo
+        reutilizable), le asigna la tarea de buscarla y devuelve el resultado.
         """
-        # Obtiene los detalles de la conexión de Bing preconfigurada en Azure.
-        bing_connection = project_client.connections.get(connection_name=bing_connection_name)
-        conn_id = bing_connection.id
-        # Prepara la herramienta de Bing para dársela al agente.
-        bing = BingGroundingTool(connection_id=conn_id)
-        
-        # Crea un agente de Azure AI temporal y especializado. Su única misión es buscar.
-        agent = project_client.agents.create_agent(
-            model=azure_openai_deployment_name,
-            name="bing-assistant", # Un nombre temporal para este agente.
-            instructions="Eres un asistente útil",
-            tools=bing.definitions, # La única herramienta que tendrá es la búsqueda de Bing.
-            headers={"x-ms-enable-preview": "true"},
-        )
-        # Cada agente necesita un "hilo" de conversación para operar.
-        thread = project_client.agents.create_thread()
-        # Se añade la consulta de búsqueda como el primer mensaje en la conversación.
-        message = project_client.agents.create_message(
-                thread_id=thread.id,
-                role="user",
-                content=query,
-            )
-        # Se le ordena al agente que procese la conversación y genere una respuesta.
-        run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
-        # Se recupera la lista de mensajes, donde la respuesta del agente será la más reciente.
-        messages = project_client.agents.list_messages(thread_id=thread.id)
-        
+        result = await grounding_cache.aget_or_fetch(query, fetch=self._search_with_bing)
+
         # Se imprime la respuesta para poder ver el progreso en la consola.
-        print(f"\n--- [Respuesta del Investigador Web] ---\n{messages.data[0].content[0].text.value}\n---------------------------------------\n")
-        
+        print(f"\n--- [Respuesta del Investigador Web ({result.source}, clase '{result.query_class}')] ---\n{result.answer}\n---------------------------------------\n")
+        for url in result.citations:
+            print(f"Fuente (URL): {url}")
+
         # Se devuelve únicamente el texto de la respuesta, que será la entrada para el siguiente paso del plan.
-        return messages.data[0].content[0].text.value
+        return result.answer
+
+    async def _search_with_bing(self, query: str):
+        """Ejecuta la búsqueda con un trabajador del grupo y devuelve (respuesta, URLs citadas)."""
+        # El agente de búsqueda ya existe (se crea la primera vez); solo se envía un mensaje a uno de sus hilos.
+        async with worker_pool.lease("web") as worker:
+            message = await worker.ask_message(query)
+        return message.content[0].text.value, url_citations(message)
     
     # --- Agente Especialista 2: El Guionista de Noticias ---
     @kernel_function(
        description="Esta función usará un agente de IA de Azure para preparar un guion para un reportero de noticias basado en información reciente para un tema específico",
        name="NewsReporterAgent"
    )
-    def news_reporter_agent(
+    async def news_reporter_agent(
         self,
         topic: Annotated[str, "El tema para el cual se ha obtenido la información/noticia más reciente"],
         latest_news: Annotated[str,"La información más reciente para un tema específico"]
@@ -108,33 +142,15 @@ class Agents:
         Esta función completa es el 'Departamento de Redacción'. Recibe la información
         investigada y su única misión es escribir un guion con un formato específico.
         """
-        # Crea un segundo agente de Azure AI, también temporal y especializado. Su única misión es escribir.
-        agent = project_client.agents.create_agent(
-            model=azure_openai_deployment_name,
-            name="news-reporter",
-            # Las instrucciones son muy detalladas para asegurar que el resultado sea de alta calidad.
-            instructions="""Eres un asistente útil destinado a preparar un guion para un reportero de noticias basado en la información más reciente sobre un tema específico, los cuales se te proporcionarán.
-                El canal de noticias se llama MSinghTV y el reportero se llama John. Se te dará el tema y la información más reciente para ese tema. Prepara un guion para el reportero John basado en esta información.""",
-            headers={"x-ms-enable-preview": "true"}, # No tiene herramientas, solo instrucciones.
-        )
-        # Al igual que el otro agente, necesita su propio hilo de conversación.
-        thread = project_client.agents.create_thread()
-        # Se le entrega la información (el tema y las noticias) en forma de un mensaje.
-        message = project_client.agents.create_message(
-                thread_id=thread.id,
-                role="user",
-                content=f"""El tema es {topic} y la información más reciente es {latest_news}""",
-            )
-        # Se le ordena al agente que escriba el guion.
-        run = project_client.agents.create_and_process_run(thread_id=thread.id, assistant_id=agent.id)
-        # Se recupera el guion final de la conversación.
-        messages = project_client.agents.list_messages(thread_id=thread.id)
+        # Se toma un trabajador del grupo (el agente guionista, creado una sola vez) y se le entrega
+        # la información (el tema y las noticias) en forma de un mensaje.
+        script = await worker_pool.ask("reporter", f"""El tema es {topic} y la información más reciente es {latest_news}""")
         
         # Se imprime el guion final.
-        print(f"\n--- [Guion del Reportero de Noticias] ---\n{messages.data[0].content[0].text.value}\n----------------------------------------\n")
+        print(f"\n--- [Guion del Reportero de Noticias] ---\n{script}\n----------------------------------------\n")
             
         # Se devuelve el guion como el resultado final de esta función.
-        return messages.data[0].content[0].text.value
+        return script
 
 # ==============================================================================
 # SECCIÓN 3: INICIALIZACIÓN DEL KERNEL Y EL PLANIFICADOR (EL "DIRECTOR")
@@ -149,7 +165,9 @@ kernel.add_service(
     AzureChatCompletion(service_id=service_id,
                         api_key=azure_openai_key,
                         deployment_name=azure_openai_deployment_name,
-                        endpoint = azure_openai_endpoint
+                        endpoint = azure_openai_endpoint,
+                        # Las llamadas del planificador comparten el limitador con los agentes.
+                        async_client=azure_openai_client(azure_openai_endpoint, azure_openai_key, async_client=True),
     )
 )
 
@@ -163,6 +181,10 @@ planner = SequentialPlanner(
 # Este es el paso crucial donde el "Director" conoce a su "equipo de especialistas".
 agents_plugin = kernel.add_plugin(Agents(), "Agents")
 
+# Caché de planes: el objetivo se repite en cada ejecución, así que el plan se guarda en disco y se
+# reutiliza mientras no cambien los plugins registrados ni el modelo.
+plan_cache = PlanCache(model=azure_openai_deployment_name)
+
 
 # ==============================================================================
 # SECCIÓN 4: EJECUCIÓN DEL PLAN
@@ -172,14 +194,17 @@ async def main():
     """Función principal asíncrona que orquesta todo el proceso."""
     
     # Se define el objetivo de alto nivel para el planificador.
-    objetivo = f"preparar un guion de noticias para John sobre las últimas noticias de la India?"
-    print(f"🎯 Objetivo: {objetivo}\n")
+    # Es una plantilla: el tema es una variable, así el mismo plan sirve para cualquier país o tema.
+    plantilla_objetivo = "preparar un guion de noticias para John sobre las últimas noticias de {topic}?"
+    variables = {"topic": "la India"}
+    print(f"🎯 Objetivo: {plantilla_objetivo.format(**variables)}\n")
 
     # --- Fase de Planificación ---
     print("🧠  El Director está pensando y creando un plan...")
-    # Se le pide al planificador que cree un plan para alcanzar el objetivo.
-    # En este momento, el planificador está llamando a la IA para que razone.
-    sequential_plan = await planner.create_plan(objetivo)
+    # Se recupera el plan de la caché o, si no existe (o cambiaron los plugins), se le pide al
+    # planificador que lo cree. Solo en ese caso el planificador llama a la IA para que razone.
+    sequential_plan, desde_cache = await plan_cache.get_or_create(planner, kernel, plantilla_objetivo, variables)
+    print(f"📦 Plan {'recuperado de la caché' if desde_cache else 'generado por el planificador'}")
 
     # Se imprime el plan que el planificador ha decidido seguir.
     print("\n📝 Los pasos del plan son:")
@@ -192,13 +217,71 @@ async def main():
     print("\n🚀 Ejecutando el plan...")
     # Se invoca el plan. El Kernel ejecutará cada paso en secuencia,
     # pasando automáticamente la salida de un paso como la entrada del siguiente.
-    result = await sequential_plan.invoke(kernel)
+    result = await sequential_plan.invoke(kernel, KernelArguments(**variables))
+
+    print(f"📦 Caché de búsquedas: {grounding_cache.stats}")
+    for role, stats in worker_pool.stats.items():
+        print(f"👷 Trabajador '{role}': {stats.calls} llamadas en {stats.seconds:.2f}s, {stats.threads_created} hilos creados")
+    for service, stats in limiter_stats().items():
+        print(f"🚦 Limitador de cuota ({service}): {stats}")
 
     print("\n✅ Ejecución finalizada.")
     # El resultado final (el guion) ya se imprime dentro de la función 'news_reporter_agent'.
     # La variable 'result' contiene el mismo valor.
 
+# ==============================================================================
+# SECCIÓN 5: LOTE DE GUIONES EN PIPELINE
+# ==============================================================================
+
+# Con la variable NEWS_TOPICS (temas separados por comas) se prepara un guion por tema sin pasar
+# por el planificador: la búsqueda llega por fragmentos y el guionista empieza a escribir en cuanto
+# hay información suficiente, mientras los demás temas avanzan por las mismas dos etapas.
+async def stream_search(topic: str):
+    """Búsqueda con Bing de las últimas noticias de un tema, devuelta por fragmentos."""
+    async with worker_pool.lease("web") as worker:
+        async for text in worker.ask_stream(f"últimas noticias de {topic}"):
+            yield text
+
+
+async def batch(topics):
+    """Prepara un guion por tema con la pipeline de dos etapas y muestra sus métricas."""
+    print(f"🗞️  Preparando {len(topics)} guiones en pipeline: {', '.join(topics)}")
+    pipeline = NewsPipeline(
+        stream_search,
+        write=lambda prompt: worker_pool.ask("reporter", prompt),
+        # Tantas tareas por etapa como hilos tiene el grupo de trabajadores de cada rol.
+        search_concurrency=worker_pool.size,
+        write_concurrency=worker_pool.size,
+    )
+    report = await pipeline.run(topics)
+    for result in report.results:
+        if result.error:
+            print(f"\n❌ {result.topic}: {result.error}")
+        else:
+            print(f"\n--- [Guion: {result.topic} ({result.chunks} bloques)] ---\n{result.script}\n----------------------------------------")
+    print(f"\n📊 Métricas de la pipeline:\n{report.summary()}")
+    for service, stats in limiter_stats().items():
+        print(f"🚦 Limitador de cuota ({service}): {stats}")
+
+
+async def shutdown():
+    """Espera a los refrescos pendientes de la caché y borra los agentes e hilos del grupo antes de cerrar los clientes."""
+    await grounding_cache.await_refreshes()
+    await worker_pool.close()
+    await async_project_client.close()
+    await async_credential.close()
+    project_client.close()
+
+
+async def run():
+    """Ejecuta 'main' (o el lote de NEWS_TOPICS) y libera siempre los recursos, aunque el plan falle."""
+    topics = [topic.strip() for topic in os.getenv("NEWS_TOPICS", "").split(",") if topic.strip()]
+    try:
+        await (batch(topics) if topics else main())
+    finally:
+        await shutdown()
+
 # Punto de entrada estándar para un script de Python.
 if __name__ == "__main__":
     # Se ejecuta la función principal 'main' usando el gestor de eventos de asyncio.
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(run())
\ No newline at end of file
@@ -0,0 +1,183 @@
+# Invocación en lote de funciones del kernel (por ejemplo, 'basic_plugin/contact_information').
+#
+# 'kernel.invoke' procesa un único conjunto de argumentos; para generar fichas de contacto o
+# saludos de un CSV completo de clientes habría que llamarlo en un bucle, una fila detrás de otra.
+# 'BatchInvoker' recibe un iterable de argumentos (que puede ser un CSV leído fila a fila) y:
+#   - lanza varias invocaciones a la vez (como mucho 'max_concurrency'). Las cuotas del servicio las
+#     aplica el limitador del proceso ('common.rate_limit.get_limiter()') por el que pasan las
+#     peticiones del cliente del kernel: adapta la concurrencia real y, ante un 429, pausa a todas las
+#     llamadas a la vez; el lote no lleva un límite adaptativo propio que reaccione a los mismos 429,
+#   - reintenta individualmente los elementos que fallan, con espera exponencial,
+#   - devuelve los resultados en el mismo orden que la entrada, a medida que están listos,
+#   - mide el rendimiento (elementos por segundo, reintentos y, según el limitador, respuestas 429 y
+#     concurrencia).
+import asyncio
+import csv
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, Iterable, Iterator, List, Optional
+
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelArguments, KernelFunction
+
+from common.rate_limit import RateLimiter, get_limiter
+
+
+def rows_from_csv(path: str, columns: Optional[Dict[str, str]] = None) -> Iterator[KernelArguments]:
+    """
+    Lee un CSV fila a fila y devuelve un 'KernelArguments' por fila.
+
+    Args:
+        path: Ruta del CSV (con cabecera).
+        columns: Correspondencia opcional {columna del CSV: argumento de la función}; si se indica,
+            solo se pasan esas columnas.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if columns:
+                yield KernelArguments(**{argument: row.get(column, "") for column, argument in columns.items()})
+            else:
+                yield KernelArguments(**row)
+
+
+@dataclass
+class BatchItem:
+    """Resultado de un elemento del lote."""
+    index: int
+    arguments: KernelArguments
+    output: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchReport:
+    """Rendimiento de un lote."""
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    throttled: int = 0  # Respuestas 429 que vio el limitador durante el lote.
+    seconds: float = 0.0
+    concurrency_history: List[int] = field(default_factory=list)  # Límite del limitador en cada intento.
+
+    @property
+    def items_per_second(self) -> float:
+        return self.total / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        peak = max(self.concurrency_history, default=0)
+        return (
+            f"{self.total} elementos en {self.seconds:.2f}s ({self.items_per_second:.2f}/s) | "
+            f"correctos: {self.succeeded}, fallidos: {self.failed}, reintentos: {self.retries}, "
+            f"respuestas 429: {self.throttled}, concurrencia máxima del limitador: {peak}"
+        )
+
+
+class BatchInvoker:
+    """
+    Invoca una función del kernel sobre muchos conjuntos de argumentos.
+
+    Uso:
+        invoker = BatchInvoker(kernel, plugin["contact_information"], max_concurrency=8)
+        async for item in invoker.stream(rows_from_csv("data/customers.csv")):
+            print(item.index, item.output if item.ok else item.error)
+        print(invoker.report.summary())
+    """
+
+    def __init__(
+        self,
+        kernel: Kernel,
+        function: KernelFunction,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        backoff_seconds: float = 1.0,
+        limiter: Optional[RateLimiter] = None,
+    ):
+        """
+        Args:
+            kernel: El kernel con el servicio de IA.
+            function: La función a invocar con cada conjunto de argumentos.
+            max_concurrency: Límite superior de invocaciones simultáneas.
+            max_retries: Reintentos por elemento antes de darlo por fallido.
+            backoff_seconds: Espera base entre reintentos (se duplica en cada intento).
+            limiter: Limitador por el que pasan las peticiones del servicio del kernel (por defecto, el
+                del proceso para Azure OpenAI); solo se lee para el informe.
+        """
+        self.kernel = kernel
+        self.function = function
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter or get_limiter()
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.report = BatchReport()
+
+    async def run(self, arguments: Iterable[KernelArguments]) -> List[BatchItem]:
+        """Procesa el lote completo y devuelve los resultados en el orden de la entrada."""
+        return [item async for item in self.stream(arguments)]
+
+    async def stream(self, arguments: Iterable[KernelArguments]) -> AsyncIterator[BatchItem]:
+        """
+        Procesa el lote y va devolviendo los resultados en el orden de la entrada.
+
+        La entrada se consume poco a poco: como mucho hay '4 * max_concurrency' elementos leídos
+        pendientes de devolver, así que un CSV grande no se carga entero en memoria.
+        """
+        self.report = BatchReport()
+        slots = asyncio.Semaphore(self.max_concurrency)
+        throttled_before = self.limiter.stats.throttled
+        window = 4 * self.max_concurrency
+        pending: Deque[asyncio.Task] = deque()
+        start = time.perf_counter()
+        try:
+            for index, item_arguments in enumerate(arguments):
+                pending.append(asyncio.create_task(self._process(BatchItem(index, item_arguments), slots)))
+                await asyncio.sleep(0)
+                # Se entregan los resultados de cabeza ya terminados y, si la ventana está llena, se
+                # espera al siguiente (siempre en el orden de la entrada).
+                while pending and (pending[0].done() or len(pending) >= window):
+                    yield self._record(await pending.popleft())
+            while pending:
+                yield self._record(await pending.popleft())
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.report.seconds = time.perf_counter() - start
+            self.report.throttled = self.limiter.stats.throttled - throttled_before
+
+    # --- Implementación ---
+
+    async def _process(self, item: BatchItem, slots: asyncio.Semaphore) -> BatchItem:
+        started = time.perf_counter()
+        while True:
+            item.attempts += 1
+            async with slots:
+                self.report.concurrency_history.append(self.limiter.stats.concurrency)
+                try:
+                    result = await self.kernel.invoke(self.function, item.arguments)
+                    item.output, item.error = str(result), None
+                except Exception as e:
+                    item.error = str(e)
+            if item.ok or item.attempts > self.max_retries:
+                break
+            self.report.retries += 1
+            # Espera exponencial con algo de aleatoriedad para que los reintentos no coincidan.
+            await asyncio.sleep(self.backoff_seconds * 2 ** (item.attempts - 1) * random.uniform(0.5, 1.5))
+        item.seconds = time.perf_counter() - started
+        return item
+
+    def _record(self, item: BatchItem) -> BatchItem:
+        self.report.total += 1
+        if item.ok:
+            self.report.succeeded += 1
+        else:
+            self.report.failed += 1
+        return item
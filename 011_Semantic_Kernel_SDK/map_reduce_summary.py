@@ -0,0 +1,210 @@
+# Resumen map-reduce de documentos largos con la función 'writerPlugin/summarise'.
+#
+# '03-planner.py' leía el documento completo y lo incrustaba en el objetivo, así que el tamaño
+# máximo lo marcaba la ventana de contexto y la latencia crecía con la longitud del texto.
+# Este módulo:
+#   1. Lee el documento por párrafos sin cargarlo entero y lo divide en fragmentos. Los cortes se
+#      deciden según el contenido (hash del párrafo), no por posición, de modo que editar una
+#      sección solo cambia los fragmentos de esa sección.
+#   2. "Map": resume los fragmentos en paralelo (con un límite de concurrencia).
+#   3. "Reduce": agrupa los resúmenes parciales y los vuelve a resumir, por niveles, hasta que el
+#      resultado cabe en un fragmento.
+# Cada resumen parcial se guarda en una caché indexada por el hash de su texto (y de la plantilla
+# del prompt), así que al editar una sección de un documento largo solo se vuelve a resumir esa parte.
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelArguments, KernelFunction
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(CURRENT_DIR, ".summary_cache.json")
+DEFAULT_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", "6000"))
+
+
+def iter_paragraphs(path: str) -> Iterator[str]:
+    """Lee un archivo de texto línea a línea y devuelve sus párrafos (separados por líneas en blanco)."""
+    paragraph: List[str] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                paragraph.append(line)
+            elif paragraph:
+                # La línea en blanco se conserva para que los fragmentos mantengan la separación.
+                paragraph.append(line)
+                yield "".join(paragraph)
+                paragraph = []
+    if paragraph:
+        yield "".join(paragraph)
+
+
+def iter_chunks(paragraphs: Iterator[str], chunk_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Agrupa párrafos en fragmentos de aproximadamente 'chunk_chars' caracteres.
+
+    Un fragmento se cierra tras un párrafo cuyo hash es múltiplo de 4 (si ya tiene al menos la mitad
+    del tamaño objetivo) o cuando alcanza el tamaño máximo. Como los cortes dependen del contenido,
+    insertar o editar texto en una sección no desplaza los cortes del resto del documento.
+    """
+    chunk: List[str] = []
+    size = 0
+    for paragraph in paragraphs:
+        # Un párrafo enorme se parte por caracteres para no superar el tamaño máximo.
+        while len(paragraph) > chunk_chars:
+            if chunk:
+                yield "".join(chunk)
+                chunk, size = [], 0
+            yield paragraph[:chunk_chars]
+            paragraph = paragraph[chunk_chars:]
+        chunk.append(paragraph)
+        size += len(paragraph)
+        content_boundary = size >= chunk_chars // 2 and hashlib.sha256(paragraph.encode("utf-8")).digest()[0] % 4 == 0
+        if content_boundary or size >= chunk_chars:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+@dataclass
+class SummaryStats:
+    """Métricas de un resumen map-reduce."""
+    chunks: int = 0
+    levels: int = 0
+    llm_calls: int = 0
+    cache_hits: int = 0
+    seconds: float = 0.0
+
+
+class MapReduceSummarizer:
+    """
+    Resume documentos largos por fragmentos con una función de resumen del kernel.
+
+    Uso:
+        summarizer = MapReduceSummarizer(kernel, kernel.get_function("writerPlugin", "summarise"))
+        texto = await summarizer.condense("data/documento.txt")  # resúmenes parciales que caben en un fragmento
+        resumen = await summarizer.summarize("data/documento.txt")  # un único resumen final
+    """
+
+    def __init__(
+        self,
+        kernel: Kernel,
+        function: KernelFunction,
+        chunk_chars: int = DEFAULT_CHUNK_CHARS,
+        max_concurrency: int = 4,
+        fan_in: int = 4,
+        cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+    ):
+        """
+        Args:
+            kernel: El kernel con el servicio de IA.
+            function: Función de resumen (su parámetro 'input' recibe el texto).
+            chunk_chars: Tamaño aproximado de cada fragmento, en caracteres.
+            max_concurrency: Número máximo de resúmenes simultáneos.
+            fan_in: Número de resúmenes parciales que se combinan en cada paso de reducción.
+            cache_path: Archivo JSON de la caché de resúmenes parciales (None para desactivarla).
+        """
+        self.kernel = kernel
+        self.function = function
+        self.chunk_chars = chunk_chars
+        self.fan_in = max(2, fan_in)
+        self.cache_path = cache_path
+        self.stats = SummaryStats()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache: Dict[str, str] = self._read()
+        # La plantilla forma parte de la clave: si cambia el prompt, los resúmenes guardados no valen.
+        prompt_config = getattr(getattr(function, "prompt_template", None), "prompt_template_config", None)
+        self._function_hash = hashlib.sha256(
+            f"{function.fully_qualified_name}|{getattr(prompt_config, 'template', '')}".encode("utf-8")
+        ).hexdigest()[:16]
+
+    async def condense(self, path: str) -> str:
+        """
+        Reduce el documento hasta que cabe en un fragmento y devuelve el texto resultante.
+
+        Si el documento ya cabe en un fragmento se devuelve tal cual, sin llamar al modelo; si no,
+        se devuelven los resúmenes parciales del último nivel, listos para un resumen final.
+        """
+        start = time.perf_counter()
+        first, tasks = await self._map(path)
+        if not tasks:
+            text = first
+        else:
+            summaries = list(await asyncio.gather(*tasks))
+            self.stats.levels += 1
+            text = await self._reduce(summaries)
+        self.stats.seconds += time.perf_counter() - start
+        self._write()
+        return text
+
+    async def summarize(self, path: str) -> str:
+        """Devuelve un único resumen del documento completo."""
+        text = await self.condense(path)
+        summary = await self._summarize(text)
+        self._write()
+        return summary
+
+    # --- Implementación ---
+
+    async def _map(self, path: str) -> Tuple[str, List[asyncio.Task]]:
+        """
+        Lanza el resumen de cada fragmento en cuanto se lee, sin esperar al final del archivo.
+
+        Devuelve (primer fragmento, tareas de resumen en orden). Si el documento tiene un único
+        fragmento no se lanza ninguna tarea.
+        """
+        first = ""
+        tasks: List[asyncio.Task] = []
+        for count, chunk in enumerate(iter_chunks(iter_paragraphs(path), self.chunk_chars), start=1):
+            self.stats.chunks += 1
+            if count == 1:
+                first = chunk
+                continue
+            if count == 2:
+                tasks.append(asyncio.create_task(self._summarize(first)))
+            tasks.append(asyncio.create_task(self._summarize(chunk)))
+            await asyncio.sleep(0)  # Cede el control para que el resumen empiece mientras se sigue leyendo.
+        return first, tasks
+
+    async def _reduce(self, summaries: List[str]) -> str:
+        """Combina los resúmenes por grupos de 'fan_in' hasta que el texto cabe en un fragmento."""
+        text = "\n\n".join(summaries)
+        while len(text) > self.chunk_chars and len(summaries) > 1:
+            groups = ["\n\n".join(summaries[i:i + self.fan_in]) for i in range(0, len(summaries), self.fan_in)]
+            summaries = list(await asyncio.gather(*(self._summarize(group) for group in groups)))
+            self.stats.levels += 1
+            text = "\n\n".join(summaries)
+        return text
+
+    async def _summarize(self, text: str) -> str:
+        key = hashlib.sha256(f"{self._function_hash}|{text}".encode("utf-8")).hexdigest()
+        if key in self._cache:
+            self.stats.cache_hits += 1
+            return self._cache[key]
+        async with self._semaphore:
+            result = await self.kernel.invoke(self.function, KernelArguments(input=text))
+        self.stats.llm_calls += 1
+        self._cache[key] = str(result).strip()
+        return self._cache[key]
+
+    def _read(self) -> Dict[str, str]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._cache, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
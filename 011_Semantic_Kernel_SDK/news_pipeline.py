@@ -0,0 +1,262 @@
+# Canalización (pipeline) en streaming de dos etapas: búsqueda web -> guion de noticias.
+#
+# En '04-agentic_system.py' el plan ejecuta WebSearchAgent hasta el final y solo entonces empieza
+# NewsReporterAgent; con varios temas, el tiempo total es la suma de todas las etapas. 'NewsPipeline':
+#   - recibe la respuesta de la búsqueda por fragmentos ('search' es un generador asíncrono de texto)
+#     y la corta en bloques de párrafos completos. En cuanto hay 'first_chunk_chars' caracteres, el
+#     guionista empieza a escribir el comienzo del guion mientras la búsqueda sigue generando; los
+#     bloques siguientes se escriben como continuación (sin saludo ni despedida) y el último cierra
+#     el guion. Dentro de un tema los bloques se escriben en orden, para que el guion sea coherente.
+#   - procesa varios temas a la vez por las mismas dos etapas, cada una con su límite de concurrencia,
+#     de modo que un lote termina en "tiempo de pipeline" y no en la suma de las etapas.
+#   - registra por etapa la profundidad de la cola (trabajos esperando a un hueco), la espera en cola
+#     y la latencia de cada trabajo, además del tiempo hasta el primer fragmento de la búsqueda.
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+FIRST_CHUNK_CHARS = 600  # Información suficiente para empezar el guion.
+CHUNK_CHARS = 1500  # Tamaño de los bloques siguientes (menos llamadas al guionista).
+
+SINGLE_PROMPT = "El tema es {topic} y la información más reciente es {news}"
+FIRST_PROMPT = """El tema es {topic}. Esta es la primera parte de la información más reciente: {news}
+Escribe el comienzo del guion para John: la presentación y estas noticias. No escribas la despedida; el guion continuará con más noticias."""
+NEXT_PROMPT = """Continúa el guion para John sobre {topic}. Así termina lo escrito hasta ahora: «{tail}»
+Nueva información: {news}
+Escribe solo la continuación con estas noticias, sin volver a saludar.{closing}"""
+CLOSING = " Termina con la despedida del guion."
+MIDDLE = " No escribas la despedida; el guion continuará."
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+@dataclass
+class StageMetrics:
+    """Métricas de una etapa: profundidad de cola, espera en cola y latencia de cada trabajo."""
+    name: str
+    depth: int = 0  # Trabajos esperando ahora mismo a un hueco de la etapa.
+    max_depth: int = 0
+    depth_samples: List[int] = field(default_factory=list)
+    waits: List[float] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+
+    def enqueue(self):
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        self.depth_samples.append(self.depth)
+
+    def start(self, wait: float):
+        self.depth -= 1
+        self.waits.append(wait)
+
+    def summary(self) -> str:
+        mean_depth = sum(self.depth_samples) / len(self.depth_samples) if self.depth_samples else 0.0
+        return (
+            f"{self.name:<12}{len(self.latencies):>8}{mean_depth:>12.1f}{self.max_depth:>10}"
+            f"{_percentile(self.waits, 0.5):>10.2f}s{_percentile(self.latencies, 0.5):>10.2f}s"
+            f"{_percentile(self.latencies, 0.95):>10.2f}s{sum(self.latencies):>10.1f}s"
+        )
+
+
+@dataclass
+class TopicResult:
+    """Guion de un tema y sus tiempos (en segundos desde que empezó el lote)."""
+    topic: str
+    script: str = ""
+    news: str = ""
+    chunks: int = 0
+    first_token: Optional[float] = None  # Primer fragmento de la búsqueda.
+    writer_started: Optional[float] = None  # El guionista empieza a escribir.
+    search_done: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class PipelineReport:
+    """Resultados del lote y métricas de las etapas."""
+    results: List[TopicResult]
+    stages: List[StageMetrics]
+    seconds: float
+    time_to_first_token: List[float] = field(default_factory=list)
+
+    def summary(self) -> str:
+        stage_seconds = sum(sum(stage.latencies) for stage in self.stages)
+        overlaps = [
+            result.search_done - result.writer_started
+            for result in self.results
+            if result.writer_started is not None and result.search_done is not None
+        ]
+        lines = [
+            f"{'Etapa':<12}{'Trabajos':>8}{'Cola media':>12}{'Cola máx':>10}{'Espera p50':>11}{'Lat. p50':>11}{'Lat. p95':>11}{'Total':>11}",
+            *(stage.summary() for stage in self.stages),
+            f"Temas: {len(self.results)} ({sum(result.error is not None for result in self.results)} con error), "
+            f"primer fragmento de la búsqueda p50 {_percentile(self.time_to_first_token, 0.5):.2f}s",
+            f"Solapamiento búsqueda/guion por tema: media {sum(overlaps) / len(overlaps) if overlaps else 0.0:.1f}s",
+            f"Tiempo del lote: {self.seconds:.1f}s frente a {stage_seconds:.1f}s de suma de etapas "
+            f"({stage_seconds / self.seconds if self.seconds else 0.0:.1f}x)",
+        ]
+        return "\n".join(lines)
+
+
+def split_ready(buffer: str, min_chars: int) -> Tuple[str, str]:
+    """
+    Separa del texto acumulado un bloque de párrafos completos listo para el guionista.
+
+    Se conserva en el búfer el último párrafo completo (además del incompleto), así el bloque final
+    nunca queda vacío y siempre puede cerrar el guion. Devuelve (bloque, resto); el bloque es "" si
+    aún no hay 'min_chars' caracteres de párrafos completos.
+    """
+    paragraphs = buffer.split("\n\n")
+    if len(paragraphs) < 3:
+        return "", buffer
+    ready = "\n\n".join(paragraphs[:-2])
+    if len(ready.strip()) < min_chars:
+        return "", buffer
+    return ready, "\n\n".join(paragraphs[-2:])
+
+
+class NewsPipeline:
+    """
+    Búsqueda y guion de varios temas a la vez, con el guionista empezando antes de que acabe la búsqueda.
+
+    Uso:
+        async def search(topic):
+            async with worker_pool.lease("web") as worker:
+                async for text in worker.ask_stream(f"últimas noticias de {topic}"):
+                    yield text
+
+        pipeline = NewsPipeline(search, write=lambda prompt: worker_pool.ask("reporter", prompt))
+        report = await pipeline.run(["la India", "Japón", "Brasil"])
+        print(report.summary())
+    """
+
+    def __init__(
+        self,
+        search: Callable[[str], AsyncIterator[str]],
+        write: Callable[[str], Awaitable[str]],
+        search_concurrency: int = 2,
+        write_concurrency: int = 2,
+        first_chunk_chars: int = FIRST_CHUNK_CHARS,
+        chunk_chars: int = CHUNK_CHARS,
+    ):
+        """
+        Args:
+            search: Generador asíncrono con la respuesta de la búsqueda de un tema, por fragmentos.
+            write: Corrutina que envía un prompt al guionista y devuelve su respuesta.
+            search_concurrency: Búsquedas simultáneas (p. ej. el tamaño del grupo de trabajadores "web").
+            write_concurrency: Llamadas simultáneas al guionista.
+            first_chunk_chars: Caracteres de noticias necesarios para empezar el guion.
+            chunk_chars: Tamaño mínimo de los bloques siguientes.
+        """
+        self.search = search
+        self.write = write
+        self.first_chunk_chars = first_chunk_chars
+        self.chunk_chars = chunk_chars
+        self._search_slots = asyncio.Semaphore(search_concurrency)
+        self._write_slots = asyncio.Semaphore(write_concurrency)
+
+    async def run(self, topics: Iterable[str]) -> PipelineReport:
+        """Procesa todos los temas y devuelve los guiones (en el orden de entrada) y las métricas."""
+        self._start = time.perf_counter()
+        self._search_metrics = StageMetrics("búsqueda")
+        self._write_metrics = StageMetrics("guion")
+        self._first_tokens: List[float] = []
+        results = await asyncio.gather(*(self._run_topic(topic) for topic in topics))
+        return PipelineReport(
+            results=list(results),
+            stages=[self._search_metrics, self._write_metrics],
+            seconds=time.perf_counter() - self._start,
+            time_to_first_token=self._first_tokens,
+        )
+
+    # --- Implementación ---
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._start
+
+    async def _run_topic(self, topic: str) -> TopicResult:
+        result = TopicResult(topic)
+        chunks: asyncio.Queue = asyncio.Queue()  # Bloques de noticias -> guionista (None al terminar).
+        writer = asyncio.create_task(self._write_script(topic, chunks, result))
+        try:
+            await self._search_topic(topic, chunks, result)
+        except Exception as e:
+            result.error = f"búsqueda: {type(e).__name__}: {e}"
+            writer.cancel()
+        try:
+            await writer
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            result.error = result.error or f"guion: {type(e).__name__}: {e}"
+        result.finished = self._now()
+        return result
+
+    async def _search_topic(self, topic: str, chunks: asyncio.Queue, result: TopicResult):
+        queued = time.perf_counter()
+        self._search_metrics.enqueue()
+        async with self._search_slots:
+            started = time.perf_counter()
+            self._search_metrics.start(started - queued)
+            buffer = ""
+            min_chars = self.first_chunk_chars
+            try:
+                async for text in self.search(topic):
+                    if result.first_token is None:
+                        result.first_token = self._now()
+                        self._first_tokens.append(time.perf_counter() - started)
+                    buffer += text
+                    ready, buffer = split_ready(buffer, min_chars)
+                    if ready:
+                        self._queue_chunk(chunks, ready, last=False)
+                        min_chars = self.chunk_chars
+            finally:
+                self._search_metrics.latencies.append(time.perf_counter() - started)
+        result.search_done = self._now()
+        if buffer.strip():
+            self._queue_chunk(chunks, buffer, last=True)
+        chunks.put_nowait(None)
+
+    def _queue_chunk(self, chunks: asyncio.Queue, text: str, last: bool):
+        # Desde aquí el bloque cuenta en la cola de la etapa de guion, aunque el guionista de este
+        # tema siga ocupado con el bloque anterior.
+        self._write_metrics.enqueue()
+        chunks.put_nowait((text, last, time.perf_counter()))
+
+    async def _write_script(self, topic: str, chunks: asyncio.Queue, result: TopicResult):
+        parts: List[str] = []
+        news: List[str] = []
+        while True:
+            item = await chunks.get()
+            if item is None:
+                break
+            text, last, queued = item
+            news.append(text.strip())
+            if not parts and last:
+                prompt = SINGLE_PROMPT.format(topic=topic, news=text.strip())
+            elif not parts:
+                prompt = FIRST_PROMPT.format(topic=topic, news=text.strip())
+            else:
+                prompt = NEXT_PROMPT.format(topic=topic, tail=parts[-1][-300:], news=text.strip(), closing=CLOSING if last else MIDDLE)
+            parts.append(await self._write_chunk(prompt, queued, result))
+        if not parts:
+            raise RuntimeError("La búsqueda no devolvió información")
+        result.script = "\n\n".join(part.strip() for part in parts)
+        result.news = "\n\n".join(news)
+        result.chunks = len(parts)
+
+    async def _write_chunk(self, prompt: str, queued: float, result: TopicResult) -> str:
+        async with self._write_slots:
+            started = time.perf_counter()
+            self._write_metrics.start(started - queued)
+            if result.writer_started is None:
+                result.writer_started = self._now()
+            try:
+                return await self.write(prompt)
+            finally:
+                self._write_metrics.latencies.append(time.perf_counter() - started)
@@ -0,0 +1,181 @@
+# Caché de planes del SequentialPlanner.
+#
+# 'planner.create_plan(goal)' hace una llamada al LLM en cada ejecución, aunque el objetivo se
+# repita y el plan resultante sea el mismo. Esta caché guarda en disco el plan (en el mismo formato
+# XML que genera el planificador) indexado por:
+#   - la plantilla del objetivo normalizada (con sus variables como '$nombre', no sus valores),
+#   - el hash del manifiesto de plugins y funciones registrados en el kernel,
+#   - el modelo.
+# En ejecuciones posteriores el plan se reconstruye con el parser del planificador y se ejecuta
+# directamente con 'invoke', sustituyendo las variables por sus valores actuales. Si cambian los
+# plugins (una función nueva, una descripción o un prompt distinto) el hash del manifiesto cambia
+# y el plan se vuelve a generar.
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+
+from semantic_kernel import Kernel
+from semantic_kernel.planners import Plan, SequentialPlanner
+from semantic_kernel.planners.sequential_planner.sequential_planner_parser import SequentialPlanParser
+
+from common.text import fold_text
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(CURRENT_DIR, ".plan_cache.json")
+
+
+def normalize_goal(goal: str) -> str:
+    """Minúsculas, sin tildes y con espacios simples (se conservan los '$' de las variables)."""
+    return " ".join(re.findall(r"\$?\w+", fold_text(goal)))
+
+
+def function_manifest_hash(kernel: Kernel) -> str:
+    """Hash de los plugins y funciones registrados (nombres, descripciones, parámetros y plantillas de prompt)."""
+    manifest = []
+    for plugin_name, plugin in sorted(kernel.plugins.items()):
+        for function_name, function in sorted(plugin.functions.items()):
+            # La plantilla se pide antes que los metadatos: una función de 'common/plugin_bundle.py' se
+            # construye al pedirla y pasa a tener los metadatos actuales de sus archivos.
+            prompt_config = getattr(getattr(function, "prompt_template", None), "prompt_template_config", None)
+            metadata = function.metadata
+            manifest.append({
+                "name": f"{plugin_name}-{function_name}",
+                "description": metadata.description,
+                "parameters": [
+                    [parameter.name, parameter.description, str(parameter.default_value), parameter.type_]
+                    for parameter in metadata.parameters
+                ],
+                "template": getattr(prompt_config, "template", None),
+            })
+    payload = json.dumps(manifest, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def plan_to_xml(plan: Plan) -> str:
+    """Serializa un plan secuencial al formato XML que genera (y sabe leer) el SequentialPlanner."""
+    results = set(plan._outputs)
+    nodes = []
+    for step in plan._steps:
+        attributes = [
+            f"{name}={quoteattr(str(value))}"
+            for name, value in step.parameters.items()
+            if value is not None and str(value) != ""
+        ]
+        for output in step._outputs:
+            tag = "appendToResult" if output in results else "setContextVariable"
+            attributes.append(f"{tag}={quoteattr(output)}")
+        nodes.append(f"  <function.{step.metadata.fully_qualified_name} {' '.join(attributes)}/>")
+    return "<plan>\n" + "\n".join(nodes) + "\n</plan>"
+
+
+def plan_from_xml(kernel: Kernel, xml: str, goal: str) -> Plan:
+    """Reconstruye el plan con el parser del planificador (falla si falta alguna función)."""
+    return SequentialPlanParser.to_plan_from_xml(xml, goal, SequentialPlanParser.get_plugin_function(kernel))
+
+
+def render_plan(plan: Plan, variables: Dict[str, str]) -> Plan:
+    """Sustituye '$nombre' por el valor de la variable en los parámetros de cada paso."""
+    # Los nombres más largos primero, para que '$text' no sustituya parte de '$textos'.
+    names = sorted(variables, key=len, reverse=True)
+    for step in plan._steps:
+        for parameter, value in list(step.parameters.items()):
+            if isinstance(value, str) and "$" in value:
+                for name in names:
+                    value = value.replace(f"${name}", str(variables[name]))
+                step.parameters[parameter] = value
+    return plan
+
+
+class PlanCache:
+    """
+    Caché en disco de planes secuenciales con objetivos parametrizados.
+
+    Uso:
+        plan_cache = PlanCache(model=deployment_name)
+        plan, hit = await plan_cache.get_or_create(
+            planner, kernel,
+            "resume este texto: {text} y envíalo por correo a {email}",
+            {"text": texto, "email": "sam@gmail.com"},
+        )
+        result = await plan.invoke(kernel, KernelArguments(**variables))
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, model: Optional[str] = None):
+        """
+        Args:
+            path: Archivo JSON donde se persisten los planes.
+            model: Nombre del modelo con el que se generan los planes (forma parte de la clave).
+        """
+        self.path = path
+        self.model = model or ""
+
+    async def get_or_create(
+        self,
+        planner: SequentialPlanner,
+        kernel: Kernel,
+        goal_template: str,
+        variables: Optional[Dict[str, str]] = None,
+    ) -> Tuple[Plan, bool]:
+        """
+        Devuelve el plan para el objetivo, desde la caché o pidiéndoselo al planificador.
+
+        Args:
+            planner: El planificador secuencial (solo se usa si el plan no está en la caché).
+            kernel: El kernel con los plugins registrados.
+            goal_template: Objetivo con variables entre llaves, p. ej. "resume {text} y envíalo a {email}".
+            variables: Valores de las variables del objetivo.
+
+        Returns:
+            (plan listo para 'invoke' con las variables ya sustituidas, True si vino de la caché).
+        """
+        variables = variables or {}
+        # El planificador recibe las variables como '$nombre', así el plan no depende de sus valores.
+        goal = goal_template.format_map({name: f"${name}" for name in variables})
+        goal_key = hashlib.sha256(f"{self.model}|{normalize_goal(goal)}".encode("utf-8")).hexdigest()[:16]
+        manifest = function_manifest_hash(kernel)
+        key = f"{goal_key}|{manifest}"
+
+        data = self._read()
+        entry = data.get(key)
+        if entry is not None:
+            try:
+                plan = plan_from_xml(kernel, entry["xml"], goal)
+                entry["hits"] = entry.get("hits", 0) + 1
+                entry["last_used"] = time.time()
+                self._write(data)
+                return render_plan(plan, variables), True
+            except Exception as e:
+                # Un plan que ya no se puede reconstruir se descarta y se vuelve a generar.
+                print(f"⚠️ No se pudo reconstruir el plan cacheado, se genera de nuevo: {e}")
+
+        plan = await planner.create_plan(goal)
+        # Los planes del mismo objetivo con otro manifiesto de plugins ya no son válidos.
+        data = {cached_key: value for cached_key, value in self._read().items() if not cached_key.startswith(f"{goal_key}|")}
+        data[key] = {"goal": goal, "xml": plan_to_xml(plan), "created_at": time.time(), "last_used": time.time(), "hits": 0}
+        self._write(data)
+        return render_plan(plan, variables), False
+
+    def clear(self):
+        """Elimina todos los planes guardados."""
+        self._write({})
+
+    # --- Implementación ---
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data: Dict[str, Dict]):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,244 @@
+# Ejecución en paralelo de los pasos de un plan según sus dependencias.
+#
+# 'plan.invoke(kernel)' ejecuta los pasos de un plan secuencial uno detrás de otro, aunque muchos
+# no dependan entre sí (por ejemplo, varios resúmenes o búsquedas independientes). 'PlanExecutor'
+# construye un grafo de dependencias (DAG) a partir de las variables que cada paso lee ('$VARIABLE'
+# en sus parámetros) y escribe ('setContextVariable' / 'appendToResult'), ejecuta en paralelo los
+# pasos independientes con un límite de concurrencia y emite los resultados intermedios a medida
+# que terminan. Así el tiempo total queda acotado por la ruta crítica del grafo en lugar de por la
+# suma de todos los pasos.
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelArguments
+
+VARIABLE_PATTERN = re.compile(r"\$(\w+)")
+
+
+@dataclass
+class PlanStep:
+    """Un paso del plan con sus dependencias ya calculadas."""
+    index: int
+    plugin_name: str
+    function_name: str
+    parameters: Dict[str, object]
+    outputs: List[str]
+    depends_on: Set[int] = field(default_factory=set)
+    # Para cada variable leída, el paso que la produce (las demás salen de los argumentos iniciales).
+    producers: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return f"{self.plugin_name}-{self.function_name}"
+
+
+@dataclass
+class StepResult:
+    """Resultado (intermedio) de un paso."""
+    index: int
+    name: str
+    status: str  # "completed", "failed", "skipped" o "cancelled" (la ejecución se cortó antes de terminarlo)
+    output: Optional[str] = None
+    started_at: float = 0.0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class ExecutionReport:
+    """Resultado final de la ejecución con los tiempos de cada paso."""
+    result: str
+    steps: List[StepResult]
+    wall_seconds: float
+    sequential_seconds: float
+    critical_path_seconds: float
+    levels: List[List[int]]
+
+    def summary(self) -> str:
+        lines = [f"{'Paso':<5}{'Función':<32}{'Estado':<11}{'Inicio':>8}{'Duración':>10}"]
+        for step in sorted(self.steps, key=lambda step: step.index):
+            lines.append(f"{step.index:<5}{step.name:<32}{step.status:<11}{step.started_at:>7.2f}s{step.seconds:>9.2f}s")
+        lines.append(
+            f"Tiempo total {self.wall_seconds:.2f}s | suma de pasos (ejecución secuencial) {self.sequential_seconds:.2f}s | "
+            f"ruta crítica {self.critical_path_seconds:.2f}s | niveles del grafo: {self.levels}"
+        )
+        return "\n".join(lines)
+
+
+def build_steps(plan) -> List[PlanStep]:
+    """
+    Convierte los pasos de un plan del SequentialPlanner en nodos del grafo de dependencias.
+
+    Un paso depende de otro anterior si lee una variable que este escribe (se toma el productor
+    más reciente). Además, como en 'plan.invoke', un paso con el parámetro 'input' vacío recibe la
+    salida del paso anterior, así que también depende de él.
+    """
+    steps: List[PlanStep] = []
+    last_writer: Dict[str, int] = {}
+    for index, step in enumerate(plan._steps):
+        node = PlanStep(
+            index=index,
+            plugin_name=step.metadata.plugin_name,
+            function_name=step.metadata.name,
+            parameters=dict(step.parameters.items()),
+            outputs=list(step._outputs),
+        )
+        for value in node.parameters.values():
+            for variable in VARIABLE_PATTERN.findall(str(value)) if value is not None else []:
+                if variable in last_writer:
+                    node.producers[variable] = last_writer[variable]
+                    node.depends_on.add(last_writer[variable])
+        if "input" in node.parameters and not node.parameters["input"] and index > 0:
+            node.producers["input"] = index - 1
+            node.depends_on.add(index - 1)
+        for output in node.outputs:
+            last_writer[output] = index
+        steps.append(node)
+    return steps
+
+
+def dependency_levels(steps: List[PlanStep]) -> List[List[int]]:
+    """Agrupa los pasos por niveles: los de un mismo nivel pueden ejecutarse a la vez."""
+    level: Dict[int, int] = {}
+    for step in steps:  # Los pasos están en orden topológico (solo dependen de pasos anteriores).
+        level[step.index] = 1 + max((level[dependency] for dependency in step.depends_on), default=-1)
+    levels: List[List[int]] = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for index, value in level.items():
+        levels[value].append(index)
+    return levels
+
+
+class PlanExecutor:
+    """
+    Ejecuta un plan secuencial como un grafo de dependencias, con pasos independientes en paralelo.
+
+    Uso:
+        executor = PlanExecutor(kernel, max_concurrency=4)
+        async for step_result in executor.stream(plan, KernelArguments(**variables)):
+            print(step_result.name, step_result.output)
+        print(executor.report.summary())
+
+        # Para dejar de iterar antes de tiempo y tener el informe al salir del bloque:
+        async with contextlib.aclosing(executor.stream(plan, arguments)) as step_results:
+            async for step_result in step_results:
+                ...
+    """
+
+    def __init__(self, kernel: Kernel, max_concurrency: int = 4):
+        """
+        Args:
+            kernel: El kernel con los plugins del plan.
+            max_concurrency: Número máximo de pasos ejecutándose a la vez.
+        """
+        self.kernel = kernel
+        self.max_concurrency = max_concurrency
+        self.report: Optional[ExecutionReport] = None
+
+    async def run(self, plan, arguments: Optional[KernelArguments] = None) -> ExecutionReport:
+        """Ejecuta el plan completo y devuelve el informe (sin procesar los resultados intermedios)."""
+        async for _ in self.stream(plan, arguments):
+            pass
+        return self.report
+
+    async def stream(self, plan, arguments: Optional[KernelArguments] = None) -> AsyncIterator[StepResult]:
+        """
+        Ejecuta el plan y va devolviendo el resultado de cada paso en cuanto termina.
+
+        El informe ('self.report') se genera también si la ejecución falla o si el consumidor deja de
+        iterar antes de tiempo (al cerrarse el generador); los pasos que no llegaron a terminar
+        figuran como "cancelled".
+        """
+        steps = build_steps(plan)
+        initial = dict(arguments.items()) if arguments is not None else {}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        finished: Dict[int, asyncio.Future] = {step.index: asyncio.get_running_loop().create_future() for step in steps}
+        completed: "asyncio.Queue[StepResult]" = asyncio.Queue()
+        results: Dict[int, StepResult] = {}
+        start = time.perf_counter()
+
+        async def execute(step: PlanStep):
+            dependencies = [await finished[dependency] for dependency in sorted(step.depends_on)]
+            if any(dependency.status != "completed" for dependency in dependencies):
+                result = StepResult(step.index, step.name, "skipped", error="Falló un paso del que depende")
+            else:
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        output = await self._invoke(step, initial, results)
+                        result = StepResult(step.index, step.name, "completed", output=output)
+                    except Exception as e:
+                        result = StepResult(step.index, step.name, "failed", error=str(e))
+                    result.started_at = started - start
+                    result.seconds = time.perf_counter() - started
+            results[step.index] = result
+            finished[step.index].set_result(result)
+            completed.put_nowait(result)
+
+        tasks = [asyncio.create_task(execute(step)) for step in steps]
+        try:
+            for _ in steps:
+                yield await completed.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for step in steps:
+                if step.index not in results:
+                    results[step.index] = StepResult(step.index, step.name, "cancelled", error="La ejecución se interrumpió")
+            self.report = self._build_report(plan, steps, results, time.perf_counter() - start)
+
+    # --- Implementación ---
+
+    async def _invoke(self, step: PlanStep, initial: Dict, results: Dict[int, StepResult]) -> str:
+        """Resuelve los parámetros del paso (variables de sus productores o de los argumentos iniciales) y lo ejecuta."""
+
+        def value_of(variable: str):
+            if variable in step.producers:
+                return results[step.producers[variable]].output
+            return initial.get(variable, f"${variable}")
+
+        arguments = KernelArguments()
+        for name, value in step.parameters.items():
+            if name in step.producers and not value:
+                arguments[name] = value_of(name)  # 'input' implícito: salida del paso anterior.
+            elif isinstance(value, str):
+                # Un parámetro que es exactamente '$VAR' conserva el valor tal cual; si no, se sustituye en el texto.
+                match = VARIABLE_PATTERN.fullmatch(value)
+                arguments[name] = value_of(match.group(1)) if match else VARIABLE_PATTERN.sub(lambda m: str(value_of(m.group(1))), value)
+            elif value is None and name in initial:
+                arguments[name] = initial[name]
+            else:
+                arguments[name] = value
+        function = self.kernel.get_function(step.plugin_name, step.function_name)
+        return str(await self.kernel.invoke(function, arguments))
+
+    @staticmethod
+    def _build_report(plan, steps: List[PlanStep], results: Dict[int, StepResult], wall_seconds: float) -> ExecutionReport:
+        # Ruta crítica: la cadena de dependencias con mayor duración acumulada.
+        finish: Dict[int, float] = {}
+        for step in steps:
+            finish[step.index] = results[step.index].seconds + max((finish[dependency] for dependency in step.depends_on), default=0.0)
+
+        # Como en 'plan.invoke': si el plan tiene variables de resultado se concatenan; si no, vale la salida del último paso.
+        outputs: Dict[str, str] = {}
+        for step in steps:
+            if results[step.index].status == "completed":
+                for output in step.outputs:
+                    outputs[output] = results[step.index].output
+        if plan._outputs:
+            result = "\n".join(outputs[name] for name in plan._outputs if name in outputs)
+        else:
+            result = results[steps[-1].index].output or "" if steps else ""
+
+        return ExecutionReport(
+            result=result,
+            steps=[results[step.index] for step in steps],
+            wall_seconds=wall_seconds,
+            sequential_seconds=sum(result.seconds for result in results.values()),
+            critical_path_seconds=max(finish.values(), default=0.0),
+            levels=dependency_levels(steps),
+        )
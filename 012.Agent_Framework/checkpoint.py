@@ -0,0 +1,206 @@
+# Puntos de control de conversaciones en un registro local de solo añadido (JSONL).
+#
+# Si el kernel del notebook se detiene a mitad de 'chat.invoke()' (05-agentChat.ipynb) o de una
+# conversación con 'AzureAIAgentThread' (02-AzureAIAgent.ipynb), se pierde todo lo hecho y hay que
+# repetirlo. 'CheckpointLog' añade una línea por cada turno completado con:
+#   - el mensaje (rol, autor y contenido), para reconstruir el historial,
+#   - el agente seleccionado en ese turno y el número de iteración dentro de la ronda actual,
+#   - los identificadores de los hilos de los agentes en el servicio (en un chat de grupo, el hilo
+#     del canal de cada agente).
+# Al reiniciar, 'interrupted()' devuelve las sesiones que no se cerraron y su estado se reconstruye
+# releyendo el registro; la conversación continúa desde el último turno completado. Cada línea se
+# escribe con 'fsync', y una última línea incompleta (corte durante la escritura) se ignora.
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+from semantic_kernel.agents import AgentGroupChat
+from semantic_kernel.contents import AuthorRole, ChatMessageContent
+
+CHECKPOINT_PATH = ".chat_checkpoints.jsonl"
+
+
+@dataclass
+class SessionState:
+    """Estado de una sesión reconstruido a partir del registro."""
+    session_id: str
+    kind: str  # "group_chat" o "agent_thread".
+    messages: List[dict] = field(default_factory=list)
+    selected_agent: Optional[str] = None  # Agente que habló en el último turno completado.
+    iteration: int = 0  # Turnos de agentes en la ronda actual (desde el último mensaje del usuario).
+    thread_ids: Dict[str, str] = field(default_factory=dict)
+    finished: bool = False
+    updated: float = 0.0
+
+    def chat_messages(self) -> List[ChatMessageContent]:
+        return [ChatMessageContent(role=AuthorRole(message["role"]), name=message.get("name"), content=message["content"]) for message in self.messages]
+
+
+class CheckpointLog:
+    """
+    Registro de solo añadido con un punto de control por turno completado.
+
+    Uso:
+        checkpoints = CheckpointLog()
+        state = checkpoints.latest_interrupted("group_chat")
+        session_id = state.session_id if state else checkpoints.start("group_chat")
+        checkpoints.record(session_id, message, iteration=1, selected_agent="Escritor")
+        checkpoints.finish(session_id)
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+
+    def start(self, kind: str, session_id: Optional[str] = None) -> str:
+        """Abre una sesión nueva y devuelve su identificador."""
+        session_id = session_id or uuid.uuid4().hex[:12]
+        self._append({"type": "start", "session_id": session_id, "kind": kind})
+        return session_id
+
+    def record(
+        self,
+        session_id: str,
+        message: ChatMessageContent,
+        iteration: int = 0,
+        selected_agent: Optional[str] = None,
+        thread_ids: Optional[Dict[str, str]] = None,
+    ):
+        """Guarda un turno completado (o un mensaje del usuario, con iteración 0)."""
+        self._append({
+            "type": "turn",
+            "session_id": session_id,
+            "message": {"role": str(getattr(message.role, "value", message.role)), "name": message.name, "content": str(message.content)},
+            "iteration": iteration,
+            "selected_agent": selected_agent,
+            "thread_ids": thread_ids or {},
+        })
+
+    def finish(self, session_id: str):
+        """Cierra la sesión: ya no se ofrecerá para reanudar."""
+        self._append({"type": "finish", "session_id": session_id})
+
+    def sessions(self) -> Dict[str, SessionState]:
+        """Reconstruye el estado de todas las sesiones releyendo el registro."""
+        states: Dict[str, SessionState] = {}
+        for record in self._records():
+            session_id = record["session_id"]
+            if record["type"] == "start":
+                states[session_id] = SessionState(session_id, record["kind"])
+            state = states.get(session_id)
+            if state is None:
+                continue
+            state.updated = record["time"]
+            if record["type"] == "turn":
+                state.messages.append(record["message"])
+                state.iteration = record["iteration"]
+                state.selected_agent = record["selected_agent"]
+                state.thread_ids.update(record["thread_ids"])
+            elif record["type"] == "finish":
+                state.finished = True
+        return states
+
+    def interrupted(self, kind: Optional[str] = None) -> List[SessionState]:
+        """Sesiones sin cerrar, de la más reciente a la más antigua."""
+        states = [state for state in self.sessions().values() if not state.finished and (kind is None or state.kind == kind)]
+        return sorted(states, key=lambda state: state.updated, reverse=True)
+
+    def latest_interrupted(self, kind: Optional[str] = None) -> Optional[SessionState]:
+        states = self.interrupted(kind)
+        return states[0] if states else None
+
+    def compact(self):
+        """Reescribe el registro sin las sesiones cerradas (de forma atómica)."""
+        if not os.path.exists(self.path):
+            return
+        open_sessions = {state.session_id for state in self.interrupted()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self._records():
+                if record["session_id"] in open_sessions:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    # --- Implementación ---
+
+    def _append(self, record: dict):
+        record["time"] = time.time()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _records(self) -> List[dict]:
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # Línea incompleta: el proceso se detuvo mientras se escribía.
+        return records
+
+
+async def invoke_with_checkpoints(
+    chat: AgentGroupChat,
+    checkpoints: CheckpointLog,
+    session_id: str,
+    start_iteration: int = 0,
+) -> AsyncIterator[ChatMessageContent]:
+    """
+    Igual que 'chat.invoke()', pero guarda un punto de control después de cada turno de un agente.
+
+    Con 'start_iteration' (al reanudar una ronda) solo se hacen las iteraciones que faltaban hasta el
+    máximo de la estrategia de terminación.
+    """
+    iteration = start_iteration
+    responses = chat.invoke()
+    try:
+        async for response in responses:
+            if response is None or not response.name:
+                continue
+            iteration += 1
+            checkpoints.record(
+                session_id, response, iteration=iteration, selected_agent=response.name, thread_ids=channel_thread_ids(chat)
+            )
+            yield response
+            if iteration >= chat.termination_strategy.maximum_iterations:
+                break
+    finally:
+        await responses.aclose()  # Libera el chat aunque la ronda se corte antes de tiempo.
+
+
+def channel_thread_ids(chat: AgentGroupChat) -> Dict[str, str]:
+    """Hilo en el servicio del canal de cada agente del chat que ya lo tiene (los agentes de Azure AI)."""
+    thread_ids = {}
+    for agent, channel_key in chat.channel_map.items():
+        thread_id = getattr(chat.agent_channels.get(channel_key), "thread_id", None)
+        if thread_id:
+            thread_ids[agent.name] = thread_id
+    return thread_ids
+
+
+async def restore_group_chat(chat: AgentGroupChat, state: SessionState) -> bool:
+    """
+    Carga en un chat nuevo el historial de una sesión interrumpida.
+
+    Returns:
+        True si la ronda quedó a medias y hay que seguir con 'invoke_with_checkpoints' (pasando
+        'state.iteration'); False si había terminado y solo falta el siguiente mensaje del usuario.
+    """
+    await chat.add_chat_messages(state.chat_messages())
+    if not state.selected_agent:
+        # Solo está el mensaje del usuario: la ronda empieza por el agente inicial.
+        return bool(state.messages)
+    # Ya habló algún agente: el siguiente se elige a partir del historial, no con 'initial_agent'.
+    chat.selection_strategy.has_selected = True
+    termination = chat.termination_strategy
+    if state.iteration >= termination.maximum_iterations:
+        return False
+    agent = next((agent for agent in chat.agents if agent.name == state.selected_agent), None)
+    # El corte pudo llegar después del turno y antes de comprobar si la conversación había terminado.
+    return not (agent is not None and await termination.should_terminate(agent, chat.history.messages))
@@ -0,0 +1,196 @@
+# Ejecución concurrente de muchos artículos con el chat grupal Escritor/Revisor.
+#
+# '05-agentChat.ipynb' ejecuta un único 'AgentGroupChat' dentro de un bucle 'input()'. Para procesar
+# cientos de artículos, 'GroupChatRunner':
+#   - crea un chat aislado por artículo con la fábrica que se le pasa ('create_chat'). Todos los chats
+#     comparten el mismo cliente asíncrono del proyecto y las mismas definiciones de agentes; cada
+#     chat usa sus propios hilos en el servicio, que se eliminan al terminar el artículo.
+#   - limita el número de artículos en curso ('max_concurrency'). Las cuotas de peticiones y tokens
+#     por minuto las aplican los limitadores del proceso ('common.rate_limit.get_limiter'), por los
+#     que ya pasan las peticiones de los agentes y del kernel; el ejecutor no lleva un cubo propio
+#     que descuente la misma cuota dos veces.
+#   - escribe la transcripción en JSONL a medida que llegan los mensajes (una línea por mensaje y una
+#     por resultado de artículo), así que un fallo a mitad no pierde lo ya procesado.
+#   - resume el rendimiento: artículos y turnos por minuto, iteraciones por artículo y espera en los
+#     limitadores durante la ejecución.
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional
+
+from semantic_kernel.agents import AgentGroupChat
+from semantic_kernel.contents import ChatMessageContent
+
+from common.rate_limit import limiter_stats
+from history_reducer import count_tokens, message_tokens
+
+TRANSCRIPT_PATH = "group_chat_transcripts.jsonl"
+
+
+@dataclass
+class ArticleResult:
+    """Resultado de un artículo procesado por el chat grupal."""
+    article_id: int
+    iterations: int  # Turnos de los agentes.
+    approved: bool
+    seconds: float
+    tokens: int  # Tokens consumidos (reales si el servicio los informa; si no, estimados).
+    error: Optional[str] = None
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+@dataclass
+class RunnerReport:
+    """Estadísticas agregadas de una ejecución."""
+    results: List[ArticleResult] = field(default_factory=list)
+    seconds: float = 0.0
+    limiter_wait_seconds: float = 0.0
+
+    def summary(self) -> str:
+        finished = [result for result in self.results if result.error is None]
+        iterations = [result.iterations for result in finished]
+        minutes = self.seconds / 60 or 1e-9
+        lines = [
+            f"Artículos: {len(self.results)} ({len(finished)} completados, "
+            f"{sum(result.approved for result in finished)} aprobados, {len(self.results) - len(finished)} con error)",
+            f"Tiempo total: {self.seconds:.1f}s, espera en los limitadores de cuota: {self.limiter_wait_seconds:.1f}s",
+            f"Rendimiento: {len(finished) / minutes:.1f} artículos/min, {sum(iterations) / minutes:.1f} turnos/min, "
+            f"{sum(result.tokens for result in self.results) / minutes:,.0f} tokens/min",
+        ]
+        if iterations:
+            lines.append(
+                f"Iteraciones por artículo: media {sum(iterations) / len(iterations):.1f}, "
+                f"p50 {_percentile(iterations, 0.5)}, p95 {_percentile(iterations, 0.95)}, máx. {max(iterations)}"
+            )
+            seconds = [result.seconds for result in finished]
+            lines.append(f"Duración por artículo: p50 {_percentile(seconds, 0.5):.1f}s, p95 {_percentile(seconds, 0.95):.1f}s")
+        return "\n".join(lines)
+
+
+class GroupChatRunner:
+    """
+    Procesa muchos artículos en paralelo, cada uno en su propio 'AgentGroupChat'.
+
+    Uso:
+        runner = GroupChatRunner(create_chat, max_concurrency=8)
+        report = await runner.run(prompts)
+        print(report.summary())
+    """
+
+    def __init__(
+        self,
+        make_chat: Callable[[], AgentGroupChat],
+        max_concurrency: int = 8,
+        transcript_path: str = TRANSCRIPT_PATH,
+    ):
+        """
+        Args:
+            make_chat: Fábrica que devuelve un chat nuevo (con sus propias estrategias) por artículo.
+            max_concurrency: Artículos en curso a la vez.
+            transcript_path: Fichero JSONL donde se añaden los mensajes y resultados.
+        """
+        self.make_chat = make_chat
+        self.max_concurrency = max_concurrency
+        self.transcript_path = transcript_path
+
+    async def run(self, prompts: Iterable[str]) -> RunnerReport:
+        """Procesa todos los prompts y devuelve el informe; los resultados quedan en orden de entrada."""
+        report = RunnerReport()
+        pending = enumerate(prompts)  # Los trabajadores se reparten los prompts sin cargarlos todos.
+        wait_before = self._limiter_wait()
+        start = time.perf_counter()
+        with open(self.transcript_path, "a", encoding="utf-8") as transcript:
+            async def worker():
+                for article_id, prompt in pending:
+                    report.results.append(await self._run_article(article_id, prompt, transcript))
+
+            await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        report.seconds = time.perf_counter() - start
+        report.limiter_wait_seconds = self._limiter_wait() - wait_before
+        report.results.sort(key=lambda result: result.article_id)
+        return report
+
+    # --- Implementación ---
+
+    async def _run_article(self, article_id: int, prompt: str, transcript) -> ArticleResult:
+        chat = self.make_chat()
+        start = time.perf_counter()
+        iterations = tokens = 0
+        error = None
+        self._write(transcript, {"type": "message", "article_id": article_id, "turn": 0, "agent": "user", "content": prompt})
+        try:
+            await chat.add_chat_message(message=prompt)
+            responses = chat.invoke().__aiter__()
+            while True:
+                # Cada paso del chat es, como mucho, una respuesta de un agente (más la estrategia).
+                prompt_estimate = sum(message_tokens(message) for message in chat.history.messages)
+                try:
+                    response = await responses.__anext__()
+                except StopAsyncIteration:
+                    break
+                tokens += self._tokens_used(response, prompt_estimate)
+                if response is None or not response.name:
+                    continue
+                iterations += 1
+                self._write(transcript, {
+                    "type": "message",
+                    "article_id": article_id,
+                    "turn": iterations,
+                    "agent": response.name,
+                    "content": str(response.content),
+                })
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            try:
+                await chat.reset()  # Elimina los hilos que el chat creó en el servicio.
+            except Exception:
+                pass
+        result = ArticleResult(
+            article_id=article_id,
+            iterations=iterations,
+            approved=error is None and chat.is_complete,
+            seconds=time.perf_counter() - start,
+            tokens=tokens,
+            error=error,
+        )
+        self._write(transcript, {"type": "result", **asdict(result)})
+        return result
+
+    @staticmethod
+    def _limiter_wait() -> float:
+        return sum(stats.waited_seconds for stats in limiter_stats().values())
+
+    @staticmethod
+    def _tokens_used(response: Optional[ChatMessageContent], prompt_estimate: int) -> int:
+        """Tokens de la respuesta según el uso que informa el servicio, o una estimación."""
+        usage = response.metadata.get("usage") if response is not None else None
+        if usage is not None:
+            total = getattr(usage, "total_tokens", None)
+            if total is None and isinstance(usage, dict):
+                total = usage.get("total_tokens")
+            if total:
+                return int(total)
+        return prompt_estimate + (count_tokens(str(response.content)) if response is not None else 0)
+
+    @staticmethod
+    def _write(transcript, record: dict):
+        record["time"] = datetime.now(timezone.utc).isoformat()
+        transcript.write(json.dumps(record, ensure_ascii=False) + "\n")
+        transcript.flush()
+
+
+def read_transcript(path: str = TRANSCRIPT_PATH, article_id: Optional[int] = None) -> List[dict]:
+    """Lee los registros del JSONL (opcionalmente solo los de un artículo)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [record for record in records if article_id is None or record.get("article_id") == article_id]
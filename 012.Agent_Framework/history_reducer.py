@@ -0,0 +1,149 @@
+# Reductor de historial por presupuesto de tokens con resumen incremental.
+#
+# 'ChatHistoryTruncationReducer(target_count=5)' cuenta mensajes, no tokens (cinco artículos largos
+# pueden superar el contexto y cinco mensajes cortos desperdician presupuesto), y descarta sin más
+# el contexto anterior. 'TokenBudgetSummaryReducer':
+#   - mantiene los mensajes más recientes que caben en 'max_tokens' (reservando sitio al resumen),
+#   - conserva siempre el último mensaje de los agentes protegidos (el artículo del Escritor que se
+#     está revisando), aunque haya quedado fuera del presupuesto,
+#   - pliega los mensajes expulsados en un resumen acumulado. El resumen se actualiza de forma
+#     incremental: solo se envían al modelo el resumen anterior y los mensajes expulsados desde
+#     entonces, no el historial completo.
+#   - guarda cada resumen indexado por el hash del tramo de historial que cubre. Las estrategias de
+#     selección y terminación reducen el mismo historial en cada turno, así que el resumen se
+#     reutiliza en lugar de recalcularse.
+import hashlib
+from typing import Dict, List, Optional
+
+from pydantic import Field
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent
+from semantic_kernel.contents.history_reducer.chat_history_reducer import ChatHistoryReducer
+
+SUMMARY_NAME = "resumen"
+SUMMARY_PROMPT = """Mantienes el resumen de una conversación entre agentes que escriben y revisan un artículo.
+Actualiza el RESUMEN ACTUAL incorporando los NUEVOS MENSAJES. Conserva las decisiones, las
+puntuaciones y las sugerencias de la revisión que sigan pendientes; omite el texto completo de
+versiones antiguas del artículo. Responde solo con el resumen actualizado, en menos de {max_words} palabras."""
+
+
+def count_tokens(text: str) -> int:
+    """Estimación aproximada de tokens (~4 caracteres por token)."""
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: ChatMessageContent) -> int:
+    # Unos pocos tokens por mensaje por el rol y el nombre.
+    return count_tokens(str(message.content or "")) + 4
+
+
+class TokenBudgetSummaryReducer(ChatHistoryReducer):
+    """
+    Reduce el historial a un presupuesto de tokens con un resumen acumulado de lo expulsado.
+
+    Uso:
+        history_reducer = TokenBudgetSummaryReducer(
+            service=kernel.get_service(service_id),
+            max_tokens=1500,
+            protected_names=[WRITER_NAME],
+        )
+        KernelFunctionSelectionStrategy(..., history_reducer=history_reducer)
+    """
+
+    service: ChatCompletionClientBase
+    max_tokens: int = Field(default=2000, gt=0)
+    summary_max_tokens: int = Field(default=300, gt=0)
+    # Agentes cuyo último mensaje se conserva siempre (p. ej. el Escritor: es el artículo en revisión).
+    protected_names: List[str] = Field(default_factory=list)
+    # ChatHistoryReducer exige un 'target_count' (en mensajes); aquí el límite es 'max_tokens'.
+    target_count: int = Field(default=1, gt=0)
+    summary: str = ""
+    summary_calls: int = 0
+    summary_cache_hits: int = 0
+    # Hash del tramo inicial del historial -> resumen que lo cubre.
+    summary_cache: Dict[str, str] = Field(default_factory=dict, exclude=True)
+
+    async def reduce(self) -> Optional["TokenBudgetSummaryReducer"]:
+        """Devuelve el reductor con el historial reducido, o None si ya cabe en el presupuesto."""
+        messages = list(self.messages)
+        # Los mensajes de sistema iniciales se conservan siempre.
+        head = 0
+        while head < len(messages) and messages[head].role in (AuthorRole.SYSTEM, AuthorRole.DEVELOPER):
+            head += 1
+        system, conversation = messages[:head], messages[head:]
+        budget = self.max_tokens - sum(message_tokens(message) for message in system)
+        if sum(message_tokens(message) for message in conversation) <= budget or len(conversation) < 2:
+            return None
+
+        # Se reserva sitio para el resumen y para el último mensaje de cada agente protegido.
+        reserved = self.summary_max_tokens + sum(message_tokens(message) for message in self._latest_protected(conversation))
+        cut = self._cut_index(conversation, budget - reserved)
+        if cut == 0:
+            return None
+        pinned = [message for message in self._latest_protected(conversation[:cut]) if message.name not in {kept.name for kept in conversation[cut:]}]
+        self.summary = await self._summary_for(conversation, cut)
+        summary_message = ChatMessageContent(
+            role=AuthorRole.SYSTEM,
+            name=SUMMARY_NAME,
+            content=f"Resumen de la conversación anterior:\n{self.summary}",
+        )
+        self.messages = system + [summary_message] + pinned + conversation[cut:]
+        return self
+
+    # --- Implementación ---
+
+    def _cut_index(self, conversation: List[ChatMessageContent], budget: int) -> int:
+        """Primer mensaje que se conserva: los más recientes que caben en el presupuesto (al menos uno)."""
+        used = 0
+        cut = len(conversation)
+        while cut > 0 and used + message_tokens(conversation[cut - 1]) <= budget:
+            used += message_tokens(conversation[cut - 1])
+            cut -= 1
+        cut = min(cut, len(conversation) - 1)
+        # No se separa el resultado de una herramienta de la llamada que lo produjo.
+        while cut > 0 and conversation[cut].role == AuthorRole.TOOL:
+            cut -= 1
+        return cut
+
+    def _latest_protected(self, messages: List[ChatMessageContent]) -> List[ChatMessageContent]:
+        """Último mensaje de cada agente protegido, en orden de aparición."""
+        latest: Dict[str, int] = {}
+        for index, message in enumerate(messages):
+            if message.name in self.protected_names:
+                latest[message.name] = index
+        return [messages[index] for index in sorted(latest.values())]
+
+    async def _summary_for(self, conversation: List[ChatMessageContent], cut: int) -> str:
+        """Resumen de conversation[:cut], partiendo del resumen en caché del tramo más largo ya resumido."""
+        prefix_hashes = self._prefix_hashes(conversation[:cut])
+        if prefix_hashes[cut] in self.summary_cache:
+            self.summary_cache_hits += 1
+            return self.summary_cache[prefix_hashes[cut]]
+        start, summary = 0, ""
+        for index in range(cut - 1, 0, -1):
+            if prefix_hashes[index] in self.summary_cache:
+                start, summary = index, self.summary_cache[prefix_hashes[index]]
+                break
+        summary = await self._fold(summary, conversation[start:cut])
+        self.summary_cache[prefix_hashes[cut]] = summary
+        return summary
+
+    @staticmethod
+    def _prefix_hashes(messages: List[ChatMessageContent]) -> List[str]:
+        """Hash encadenado de cada tramo inicial: hashes[i] cubre messages[:i]."""
+        hashes = [""]
+        for message in messages:
+            payload = f"{hashes[-1]}|{message.role}|{message.name}|{message.content}"
+            hashes.append(hashlib.sha256(payload.encode("utf-8")).hexdigest())
+        return hashes
+
+    async def _fold(self, summary: str, new_messages: List[ChatMessageContent]) -> str:
+        """Una llamada al modelo: resumen anterior + mensajes nuevos -> resumen actualizado."""
+        transcript = "\n\n".join(f"[{message.name or message.role}]: {message.content}" for message in new_messages)
+        history = ChatHistory()
+        history.add_system_message(SUMMARY_PROMPT.format(max_words=int(self.summary_max_tokens * 0.75)))
+        history.add_user_message(f"RESUMEN ACTUAL:\n{summary or '(vacío)'}\n\nNUEVOS MENSAJES:\n{transcript}")
+        settings = self.service.get_prompt_execution_settings_class()(max_tokens=self.summary_max_tokens)
+        response = await self.service.get_chat_message_content(history, settings)
+        self.summary_calls += 1
+        return str(response.content).strip() if response is not None else summary
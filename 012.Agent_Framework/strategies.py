@@ -0,0 +1,196 @@
+# Estrategias deterministas de selección y terminación para AgentGroupChat.
+#
+# En '05-agentChat.ipynb', 'KernelFunctionSelectionStrategy' hace una llamada al LLM en cada turno
+# solo para alternar entre Escritor y Revisor, y 'KernelFunctionTerminationStrategy' hace otra para
+# detectar si el revisor aprobó el artículo: el número de llamadas al modelo por turno se duplica.
+# Este módulo ofrece:
+#   - 'StateMachineSelectionStrategy': elige el siguiente agente con una tabla de transiciones
+#     (autor del último mensaje -> siguiente agente), sin llamar al modelo.
+#   - 'ScoreTerminationStrategy': extrae la puntuación del revisor con expresiones regulares y
+#     termina si supera el umbral (o si aparece la frase de aprobación). Solo si no encuentra ni
+#     puntuación ni frase recurre a una estrategia de respaldo basada en el LLM.
+#   - 'benchmark': cuenta las llamadas al modelo por artículo completado con cada configuración.
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from pydantic import Field
+from semantic_kernel import Kernel
+from semantic_kernel.agents import AgentGroupChat
+from semantic_kernel.agents.strategies import SelectionStrategy, TerminationStrategy
+from semantic_kernel.contents import AuthorRole, ChatMessageContent
+from semantic_kernel.exceptions import AgentExecutionException
+from semantic_kernel.filters import FilterTypes, FunctionInvocationContext
+
+USER_TURN = "user"
+
+# "Puntuación: 9/10", "puntuacion 7", "Score: 8 / 10", "**Puntuación:** 9".
+SCORE_PATTERN = re.compile(r"(?:puntuaci[oó]n|score|nota|calificaci[oó]n)\W{0,6}(\d{1,2}(?:[.,]\d)?)\s*(?:/\s*10)?", re.IGNORECASE)
+# "9/10" suelto, si no hay etiqueta.
+BARE_SCORE_PATTERN = re.compile(r"\b(\d{1,2}(?:[.,]\d)?)\s*/\s*10\b")
+
+
+def parse_review_score(text: str) -> Optional[float]:
+    """Devuelve la puntuación (0-10) que aparece en la revisión, o None si no se encuentra."""
+    for pattern in (SCORE_PATTERN, BARE_SCORE_PATTERN):
+        matches = pattern.findall(text or "")
+        for match in reversed(matches):  # La última puntuación suele ser la definitiva.
+            score = float(match.replace(",", "."))
+            if 0 <= score <= 10:
+                return score
+    return None
+
+
+class StateMachineSelectionStrategy(SelectionStrategy):
+    """
+    Selección de turnos por tabla de transiciones, sin llamadas al modelo.
+
+    Uso:
+        StateMachineSelectionStrategy(transitions={
+            USER_TURN: WRITER_NAME,         # tras el usuario habla el Escritor
+            WRITER_NAME: REVIEWER_NAME,     # tras el Escritor, el Revisor
+            REVIEWER_NAME: WRITER_NAME,     # tras el Revisor, el Escritor
+        })
+    """
+
+    # Nombre del autor del último mensaje (o USER_TURN) -> nombre del siguiente agente.
+    transitions: Dict[str, str] = Field(default_factory=dict)
+
+    async def select_agent(self, agents, history: List[ChatMessageContent]):
+        last = history[-1] if history else None
+        author = last.name if last is not None and last.role == AuthorRole.ASSISTANT and last.name else USER_TURN
+        next_name = self.transitions.get(author, self.transitions.get(USER_TURN))
+        for agent in agents:
+            if agent.name == next_name:
+                return agent
+        raise AgentExecutionException(f"No hay ningún agente '{next_name}' para continuar tras '{author}'")
+
+
+class ScoreTerminationStrategy(TerminationStrategy):
+    """
+    Termina cuando la puntuación del revisor supera 'threshold' o aparece la frase de aprobación.
+
+    Si el último mensaje no contiene ni puntuación ni frase, se consulta 'fallback' (por ejemplo,
+    una 'KernelFunctionTerminationStrategy'); sin respaldo, la conversación continúa.
+    """
+
+    threshold: float = 8.0  # El revisor aprueba los artículos con una puntuación superior a 8.
+    approval_phrase: Optional[str] = "listo para publicarse"
+    fallback: Optional[TerminationStrategy] = None
+    parsed: int = 0
+    fallback_calls: int = 0
+
+    async def should_agent_terminate(self, agent, history: List[ChatMessageContent]) -> bool:
+        text = str(history[-1].content) if history else ""
+        score = parse_review_score(text)
+        if score is not None:
+            self.parsed += 1
+            return score > self.threshold
+        if self.approval_phrase and self.approval_phrase.lower() in text.lower():
+            self.parsed += 1
+            return True
+        if self.fallback is None:
+            return False
+        self.fallback_calls += 1
+        return await self.fallback.should_agent_terminate(agent, history)
+
+
+class StrategyCallCounter:
+    """Cuenta las invocaciones de funciones en un kernel (las llamadas al LLM de las estrategias)."""
+
+    def __init__(self, kernel: Kernel):
+        self.calls = 0
+        kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, self._count)
+
+    async def _count(self, context: FunctionInvocationContext, next):
+        self.calls += 1
+        await next(context)
+
+
+@dataclass
+class ArticleRun:
+    """Resultado de escribir un artículo con el chat grupal."""
+    agent_turns: int
+    strategy_calls: int
+    seconds: float
+    approved: bool
+    # Resúmenes de los reductores de historial: llaman al servicio directamente, no a través del
+    # kernel, así que 'StrategyCallCounter' no los ve.
+    summary_calls: int = 0
+
+    @property
+    def model_calls(self) -> int:
+        # Cada turno de un agente es una llamada al modelo, más las de las estrategias y los resúmenes.
+        return self.agent_turns + self.strategy_calls + self.summary_calls
+
+
+@dataclass
+class BenchmarkResult:
+    """Llamadas al modelo por artículo con una configuración de estrategias."""
+    name: str
+    runs: List[ArticleRun] = field(default_factory=list)
+
+    def mean(self, attribute: str) -> float:
+        return sum(getattr(run, attribute) for run in self.runs) / len(self.runs) if self.runs else 0.0
+
+
+def _summary_calls(chat: AgentGroupChat) -> int:
+    """Llamadas de resumen de los reductores de historial de las estrategias del chat (y sus respaldos)."""
+    reducers = {}
+    pending = [chat.selection_strategy, chat.termination_strategy]
+    while pending:
+        strategy = pending.pop()
+        if strategy is None:
+            continue
+        reducer = getattr(strategy, "history_reducer", None)
+        if reducer is not None:
+            # Un mismo reductor puede estar en varias estrategias: se cuenta una vez.
+            reducers[id(reducer)] = reducer
+        pending.append(getattr(strategy, "fallback", None))
+    return sum(getattr(reducer, "summary_calls", 0) for reducer in reducers.values())
+
+
+async def run_article(chat: AgentGroupChat, prompt: str, counter: StrategyCallCounter) -> ArticleRun:
+    """Escribe un artículo con el chat y mide turnos, llamadas de las estrategias y resúmenes, y tiempo."""
+    calls_before = counter.calls
+    summaries_before = _summary_calls(chat)
+    start = time.perf_counter()
+    await chat.add_chat_message(message=prompt)
+    turns = 0
+    async for response in chat.invoke():
+        if response is not None and response.name:
+            turns += 1
+    return ArticleRun(
+        agent_turns=turns,
+        strategy_calls=counter.calls - calls_before,
+        summary_calls=_summary_calls(chat) - summaries_before,
+        seconds=time.perf_counter() - start,
+        # 'is_complete' solo queda a True si la estrategia de terminación decidió terminar (no por
+        # alcanzar el máximo de iteraciones).
+        approved=chat.is_complete,
+    )
+
+
+async def benchmark(
+    name: str,
+    make_chat: Callable[[], AgentGroupChat],
+    prompts: List[str],
+    counter: StrategyCallCounter,
+) -> BenchmarkResult:
+    """Escribe un artículo por prompt, cada uno en un chat nuevo, y acumula las métricas."""
+    result = BenchmarkResult(name)
+    for prompt in prompts:
+        result.runs.append(await run_article(make_chat(), prompt, counter))
+    return result
+
+
+def compare(results: List[BenchmarkResult]) -> str:
+    """Tabla comparativa de llamadas al modelo por artículo."""
+    lines = [f"{'Estrategias':<28}{'Artículos':>10}{'Turnos':>8}{'Llamadas estrategia':>21}{'Resúmenes':>11}{'Llamadas totales':>18}{'Aprobados':>11}{'Tiempo':>9}"]
+    for result in results:
+        lines.append(
+            f"{result.name:<28}{len(result.runs):>10}{result.mean('agent_turns'):>8.1f}{result.mean('strategy_calls'):>21.1f}"
+            f"{result.mean('summary_calls'):>11.1f}{result.mean('model_calls'):>18.1f}{sum(run.approved for run in result.runs):>11}{result.mean('seconds'):>8.1f}s"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,275 @@
+# Grupo (pool) de agentes trabajadores asíncronos y de larga duración.
+#
+# Las herramientas que delegan en un agente del servicio (por ejemplo, el investigador web y el
+# guionista de 011_Semantic_Kernel_SDK/04-agentic_system.py) creaban un agente y un hilo nuevos
+# en cada invocación, con el cliente síncrono (bloqueando el bucle de eventos del kernel) y sin
+# borrarlos nunca. 'AgentPool' crea cada agente una sola vez por rol, mantiene un grupo de hilos
+# reutilizables para ese agente, usa un único cliente asíncrono compartido y, al cerrarse, borra
+# los hilos y agentes que creó.
+# Los hilos se reutilizan entre tareas independientes: cada ejecución solo tiene en cuenta el
+# último mensaje (estrategia de truncado "last_messages"), así que el historial previo no influye
+# en la respuesta ni aumenta los tokens de prompt.
+# Un hilo solo vuelve al grupo si su última ejecución terminó. Si la tarea se cancela, falla a mitad
+# o el consumidor del streaming se detiene antes de tiempo, la ejecución puede seguir activa en el
+# servicio (y el siguiente mensaje del hilo fallaría): se cancela y, si no se puede confirmar que
+# terminó, el hilo se descarta y se borra.
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from azure.ai.projects.models import MessageDeltaChunk, ThreadRun, TruncationObject, TruncationStrategy
+
+# Estados de una ejecución que todavía no ha terminado.
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "requires_action", "cancelling")
+# Intervalo de sondeo del estado de una ejecución (el mismo que 'create_and_process_run').
+RUN_POLL_SECONDS = 1.0
+# Sondeos que se esperan a que una ejecución cancelada termine antes de descartar el hilo.
+CANCEL_POLLS = 10
+
+
+@dataclass
+class WorkerSpec:
+    """Definición de un rol de trabajador (se usa para crear su agente la primera vez)."""
+    name: str
+    model: str
+    instructions: str
+    tools: Optional[List] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class WorkerStats:
+    """Métricas acumuladas de un rol."""
+    calls: int = 0
+    seconds: float = 0.0
+    threads_created: int = 0
+    threads_discarded: int = 0  # Hilos con una ejecución que no se pudo dar por terminada.
+    agent_setup_seconds: float = 0.0
+
+
+class Worker:
+    """Un hilo reutilizable asociado al agente de un rol."""
+
+    def __init__(self, pool: "AgentPool", role: str, agent_id: str, thread_id: str):
+        self.pool = pool
+        self.role = role
+        self.agent_id = agent_id
+        self.thread_id = thread_id
+        self.run_id: Optional[str] = None  # Ejecución en curso, si se conoce su identificador.
+        self.clean = True  # False desde que se envía un mensaje hasta que su ejecución termina.
+
+    async def ask(self, content: str) -> str:
+        """
+        Envía un mensaje al agente en el hilo del trabajador y devuelve el texto de la respuesta.
+
+        Raises:
+            RuntimeError: Si la ejecución no termina correctamente.
+        """
+        message = await self.ask_message(content)
+        return message.content[0].text.value
+
+    async def ask_message(self, content: str):
+        """Igual que 'ask', pero devuelve el mensaje completo del agente (con sus anotaciones)."""
+        client = self.pool.client
+        self.clean = False
+        await client.agents.create_message(thread_id=self.thread_id, role="user", content=content)
+        # Se sondea a mano (en lugar de 'create_and_process_run') para conocer el identificador de la
+        # ejecución y poder cancelarla si la tarea se interrumpe mientras espera.
+        run = await client.agents.create_run(
+            thread_id=self.thread_id,
+            assistant_id=self.agent_id,
+            # Solo cuenta el último mensaje: el hilo se reutiliza para tareas independientes.
+            truncation_strategy=TruncationObject(type=TruncationStrategy.LAST_MESSAGES, last_messages=1),
+        )
+        self.run_id = run.id
+        while run.status in ACTIVE_RUN_STATUSES:
+            if run.status == "requires_action":
+                # Los trabajadores solo usan herramientas del servicio (Bing, etc.), no funciones locales.
+                raise RuntimeError(f"La ejecución del agente '{self.role}' pide llamar a funciones locales")
+            await asyncio.sleep(RUN_POLL_SECONDS)
+            run = await client.agents.get_run(thread_id=self.thread_id, run_id=run.id)
+        self.run_id, self.clean = None, True
+        if run.status != "completed":
+            raise RuntimeError(f"La ejecución del agente '{self.role}' terminó con estado {run.status}: {run.last_error}")
+        messages = await client.agents.list_messages(thread_id=self.thread_id, run_id=run.id)
+        return messages.data[0]
+
+    async def ask_stream(self, content: str) -> AsyncIterator[str]:
+        """
+        Igual que 'ask', pero devuelve el texto de la respuesta por fragmentos a medida que se genera.
+
+        Raises:
+            RuntimeError: Si la ejecución no termina correctamente.
+        """
+        client = self.pool.client
+        self.clean = False
+        await client.agents.create_message(thread_id=self.thread_id, role="user", content=content)
+        stream = await client.agents.create_stream(
+            thread_id=self.thread_id,
+            assistant_id=self.agent_id,
+            truncation_strategy=TruncationObject(type=TruncationStrategy.LAST_MESSAGES, last_messages=1),
+        )
+        async with stream:
+            async for _, event_data, _ in stream:
+                if isinstance(event_data, MessageDeltaChunk):
+                    yield event_data.text
+                elif isinstance(event_data, ThreadRun):
+                    self.run_id = event_data.id
+                    if event_data.status not in ACTIVE_RUN_STATUSES:
+                        self.run_id, self.clean = None, True
+                        if event_data.status != "completed":
+                            raise RuntimeError(f"La ejecución del agente '{self.role}' terminó con estado {event_data.status}: {event_data.last_error}")
+
+
+class AgentPool:
+    """
+    Agentes de larga duración con hilos reutilizables sobre un cliente asíncrono compartido.
+
+    Uso:
+        pool = AgentPool(async_project_client, size=2)
+        pool.register("web", WorkerSpec(name="bing-assistant", model=model, instructions="...", tools=bing.definitions))
+        async with pool.lease("web") as worker:
+            respuesta = await worker.ask("últimas noticias de la India")
+        ...
+        await pool.close()  # borra hilos y agentes
+    """
+
+    def __init__(self, client, size: int = 2):
+        """
+        Args:
+            client: Cliente asíncrono (azure.ai.projects.aio.AIProjectClient) compartido por todos los trabajadores.
+            size: Número máximo de hilos (tareas simultáneas) por rol.
+        """
+        self.client = client
+        self.size = size
+        self.specs: Dict[str, WorkerSpec] = {}
+        self.stats: Dict[str, WorkerStats] = {}
+        self._agents: Dict[str, str] = {}
+        self._idle: Dict[str, asyncio.Queue] = {}
+        self._created: Dict[str, int] = {}
+        self._threads: List[str] = []
+        self._agent_locks: Dict[str, asyncio.Lock] = {}
+        self._recovering: Set[asyncio.Task] = set()
+        self._closed = False
+
+    def register(self, role: str, spec: WorkerSpec):
+        """Registra un rol; su agente se crea la primera vez que se usa."""
+        self.specs[role] = spec
+        self.stats[role] = WorkerStats()
+
+    @asynccontextmanager
+    async def lease(self, role: str):
+        """
+        Toma un trabajador libre del rol (creándolo si hace falta) y lo devuelve al grupo al terminar.
+
+        Si la ejecución del trabajador quedó a medias (cancelación, error o streaming sin consumir
+        del todo), se recupera en segundo plano antes de que otra tarea pueda usar su hilo.
+        """
+        if self._closed:
+            raise RuntimeError("El grupo de agentes ya está cerrado")
+        worker = await self._acquire(role)
+        start = time.perf_counter()
+        try:
+            yield worker
+        finally:
+            self.stats[role].calls += 1
+            self.stats[role].seconds += time.perf_counter() - start
+            if worker.clean:
+                self._idle[role].put_nowait(worker)
+            else:
+                # En segundo plano: una tarea cancelada no debe quedarse esperando al servicio.
+                task = asyncio.get_running_loop().create_task(self._recover(worker))
+                self._recovering.add(task)
+                task.add_done_callback(self._recovering.discard)
+
+    async def ask(self, role: str, content: str) -> str:
+        """Atajo para tomar un trabajador, enviarle un mensaje y devolverlo al grupo."""
+        async with self.lease(role) as worker:
+            return await worker.ask(content)
+
+    async def close(self):
+        """Borra los hilos y agentes creados por el grupo. Es seguro llamarlo varias veces."""
+        if self._closed:
+            return
+        self._closed = True
+        await asyncio.gather(*self._recovering, return_exceptions=True)
+        deletions = [self.client.agents.delete_thread(thread_id) for thread_id in self._threads]
+        deletions += [self.client.agents.delete_agent(agent_id) for agent_id in self._agents.values()]
+        results = await asyncio.gather(*deletions, return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            print(f"⚠️ No se pudieron borrar {len(failures)} recursos del grupo de agentes: {failures[0]}")
+        self._threads.clear()
+        self._agents.clear()
+
+    # --- Implementación ---
+
+    async def _acquire(self, role: str) -> Worker:
+        if role not in self.specs:
+            raise KeyError(f"Rol de trabajador no registrado: {role}")
+        queue = self._idle.setdefault(role, asyncio.Queue())
+        while True:
+            if queue.empty() and self._created.get(role, 0) < self.size:
+                # Se reserva el hueco antes de esperar al servicio para no superar 'size' con llamadas simultáneas.
+                self._created[role] = self._created.get(role, 0) + 1
+                try:
+                    agent_id = await self._agent_id(role)
+                    thread = await self.client.agents.create_thread()
+                except BaseException:
+                    self._created[role] -= 1
+                    raise
+                self._threads.append(thread.id)
+                self.stats[role].threads_created += 1
+                return Worker(self, role, agent_id, thread.id)
+            # Todos los hilos del rol están ocupados: se espera a que se libere uno. None indica que se
+            # descartó un hilo y hay hueco para crear otro.
+            worker = await queue.get()
+            if worker is not None:
+                return worker
+
+    async def _recover(self, worker: Worker):
+        """Cancela la ejecución que quedó a medias y devuelve el trabajador al grupo, o descarta su hilo."""
+        agents = self.client.agents
+        if worker.run_id is not None:
+            try:
+                await agents.cancel_run(thread_id=worker.thread_id, run_id=worker.run_id)
+            except Exception:
+                pass  # Puede que ya hubiera terminado: se comprueba a continuación.
+            try:
+                for _ in range(CANCEL_POLLS):
+                    run = await agents.get_run(thread_id=worker.thread_id, run_id=worker.run_id)
+                    if run.status not in ACTIVE_RUN_STATUSES:
+                        worker.run_id, worker.clean = None, True
+                        self._idle[worker.role].put_nowait(worker)
+                        return
+                    await asyncio.sleep(RUN_POLL_SECONDS)
+            except Exception:
+                pass
+        # No se sabe qué ejecución quedó activa (o no terminó a tiempo): el hilo no se reutiliza.
+        self.stats[worker.role].threads_discarded += 1
+        self._created[worker.role] -= 1
+        self._idle[worker.role].put_nowait(None)
+        try:
+            await agents.delete_thread(worker.thread_id)
+            self._threads.remove(worker.thread_id)
+        except Exception:
+            pass  # Sigue en '_threads': 'close' lo intentará de nuevo.
+
+    async def _agent_id(self, role: str) -> str:
+        lock = self._agent_locks.setdefault(role, asyncio.Lock())
+        async with lock:
+            if role not in self._agents:
+                spec = self.specs[role]
+                start = time.perf_counter()
+                agent = await self.client.agents.create_agent(
+                    model=spec.model,
+                    name=spec.name,
+                    instructions=spec.instructions,
+                    tools=spec.tools,
+                    headers=spec.headers,
+                )
+                self._agents[role] = agent.id
+                self.stats[role].agent_setup_seconds += time.perf_counter() - start
+            return self._agents[role]
@@ -0,0 +1,151 @@
+# Descarga en paralelo de los archivos generados por el Intérprete de Código.
+#
+# En lugar de descargar cada imagen con 'save_file' una detrás de otra, 'ArtifactFetcher'
+# descarga todos los archivos de una respuesta en paralelo (con un límite de concurrencia),
+# escribe cada uno en disco por bloques a medida que llegan (sin cargarlo entero en memoria),
+# omite los que ya existen localmente y devuelve un manifiesto con el resultado de cada descarga.
+# Hay una versión síncrona (AIProjectClient) y otra asíncrona (azure.ai.projects.aio, usada en
+# los notebooks de Semantic Kernel).
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class ArtifactResult:
+    """Resultado de la descarga de un archivo."""
+    file_id: str
+    path: str
+    status: str  # "downloaded", "skipped" o "failed"
+    bytes: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def collect_artifacts(messages) -> List[Tuple[str, str]]:
+    """
+    Extrae de los mensajes de un hilo los archivos generados (imágenes y archivos adjuntos
+    en anotaciones), sin duplicados.
+
+    Returns:
+        Lista de tuplas (ID del archivo, nombre local sugerido).
+    """
+    artifacts = {}
+    for image_content in messages.image_contents:
+        file_id = image_content.image_file.file_id
+        artifacts[file_id] = f"{file_id}_image_file.png"
+    for annotation in getattr(messages, "file_path_annotations", []):
+        file_id = annotation.file_path.file_id
+        # El texto de la anotación tiene la forma "sandbox:/mnt/data/archivo.ext".
+        artifacts.setdefault(file_id, f"{file_id}_{os.path.basename(annotation.text)}")
+    return list(artifacts.items())
+
+
+class ArtifactFetcher:
+    """
+    Descarga en paralelo los archivos generados por un agente.
+
+    Uso:
+        fetcher = ArtifactFetcher(project_client, output_dir="salidas")
+        manifest = fetcher.fetch(collect_artifacts(messages))
+        # o, con el cliente asíncrono:
+        manifest = await fetcher.fetch_async(collect_artifacts(messages))
+    """
+
+    def __init__(self, project_client, output_dir: str = ".", max_concurrency: int = 4, manifest_name: Optional[str] = "artifacts_manifest.json"):
+        """
+        Args:
+            project_client: Cliente del proyecto (síncrono para 'fetch', asíncrono para 'fetch_async').
+            output_dir: Directorio donde se guardan los archivos.
+            max_concurrency: Número máximo de descargas simultáneas.
+            manifest_name: Nombre del manifiesto JSON que se escribe en 'output_dir' (None para no escribirlo).
+        """
+        self.project_client = project_client
+        self.output_dir = Path(output_dir)
+        self.max_concurrency = max_concurrency
+        self.manifest_name = manifest_name
+
+    # --- Versión síncrona ---
+
+    def fetch(self, artifacts: List[Tuple[str, str]]) -> List[ArtifactResult]:
+        """Descarga los archivos con un pool de hilos y devuelve el manifiesto."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            results = list(pool.map(lambda artifact: self._download(*artifact), artifacts))
+        return self._finish(results)
+
+    def _download(self, file_id: str, file_name: str) -> ArtifactResult:
+        path = self.output_dir / file_name
+        if path.exists():
+            return ArtifactResult(file_id=file_id, path=str(path), status="skipped", bytes=path.stat().st_size)
+        start = time.perf_counter()
+        tmp_path = path.with_name(path.name + ".part")
+        try:
+            size = 0
+            with open(tmp_path, "wb") as f:
+                # 'get_file_content' devuelve el contenido por bloques a medida que se recibe.
+                for chunk in self.project_client.agents.get_file_content(file_id=file_id):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+            return ArtifactResult(file_id=file_id, path=str(path), status="downloaded", bytes=size, seconds=time.perf_counter() - start)
+        except Exception as e:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return ArtifactResult(file_id=file_id, path=str(path), status="failed", seconds=time.perf_counter() - start, error=str(e))
+
+    # --- Versión asíncrona ---
+
+    async def fetch_async(self, artifacts: List[Tuple[str, str]]) -> List[ArtifactResult]:
+        """Descarga los archivos de forma concurrente con el cliente asíncrono y devuelve el manifiesto."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def download(file_id: str, file_name: str) -> ArtifactResult:
+            async with semaphore:
+                return await self._download_async(file_id, file_name)
+
+        results = await asyncio.gather(*(download(file_id, file_name) for file_id, file_name in artifacts))
+        return self._finish(list(results))
+
+    async def _download_async(self, file_id: str, file_name: str) -> ArtifactResult:
+        path = self.output_dir / file_name
+        if path.exists():
+            return ArtifactResult(file_id=file_id, path=str(path), status="skipped", bytes=path.stat().st_size)
+        start = time.perf_counter()
+        tmp_path = path.with_name(path.name + ".part")
+        try:
+            size = 0
+            stream = await self.project_client.agents.get_file_content(file_id=file_id)
+            with open(tmp_path, "wb") as f:
+                async for chunk in stream:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+            return ArtifactResult(file_id=file_id, path=str(path), status="downloaded", bytes=size, seconds=time.perf_counter() - start)
+        except Exception as e:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return ArtifactResult(file_id=file_id, path=str(path), status="failed", seconds=time.perf_counter() - start, error=str(e))
+
+    # --- Manifiesto ---
+
+    def _finish(self, results: List[ArtifactResult]) -> List[ArtifactResult]:
+        if self.manifest_name:
+            # El manifiesto acumula las descargas de turnos anteriores, indexadas por ID de archivo.
+            manifest_path = self.output_dir / self.manifest_name
+            manifest = {}
+            if manifest_path.exists():
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifest = {entry["file_id"]: entry for entry in json.load(f)}
+            for result in results:
+                if result.status != "skipped" or result.file_id not in manifest:
+                    manifest[result.file_id] = asdict(result)
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(list(manifest.values()), f, indent=2)
+        return results
@@ -0,0 +1,160 @@
+# Resolución de conexiones del proyecto de Azure AI con caché en memoria y en disco.
+#
+# Los ejemplos de Bing y de Azure AI Search necesitan el ID de una conexión del proyecto
+# para construir sus herramientas. Este módulo evita consultar el servicio en cada arranque
+# (y en cada invocación de una herramienta): la primera resolución se guarda en memoria y en
+# un archivo JSON, y se vuelve a validar contra el servicio solo cuando expira su TTL.
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+# Ruta por defecto del archivo de caché, compartido por todos los ejemplos del repositorio.
+DEFAULT_CACHE_PATH = os.getenv(
+    "CONNECTION_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "azure-ai-agent-service", "connections.json"),
+)
+# Tiempo de vida por defecto de una entrada (en segundos) antes de revalidarla.
+DEFAULT_TTL_SECONDS = int(os.getenv("CONNECTION_CACHE_TTL_SECONDS", "86400"))
+
+# Caché en memoria compartida por todas las instancias del proceso.
+_memory_cache: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class ConnectionInfo:
+    """Datos no sensibles de una conexión del proyecto (nunca se guardan credenciales)."""
+    id: str
+    name: str
+    connection_type: str
+    endpoint_url: Optional[str] = None
+
+
+class ConnectionResolver:
+    """
+    Resuelve conexiones del proyecto por nombre o por tipo usando una caché de dos niveles.
+
+    Uso:
+        resolver = ConnectionResolver(project_client, scope=project_connection_string)
+        bing = BingGroundingTool(connection_id=resolver.get_by_name("mi-bing").id)
+        search = resolver.get_by_type(ConnectionType.AZURE_AI_SEARCH)
+    """
+
+    def __init__(
+        self,
+        project_client,
+        scope: Optional[str] = None,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+    ):
+        """
+        Args:
+            project_client: Cliente AIProjectClient (solo se usa cuando hay que consultar el servicio).
+            scope: Identifica el proyecto (por ejemplo, su cadena de conexión) para no mezclar
+                conexiones de proyectos distintos en la misma caché.
+            cache_path: Archivo JSON de la caché persistente.
+            ttl_seconds: Segundos tras los cuales una entrada se revalida contra el servicio.
+        """
+        self.project_client = project_client
+        self.scope = hashlib.sha256((scope or "").encode("utf-8")).hexdigest()[:16]
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+
+    # --- API pública ---
+
+    def get_by_name(self, connection_name: str) -> ConnectionInfo:
+        """Devuelve la conexión con el nombre indicado."""
+        return self._resolve(f"name:{connection_name}", lambda: self._fetch_by_name(connection_name))
+
+    def get_by_type(self, connection_type) -> ConnectionInfo:
+        """Devuelve la primera conexión del tipo indicado (por ejemplo, ConnectionType.AZURE_AI_SEARCH)."""
+        type_name = _type_name(connection_type)
+        return self._resolve(f"type:{type_name}", lambda: self._fetch_by_type(connection_type))
+
+    def invalidate(self, key: Optional[str] = None):
+        """Elimina una entrada (o todas las del proyecto) de ambas cachés."""
+        with _lock:
+            disk = self._read_disk()
+            for cache in (_memory_cache, disk):
+                for cache_key in list(cache):
+                    if cache_key.startswith(f"{self.scope}|") and (key is None or cache_key.endswith(f"|{key}")):
+                        del cache[cache_key]
+            self._write_disk(disk)
+
+    # --- Lógica de caché ---
+
+    def _resolve(self, key: str, fetch) -> ConnectionInfo:
+        cache_key = f"{self.scope}|{key}"
+        with _lock:
+            # 1. Caché en memoria.
+            entry = _memory_cache.get(cache_key)
+            # 2. Caché en disco (por ejemplo, de una ejecución anterior del script).
+            if entry is None:
+                entry = self._read_disk().get(cache_key)
+                if entry is not None:
+                    _memory_cache[cache_key] = entry
+
+        if entry is not None and time.time() - entry["resolved_at"] < self.ttl_seconds:
+            return ConnectionInfo(**entry["connection"])
+
+        # 3. La entrada no existe o expiró: se consulta el servicio.
+        try:
+            connection = fetch()
+        except Exception as e:
+            if entry is None:
+                raise
+            # Si el servicio no responde, se sigue usando la entrada expirada.
+            print(f"⚠️ No se pudo revalidar la conexión '{key}', se usa la caché: {e}")
+            return ConnectionInfo(**entry["connection"])
+
+        entry = {"connection": asdict(connection), "resolved_at": time.time()}
+        with _lock:
+            _memory_cache[cache_key] = entry
+            disk = self._read_disk()
+            disk[cache_key] = entry
+            self._write_disk(disk)
+        return connection
+
+    def _read_disk(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Un archivo corrupto se trata como una caché vacía.
+            return {}
+
+    def _write_disk(self, data: Dict[str, Dict]):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    # --- Consultas al servicio ---
+
+    def _fetch_by_name(self, connection_name: str) -> ConnectionInfo:
+        return _to_info(self.project_client.connections.get(connection_name=connection_name))
+
+    def _fetch_by_type(self, connection_type) -> ConnectionInfo:
+        for connection in self.project_client.connections.list(connection_type=connection_type):
+            return _to_info(connection)
+        raise LookupError(f"No se encontró ninguna conexión de tipo {_type_name(connection_type)}")
+
+
+def _type_name(connection_type) -> str:
+    return str(getattr(connection_type, "value", connection_type))
+
+
+def _to_info(connection) -> ConnectionInfo:
+    return ConnectionInfo(
+        id=connection.id,
+        name=connection.name,
+        connection_type=_type_name(connection.connection_type),
+        endpoint_url=getattr(connection, "endpoint_url", None),
+    )
@@ -0,0 +1,298 @@
+# Caché de respuestas con grounding de Bing, con caducidad según el tipo de consulta.
+#
+# Cada consulta a un agente con la herramienta de Bing crea un agente, un hilo y una ejecución,
+# aunque la misma pregunta se haya hecho hace unos minutos. Esta caché guarda la respuesta y las
+# URLs citadas, indexadas por la consulta normalizada. La clave no incluye un idioma o mercado:
+# 'BingGroundingTool' no los admite, así que la respuesta solo depende del texto de la consulta.
+# La vigencia depende de la clase de consulta: el clima caduca en minutos, las noticias en una
+# hora y los datos de referencia ("¿quién fundó...?") en días.
+# Cuando una entrada ha caducado pero sigue dentro del margen de gracia, se devuelve al momento
+# y se refresca en segundo plano (stale-while-revalidate); pasado ese margen, se consulta de nuevo.
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from common.text import normalize_text
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "azure-ai-agent-service" / "grounding.json"
+
+# Vigencia (segundos) por clase de consulta.
+DEFAULT_TTLS: Dict[str, int] = {
+    "clima": 15 * 60,
+    "mercados": 5 * 60,
+    "deportes": 30 * 60,
+    "noticias": 60 * 60,
+    "referencia": 7 * 24 * 3600,
+}
+
+# Palabras (sin tildes) que identifican cada clase; se comprueban en este orden.
+QUERY_CLASSES: List[Tuple[str, List[str]]] = [
+    ("clima", ["clima", "tiempo hace", "temperatura", "lluvia", "llueve", "pronostico", "weather", "forecast"]),
+    ("mercados", ["cotizacion", "bolsa", "accion", "acciones", "precio del", "tipo de cambio", "dolar", "euro", "bitcoin", "stock"]),
+    ("deportes", ["partido", "marcador", "resultado del", "liga", "clasificacion", "score"]),
+    ("noticias", ["noticia", "noticias", "ultima hora", "ultimas", "hoy", "ahora", "actual", "reciente", "news", "latest", "today"]),
+]
+
+
+def classify_query(query: str) -> str:
+    """Devuelve la clase de la consulta ('clima', 'mercados', 'deportes', 'noticias' o 'referencia')."""
+    normalized = f" {normalize_text(query)} "
+    for query_class, keywords in QUERY_CLASSES:
+        if any(f" {keyword} " in normalized for keyword in keywords):
+            return query_class
+    return "referencia"
+
+
+def url_citations(message) -> List[str]:
+    """Extrae, sin duplicados, las URLs citadas en las anotaciones de un mensaje del agente."""
+    # Los modelos del SDK admiten acceso como diccionario, igual que la respuesta JSON del servicio.
+    urls = []
+    for content in message["content"]:
+        for annotation in content.get("text", {}).get("annotations", []):
+            url = annotation.get("url_citation", {}).get("url")
+            if url and url not in urls:
+                urls.append(url)
+    return urls
+
+
+@dataclass
+class GroundedAnswer:
+    """Respuesta con grounding servida por la caché."""
+    query: str
+    answer: str
+    citations: List[str]
+    query_class: str
+    age_seconds: float
+    source: str  # "fresh" (recién obtenida), "cache" (vigente) o "stale" (caducada, refrescándose)
+
+
+@dataclass
+class GroundingStats:
+    """Estadísticas de uso de la caché durante el proceso actual."""
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    refresh_errors: int = 0
+    by_class: Dict[str, int] = field(default_factory=dict)
+
+
+class GroundingCache:
+    """
+    Caché de respuestas de búsquedas con grounding.
+
+    Uso:
+        cache = GroundingCache()
+        result = cache.get_or_fetch(query, fetch=buscar_con_bing)
+        print(result.answer, result.citations)
+        cache.wait_for_refreshes()  # antes de cerrar el cliente, si hay refrescos en curso
+
+        # Con un cliente asíncrono, 'fetch' es una corrutina y el refresco es una tarea de asyncio:
+        result = await cache.aget_or_fetch(query, fetch=buscar_con_bing_async)
+        await cache.await_refreshes()
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        ttls: Optional[Dict[str, int]] = None,
+        stale_ratio: float = 1.0,
+        scope: Optional[str] = None,
+    ):
+        """
+        Args:
+            path: Archivo JSON donde se persisten las respuestas.
+            ttls: Vigencia en segundos por clase de consulta (se combina con DEFAULT_TTLS).
+            stale_ratio: Margen de gracia como fracción de la vigencia: una entrada se sirve caducada
+                (refrescándose en segundo plano) mientras su edad sea menor que ttl * (1 + stale_ratio).
+            scope: Distingue cachés que no deben mezclarse (por ejemplo, el modelo o las instrucciones del agente).
+        """
+        self.path = Path(path)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stale_ratio = stale_ratio
+        self.scope = scope or ""
+        self.stats = GroundingStats()
+        self._lock = threading.Lock()
+        self._refreshing: Dict[str, threading.Thread] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self._entries: Dict[str, Dict] = self._read()
+
+    def get_or_fetch(
+        self,
+        query: str,
+        fetch: Callable[[str], Tuple[str, List[str]]],
+        query_class: Optional[str] = None,
+    ) -> GroundedAnswer:
+        """
+        Devuelve la respuesta a la consulta desde la caché o llamando a 'fetch'.
+
+        Args:
+            query: La consulta del usuario.
+            fetch: Función que ejecuta la búsqueda y devuelve (respuesta, lista de URLs citadas).
+            query_class: Clase de la consulta; si es None se deduce con 'classify_query'.
+
+        Returns:
+            La respuesta junto con sus citas, su antigüedad y su origen.
+        """
+        query_class = query_class or classify_query(query)
+        key = self._key(query)
+        entry, age, state = self._lookup(key, query_class)
+        if state == "cache":
+            return self._answer(query, entry, age, "cache")
+        if state == "stale":
+            self._refresh_in_background(key, query, fetch, query_class)
+            return self._answer(query, entry, age, "stale")
+        answer, citations = fetch(query)
+        entry = self._store(key, query, answer, citations, query_class)
+        return self._answer(query, entry, 0.0, "fresh")
+
+    async def aget_or_fetch(
+        self,
+        query: str,
+        fetch: Callable[[str], Awaitable[Tuple[str, List[str]]]],
+        query_class: Optional[str] = None,
+    ) -> GroundedAnswer:
+        """Versión asíncrona de 'get_or_fetch': 'fetch' es una corrutina y el refresco, una tarea de asyncio."""
+        query_class = query_class or classify_query(query)
+        key = self._key(query)
+        entry, age, state = self._lookup(key, query_class)
+        if state == "cache":
+            return self._answer(query, entry, age, "cache")
+        if state == "stale":
+            if key not in self._refresh_tasks:
+                task = asyncio.create_task(self._refresh_async(key, query, fetch, query_class))
+                self._refresh_tasks[key] = task
+                task.add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+            return self._answer(query, entry, age, "stale")
+        answer, citations = await fetch(query)
+        entry = self._store(key, query, answer, citations, query_class)
+        return self._answer(query, entry, 0.0, "fresh")
+
+    async def await_refreshes(self):
+        """Espera a que terminen los refrescos asíncronos en curso."""
+        if self._refresh_tasks:
+            await asyncio.gather(*list(self._refresh_tasks.values()), return_exceptions=True)
+
+    def wait_for_refreshes(self, timeout: Optional[float] = None):
+        """Espera a que terminen los refrescos en segundo plano (útil antes de cerrar el cliente)."""
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def invalidate(self, query: Optional[str] = None):
+        """Elimina una consulta de la caché, o todas si 'query' es None."""
+        with self._lock:
+            if query is None:
+                self._entries = {}
+            else:
+                self._entries.pop(self._key(query), None)
+            self._write()
+
+    # --- Implementación ---
+
+    def _key(self, query: str) -> str:
+        payload = f"{self.scope}|{normalize_text(query)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _lookup(self, key: str, query_class: str):
+        """Devuelve (entrada, antigüedad, estado) con estado 'cache', 'stale' o 'miss', y actualiza las estadísticas."""
+        ttl = self.ttls.get(query_class, self.ttls["referencia"])
+        self.stats.by_class[query_class] = self.stats.by_class.get(query_class, 0) + 1
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < ttl:
+                self.stats.hits += 1
+                return entry, age, "cache"
+            if age < ttl * (1 + self.stale_ratio):
+                self.stats.stale_hits += 1
+                return entry, age, "stale"
+        self.stats.misses += 1
+        return None, 0.0, "miss"
+
+    def _store(self, key: str, query: str, answer: str, citations: List[str], query_class: str) -> Dict:
+        entry = {
+            "query": query,
+            "query_class": query_class,
+            "answer": answer,
+            "citations": list(citations),
+            "fetched_at": time.time(),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._write()
+        return entry
+
+    def _refresh_in_background(self, key: str, query: str, fetch, query_class: str):
+        with self._lock:
+            if key in self._refreshing:
+                return  # Ya hay un refresco en curso para esta consulta.
+
+            def refresh():
+                try:
+                    answer, citations = fetch(query)
+                    self._store(key, query, answer, citations, query_class)
+                    self.stats.refreshes += 1
+                except Exception as e:
+                    self._refresh_failed(query, e)
+                finally:
+                    with self._lock:
+                        self._refreshing.pop(key, None)
+
+            thread = threading.Thread(target=refresh, name=f"grounding-refresh-{key[:8]}", daemon=True)
+            self._refreshing[key] = thread
+        thread.start()
+
+    async def _refresh_async(self, key: str, query: str, fetch, query_class: str):
+        try:
+            answer, citations = await fetch(query)
+            self._store(key, query, answer, citations, query_class)
+            self.stats.refreshes += 1
+        except Exception as e:
+            self._refresh_failed(query, e)
+
+    def _refresh_failed(self, query: str, error: Exception):
+        # Si el refresco falla se sigue sirviendo la entrada caducada dentro del margen de gracia.
+        self.stats.refresh_errors += 1
+        print(f"⚠️ No se pudo refrescar la búsqueda '{query}': {error}")
+
+    @staticmethod
+    def _answer(query: str, entry: Dict, age: float, source: str) -> GroundedAnswer:
+        return GroundedAnswer(
+            query=query,
+            answer=entry["answer"],
+            citations=entry["citations"],
+            query_class=entry["query_class"],
+            age_seconds=age,
+            source=source,
+        )
+
+    def _read(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        # Se descartan las entradas que ya no se servirían ni siquiera como caducadas.
+        now = time.time()
+        self._entries = {
+            key: entry for key, entry in self._entries.items()
+            if now - entry["fetched_at"] < self.ttls.get(entry["query_class"], self.ttls["referencia"]) * (1 + self.stale_ratio)
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,264 @@
+# Paquetes (bundles) precompilados de plugins de plantillas de prompt.
+#
+# 'kernel.add_plugin(parent_directory=..., plugin_name=...)' recorre el directorio del plugin y lee
+# y valida el 'config.json' y el 'skprompt.txt' de cada función en cada arranque, aunque no hayan
+# cambiado (y el árbol de plugins está duplicado en 011_Semantic_Kernel_SDK y 012.Agent_Framework).
+# 'PluginBundle' compila una vez todas las funciones de un directorio de plugins (plantilla,
+# configuración de ejecución y variables de entrada) en un único archivo JSON y, en los arranques
+# siguientes, solo lee ese archivo. Al añadir un plugin al kernel no se construye ninguna función:
+# cada una es un sustituto ('LazyPromptFunction') con la descripción y los parámetros del paquete,
+# y el 'KernelFunctionFromPrompt' real (validación de la configuración y análisis de la plantilla)
+# se construye la primera vez que se invoca la función o se pide su plantilla.
+# El paquete se invalida por función al usarla: si cambió la fecha de modificación o el tamaño de
+# sus archivos se compara el hash del contenido y, si es distinto, solo se recompila esa función.
+# Si se añaden o eliminan funciones de un plugin (cambia la fecha de su directorio), se vuelve a
+# recorrer el directorio de ese plugin al cargarlo.
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pydantic import PrivateAttr
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelFunction, KernelFunctionFromPrompt, KernelFunctionMetadata, KernelParameterMetadata, KernelPlugin
+from semantic_kernel.functions.kernel_function_from_prompt import PROMPT_RETURN_PARAM
+from semantic_kernel.prompt_template import PromptTemplateConfig
+
+DEFAULT_BUNDLE_DIR = Path.home() / ".cache" / "azure-ai-agent-service" / "plugin_bundles"
+BUNDLE_VERSION = 1
+CONFIG_FILE = "config.json"
+PROMPT_FILE = "skprompt.txt"
+
+
+def _stat(path: Path) -> List[int]:
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _metadata(entry: Dict) -> KernelFunctionMetadata:
+    """Metadatos de una función a partir de su entrada del paquete (los mismos que genera 'KernelFunctionFromPrompt')."""
+    config = entry["config"]
+    return KernelFunctionMetadata(
+        name=entry["function"],
+        plugin_name=entry["plugin"],
+        description=config.get("description"),
+        parameters=[
+            KernelParameterMetadata(
+                name=variable["name"],
+                description=variable.get("description", ""),
+                default_value=variable.get("default", ""),
+                type_=variable.get("json_schema", ""),
+                is_required=variable.get("is_required", True),
+            )
+            for variable in config.get("input_variables", [])
+        ],
+        is_prompt=True,
+        is_asynchronous=True,
+        return_parameter=PROMPT_RETURN_PARAM,
+    )
+
+
+class LazyPromptFunction(KernelFunction):
+    """
+    Sustituto de una función de plantilla de prompt que construye la función real la primera vez que se usa.
+
+    Hasta entonces sus metadatos son los del paquete; al construirla se comprueba si sus archivos
+    cambiaron y pasa a tener los metadatos de la función real, en la que delega las invocaciones.
+    """
+
+    _bundle: Any = PrivateAttr()
+
+    def __init__(self, bundle: "PluginBundle", entry: Dict):
+        super().__init__(metadata=_metadata(entry))
+        self._bundle = bundle
+
+    @property
+    def function(self) -> KernelFunctionFromPrompt:
+        """La función real (se construye, y se recompila si cambió en disco, la primera vez)."""
+        function = self._bundle._build(self.plugin_name, self.name)
+        if self.metadata is not function.metadata:
+            self.metadata = function.metadata
+        return function
+
+    @property
+    def prompt_template(self):
+        return self.function.prompt_template
+
+    @property
+    def prompt_execution_settings(self):
+        return self.function.prompt_execution_settings
+
+    async def _invoke_internal(self, context):
+        await self.function._invoke_internal(context)
+
+    async def _invoke_internal_stream(self, context):
+        await self.function._invoke_internal_stream(context)
+
+
+class PluginBundle:
+    """
+    Paquete compilado de los plugins de plantillas de prompt de un directorio.
+
+    Uso:
+        bundle = PluginBundle("plugins/prompt_templates")
+        plugin = bundle.add_to_kernel(kernel, "basic_plugin")               # todas sus funciones
+        plugin = bundle.add_to_kernel(kernel, "basic_plugin", ["greeting"])  # solo las indicadas
+        greeting_function = bundle.get_function("basic_plugin", "greeting")  # se construye al invocarla
+    """
+
+    def __init__(self, plugins_dir: str, bundle_dir: Path = DEFAULT_BUNDLE_DIR):
+        """
+        Args:
+            plugins_dir: Directorio con un subdirectorio por plugin y uno por función
+                (cada uno con 'config.json' y 'skprompt.txt').
+            bundle_dir: Directorio donde se guardan los paquetes compilados.
+        """
+        self.plugins_dir = Path(plugins_dir).resolve()
+        location = hashlib.sha256(str(self.plugins_dir).encode("utf-8")).hexdigest()[:16]
+        self.bundle_path = Path(bundle_dir) / f"{location}.json"
+        self.compiled = 0  # Funciones compiladas (leídas de disco) en este proceso.
+        self._functions: Dict[str, LazyPromptFunction] = {}
+        self._built: Dict[str, KernelFunctionFromPrompt] = {}
+        self._checked: Set[str] = set()  # Plugins cuyo directorio ya se comprobó en este proceso.
+        self._data = self._load()
+
+    def plugin_names(self) -> List[str]:
+        """Nombres de los plugins del directorio."""
+        return sorted(path.name for path in self.plugins_dir.iterdir() if path.is_dir())
+
+    def function_names(self, plugin_name: str) -> List[str]:
+        """Nombres de las funciones de un plugin (sin construirlas)."""
+        return sorted(entry["function"] for entry in self._plugin_entries(plugin_name))
+
+    def get_function(self, plugin_name: str, function_name: str) -> LazyPromptFunction:
+        """Devuelve la función sin construirla: se construye (y se recompila si cambió en disco) al invocarla."""
+        key = f"{plugin_name}/{function_name}"
+        if key not in self._functions:
+            self._plugin_entries(plugin_name)
+            entry = self._data["functions"].get(key)
+            if entry is None:
+                raise KeyError(f"La función '{key}' no existe en {self.plugins_dir}")
+            self._functions[key] = LazyPromptFunction(self, entry)
+        return self._functions[key]
+
+    def plugin(self, plugin_name: str, functions: Optional[Iterable[str]] = None) -> KernelPlugin:
+        """Construye el plugin con todas sus funciones o solo con las indicadas."""
+        names = list(functions) if functions is not None else self.function_names(plugin_name)
+        return KernelPlugin(name=plugin_name, functions=[self.get_function(plugin_name, name) for name in names])
+
+    def add_to_kernel(self, kernel: Kernel, plugin_name: str, functions: Optional[Iterable[str]] = None) -> KernelPlugin:
+        """Equivalente a 'kernel.add_plugin(parent_directory=..., plugin_name=...)' usando el paquete."""
+        return kernel.add_plugin(self.plugin(plugin_name, functions))
+
+    # --- Implementación ---
+
+    def _load(self) -> Dict:
+        """Lee el paquete (vacío si falta, no se puede leer o es de otra versión); no recorre el árbol de plugins."""
+        data = None
+        if self.bundle_path.exists():
+            try:
+                with open(self.bundle_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = None
+        if data is None or data.get("version") != BUNDLE_VERSION:
+            data = {"version": BUNDLE_VERSION, "plugins_dir": str(self.plugins_dir), "directories": {}, "functions": {}}
+        return data
+
+    def _plugin_entries(self, plugin_name: str) -> List[Dict]:
+        """Entradas de un plugin; la primera vez en el proceso se comprueba la fecha de su directorio."""
+        if plugin_name not in self._checked:
+            plugin_dir = self.plugins_dir / plugin_name
+            stat = _stat(plugin_dir) if plugin_dir.is_dir() else None
+            if stat != self._data["directories"].get(plugin_name):
+                self._scan_plugin(plugin_name, stat)
+            self._checked.add(plugin_name)
+        return [entry for entry in self._data["functions"].values() if entry["plugin"] == plugin_name]
+
+    def _scan_plugin(self, plugin_name: str, stat: Optional[List[int]]):
+        """Recorre el directorio de un plugin; las funciones que ya estaban en el paquete se comprueban al usarlas."""
+        functions = self._data["functions"]
+        previous = {key: functions.pop(key) for key in [key for key, entry in functions.items() if entry["plugin"] == plugin_name]}
+        if stat is None:
+            self._data["directories"].pop(plugin_name, None)
+        else:
+            for function_dir in sorted(path for path in (self.plugins_dir / plugin_name).iterdir() if path.is_dir()):
+                if not (function_dir / PROMPT_FILE).exists():
+                    continue
+                key = f"{plugin_name}/{function_dir.name}"
+                functions[key] = previous.get(key) or self._compile_function(plugin_name, function_dir.name)
+            self._data["directories"][plugin_name] = stat
+        self._write(self._data)
+
+    def _build(self, plugin_name: str, function_name: str) -> KernelFunctionFromPrompt:
+        """Construye la función real la primera vez, recompilando su entrada si cambió en disco."""
+        key = f"{plugin_name}/{function_name}"
+        if key not in self._built:
+            entry = self._data["functions"][key]
+            current = self._refresh(entry)
+            if current is not entry:
+                self._data["functions"][key] = current
+                self._write(self._data)
+            config = PromptTemplateConfig.model_validate(current["config"])
+            self._built[key] = KernelFunctionFromPrompt(
+                function_name=function_name,
+                plugin_name=plugin_name,
+                description=config.description,
+                prompt_template_config=config,
+            )
+        return self._built[key]
+
+    def _compile_function(self, plugin_name: str, function_name: str) -> Dict:
+        function_dir = self.plugins_dir / plugin_name / function_name
+        config_path, prompt_path = function_dir / CONFIG_FILE, function_dir / PROMPT_FILE
+        config_text = config_path.read_text(encoding="utf-8") if config_path.exists() else "{}"
+        template = prompt_path.read_text(encoding="utf-8")
+        # Igual que 'KernelFunctionFromPrompt.from_directory': el nombre es el del directorio y la plantilla, el skprompt.txt.
+        config = {**json.loads(config_text), "name": function_name, "template": template}
+        self.compiled += 1
+        return {
+            "plugin": plugin_name,
+            "function": function_name,
+            "config": config,
+            "files": {CONFIG_FILE: _stat(config_path) if config_path.exists() else None, PROMPT_FILE: _stat(prompt_path)},
+            "sha256": hashlib.sha256(f"{config_text}\0{template}".encode("utf-8")).hexdigest(),
+        }
+
+    def _refresh(self, entry: Dict) -> Dict:
+        """Devuelve la misma entrada si los archivos de la función no cambiaron; si cambiaron, la recompila."""
+        function_dir = self.plugins_dir / entry["plugin"] / entry["function"]
+        current = {
+            name: _stat(function_dir / name) if (function_dir / name).exists() else None
+            for name in (CONFIG_FILE, PROMPT_FILE)
+        }
+        if current == entry["files"]:
+            return entry
+        # La fecha cambió: solo se recompila si el contenido es distinto (p. ej. tras un 'git checkout' no lo es).
+        fresh = self._compile_function(entry["plugin"], entry["function"])
+        if fresh["sha256"] == entry["sha256"]:
+            return {**entry, "files": fresh["files"]}
+        return fresh
+
+    def _write(self, data: Dict):
+        self.bundle_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.bundle_path.with_name(f"{self.bundle_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.bundle_path)
+
+
+_bundles: Dict[Path, PluginBundle] = {}
+
+
+def load_plugin(kernel: Kernel, plugins_dir: str, plugin_name: str, functions: Optional[Iterable[str]] = None) -> KernelPlugin:
+    """
+    Añade al kernel un plugin de plantillas de prompt desde su paquete compilado.
+
+    Sustituye a 'kernel.add_plugin(parent_directory=plugins_dir, plugin_name=plugin_name)'; el paquete
+    de cada directorio se lee una sola vez por proceso y las funciones se construyen al invocarlas.
+    """
+    path = Path(plugins_dir).resolve()
+    if path not in _bundles:
+        _bundles[path] = PluginBundle(path)
+    return _bundles[path].add_to_kernel(kernel, plugin_name, functions)
@@ -0,0 +1,558 @@
+# Limitación de peticiones y tokens por minuto compartida por todos los clientes del proceso.
+#
+# Los despliegues de Azure OpenAI y el Servicio de Agentes tienen cuotas de peticiones por minuto
+# (RPM) y de tokens por minuto (TPM); al superarlas responden 429 y los clientes reintentan cada uno
+# por su cuenta, así que con muchas llamadas en paralelo los reintentos se amontonan y el total se
+# alarga. Este módulo ofrece:
+#   - 'RateLimiter': limitador de proceso para RPM y TPM a la vez, con concurrencia adaptativa (AIMD:
+#     sube de uno en uno con las respuestas correctas y se reduce a la mitad ante un 429). Lee las
+#     cabeceras 'x-ratelimit-remaining-requests/tokens' para no gastar más de lo que queda en el
+#     servicio, y 'retry-after' para pausar a todos los clientes a la vez en lugar de reintentar cada
+#     uno por separado. Opcionalmente, el estado de los cubos se comparte entre procesos en un archivo
+#     con bloqueo ('shared_state_path').
+#   - 'get_limiter(service)': un limitador por servicio ("openai" para el despliegue de Azure OpenAI y
+#     "agents" para el Servicio de Agentes), porque cada uno tiene su propia cuota y sus cabeceras solo
+#     describen la suya. Todo el proceso (clientes, 'BatchInvoker' de 011 y 'GroupChatRunner' de 012)
+#     usa estos mismos limitadores.
+#   - Enganches para los clientes: 'RateLimitedTransport' / 'AsyncRateLimitedTransport' (transporte de
+#     httpx para el cliente de OpenAI) y 'RateLimitPolicy' / 'AsyncRateLimitPolicy' (política "sans I/O"
+#     del pipeline de azure-core, para 'project_client.agents'), más funciones para construirlos.
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+import httpx
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+
+# Versión de la API de Azure OpenAI para los clientes que se construyen aquí.
+AZURE_OPENAI_API_VERSION = "2024-10-21"
+# Tokens de respuesta que se reservan si la petición no indica 'max_tokens' (Azure OpenAI también
+# descuenta de la cuota el máximo de la respuesta, no lo que finalmente genera).
+DEFAULT_COMPLETION_TOKENS = 1000
+# Pausa ante un 429 sin cabecera 'retry-after'.
+DEFAULT_RETRY_AFTER_SECONDS = 2.0
+# Intervalo de espera cuando todos los huecos de concurrencia están ocupados.
+POLL_SECONDS = 0.05
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "azure-ai-agent-service", "rate_limit.json")
+
+# Servicios con cuota propia y sus variables de entorno (peticiones por minuto, tokens por minuto).
+OPENAI = "openai"
+AGENTS = "agents"
+SERVICE_SETTINGS: Dict[str, Tuple[str, Optional[str]]] = {
+    OPENAI: ("AZURE_OPENAI_REQUESTS_PER_MINUTE", "AZURE_OPENAI_TOKENS_PER_MINUTE"),
+    # Las peticiones al Servicio de Agentes (hilos, mensajes, sondeo de ejecuciones) no llevan tokens.
+    AGENTS: ("AZURE_AI_AGENTS_REQUESTS_PER_MINUTE", None),
+}
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Segundos de espera indicados por 'retry-after-ms', 'x-ms-retry-after-ms' o 'retry-after' (segundos o fecha HTTP)."""
+    for name in ("retry-after-ms", "x-ms-retry-after-ms"):
+        value = headers.get(name)
+        if value:
+            try:
+                return max(0.0, float(value) / 1000)
+            except ValueError:
+                pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def estimate_request_tokens(body) -> int:
+    """
+    Tokens que la petición descontará de la cuota: prompt (~4 caracteres por token) más el máximo de
+    la respuesta. Las peticiones que no van a un modelo (p. ej. crear un hilo) no cuentan tokens.
+    """
+    if not body:
+        return 0
+    try:
+        payload = json.loads(body)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return 0
+    if not isinstance(payload, dict):
+        return 0
+    if "messages" in payload:
+        prompt = len(json.dumps(payload["messages"], ensure_ascii=False)) // 4
+        completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+        return prompt + int(completion)
+    if "input" in payload:  # Embeddings: solo cuenta la entrada.
+        return len(json.dumps(payload["input"], ensure_ascii=False)) // 4
+    return 0
+
+
+@dataclass
+class RateLimitStats:
+    """Estadísticas del limitador durante el proceso actual."""
+    requests: int = 0
+    throttled: int = 0  # Respuestas 429.
+    waited_seconds: float = 0.0  # Tiempo total de espera de las peticiones antes de enviarse.
+    concurrency: int = 0  # Límite de concurrencia actual (AIMD).
+
+
+class _LocalState:
+    """Estado de los cubos en memoria, compartido por los hilos del proceso."""
+
+    def __init__(self, initial: Dict[str, float]):
+        self._state = dict(initial)
+
+    def transact(self, update: Callable[[Dict[str, float]], float]) -> float:
+        return update(self._state)  # El limitador ya tiene tomado su cerrojo.
+
+
+class _SharedState:
+    """Estado de los cubos en un archivo JSON con bloqueo, compartido entre procesos."""
+
+    def __init__(self, path: str, initial: Dict[str, float]):
+        self.path = path
+        self.initial = initial
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def transact(self, update: Callable[[Dict[str, float]], float]) -> float:
+        import portalocker  # Solo se necesita con el estado compartido entre procesos.
+
+        with portalocker.Lock(f"{self.path}.lock", timeout=10):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    state = {**self.initial, **json.load(f)}
+            except (OSError, ValueError):
+                state = dict(self.initial)
+            result = update(state)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        return result
+
+
+class RateLimiter:
+    """
+    Limitador de peticiones y tokens por minuto con concurrencia adaptativa (AIMD).
+
+    Uso:
+        limiter = RateLimiter(requests_per_minute=300, tokens_per_minute=90_000)
+        client = AzureOpenAI(..., http_client=rate_limited_http_client(limiter))
+        print(limiter.stats)
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 16,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        shared_state_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            requests_per_minute: Cuota de peticiones por minuto (None: sin límite local).
+            tokens_per_minute: Cuota de tokens por minuto (None: sin límite local).
+            max_concurrency: Máximo de peticiones en curso a la vez en este proceso.
+            initial_concurrency: Límite de concurrencia inicial; crece con las respuestas correctas.
+            min_concurrency: Límite mínimo tras reducirlo por respuestas 429.
+            shared_state_path: Archivo para compartir los cubos y las pausas entre procesos (None: solo
+                este proceso). La concurrencia siempre es por proceso.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.stats = RateLimitStats(concurrency=max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        initial = {
+            "requests": float(requests_per_minute or 0),
+            "tokens": float(tokens_per_minute or 0),
+            "updated": time.time(),
+            "blocked_until": 0.0,
+        }
+        self._state = _SharedState(shared_state_path, initial) if shared_state_path else _LocalState(initial)
+
+    def acquire(self, tokens: int = 0):
+        """Espera (bloqueando el hilo) hasta poder enviar una petición que consumirá 'tokens'."""
+        start = time.monotonic()
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait)
+        self._waited(time.monotonic() - start)
+
+    async def acquire_async(self, tokens: int = 0):
+        """Versión asíncrona de 'acquire': espera sin bloquear el bucle de eventos."""
+        start = time.monotonic()
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+        self._waited(time.monotonic() - start)
+
+    def observe(self, status_code: int, headers: Mapping[str, str]):
+        """Ajusta el limitador con la respuesta: cabeceras de cuota restante, 'retry-after' y AIMD."""
+        remaining_requests = _header_number(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_number(headers, "x-ratelimit-remaining-tokens")
+        retry_after = parse_retry_after(headers) if status_code in (429, 503) else None
+        if status_code == 429 and retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER_SECONDS
+        now = time.time()
+
+        def update(state):
+            # El servicio sabe lo que queda de verdad (incluidas las llamadas de otros clientes).
+            if remaining_requests is not None and self.requests_per_minute:
+                state["requests"] = min(state["requests"], remaining_requests)
+            if remaining_tokens is not None and self.tokens_per_minute:
+                state["tokens"] = min(state["tokens"], remaining_tokens)
+            if retry_after is not None:
+                # Todas las peticiones esperan a la vez: se evita la avalancha de reintentos.
+                state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+            return 0.0
+
+        with self._lock:
+            if remaining_requests is not None or remaining_tokens is not None or retry_after is not None:
+                self._state.transact(update)
+            if status_code == 429:
+                self.stats.throttled += 1
+                # Las respuestas 429 de una misma ráfaga solo reducen el límite una vez.
+                if now - self._last_decrease > max(retry_after, 1.0):
+                    self.stats.concurrency = max(self.min_concurrency, self.stats.concurrency // 2)
+                    self._last_decrease = now
+                self._successes = 0
+            elif status_code < 400:
+                self._successes += 1
+                if self._successes >= self.stats.concurrency:
+                    self.stats.concurrency = min(self.max_concurrency, self.stats.concurrency + 1)
+                    self._successes = 0
+
+    def release(self):
+        """Libera el hueco de concurrencia de una petición (haya terminado bien o con error)."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    # --- Implementación ---
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Reserva la petición si es posible y devuelve 0; si no, devuelve los segundos a esperar."""
+        with self._lock:
+            if self._in_flight >= self.stats.concurrency:
+                return POLL_SECONDS
+            wait = self._state.transact(lambda state: self._take(state, tokens, time.time()))
+            if wait == 0:
+                self._in_flight += 1
+                self.stats.requests += 1
+            return wait
+
+    def _take(self, state: Dict[str, float], tokens: int, now: float) -> float:
+        elapsed = max(0.0, now - state["updated"])
+        state["updated"] = now
+        waits = [state["blocked_until"] - now]
+        if self.requests_per_minute:
+            state["requests"] = min(self.requests_per_minute, state["requests"] + elapsed * self.requests_per_minute / 60)
+            waits.append((1 - state["requests"]) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute and tokens:
+            state["tokens"] = min(self.tokens_per_minute, state["tokens"] + elapsed * self.tokens_per_minute / 60)
+            # Una petición mayor que la cuota se admite con el cubo lleno y deja el saldo en negativo.
+            needed = min(tokens, self.tokens_per_minute)
+            waits.append((needed - state["tokens"]) * 60 / self.tokens_per_minute)
+        wait = max(waits)
+        if wait > 0:
+            return wait
+        if self.requests_per_minute:
+            state["requests"] -= 1
+        if self.tokens_per_minute:
+            state["tokens"] -= tokens
+        return 0.0
+
+    def _waited(self, seconds: float):
+        with self._lock:
+            self.stats.waited_seconds += seconds
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# --- Limitador del proceso ---
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(service: str = OPENAI) -> RateLimiter:
+    """
+    Limitador compartido por todo el proceso para un servicio ("openai" o "agents").
+
+    Se configura con las variables de entorno de SERVICE_SETTINGS, RATE_LIMIT_MAX_CONCURRENCY y
+    RATE_LIMIT_SHARED_STATE (ruta del archivo de estado, o "1" para la ruta por defecto; cada servicio
+    usa su propio archivo).
+    """
+    with _limiters_lock:
+        if service not in _limiters:
+            requests_variable, tokens_variable = SERVICE_SETTINGS[service]
+            shared = os.getenv("RATE_LIMIT_SHARED_STATE", "")
+            shared_path = (DEFAULT_STATE_PATH if shared.lower() in ("1", "true") else shared) or None
+            if shared_path:
+                root, extension = os.path.splitext(shared_path)
+                shared_path = f"{root}_{service}{extension or '.json'}"
+            _limiters[service] = RateLimiter(
+                requests_per_minute=float(os.getenv(requests_variable, "0")) or None,
+                tokens_per_minute=(float(os.getenv(tokens_variable, "0")) or None) if tokens_variable else None,
+                max_concurrency=int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "16")),
+                shared_state_path=shared_path,
+            )
+        return _limiters[service]
+
+
+def limiter_stats() -> Dict[str, RateLimitStats]:
+    """Estadísticas de los limitadores creados en el proceso, por servicio."""
+    with _limiters_lock:
+        return {service: limiter.stats for service, limiter in _limiters.items()}
+
+
+# --- Enganche con httpx (cliente de OpenAI) ---
+
+def _request_tokens(request: httpx.Request) -> int:
+    try:
+        return estimate_request_tokens(request.content)
+    except httpx.RequestNotRead:  # Cuerpo en streaming: no se puede estimar sin consumirlo.
+        return 0
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Cuerpo de la respuesta que libera el hueco de concurrencia al cerrarse (también en streaming)."""
+
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Transporte de httpx que pasa cada petición por el limitador (para 'AzureOpenAI(http_client=...)')."""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, transport: Optional[httpx.BaseTransport] = None):
+        self.limiter = limiter or get_limiter(OPENAI)
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.limiter.acquire(_request_tokens(request))
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            self.limiter.release()
+            raise
+        self.limiter.observe(response.status_code, response.headers)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self.limiter.release),
+            extensions=response.extensions,
+        )
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Versión asíncrona de 'RateLimitedTransport' (para 'AsyncAzureOpenAI' y Semantic Kernel)."""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.limiter = limiter or get_limiter(OPENAI)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.limiter.acquire_async(_request_tokens(request))
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:  # También si la tarea se cancela mientras espera la respuesta.
+            self.limiter.release()
+            raise
+        self.limiter.observe(response.status_code, response.headers)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_AsyncReleasingStream(response.stream, self.limiter.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def rate_limited_http_client(limiter: Optional[RateLimiter] = None, async_client: bool = False, **kwargs):
+    """Cliente de httpx (síncrono o asíncrono) cuyas peticiones pasan por el limitador."""
+    if async_client:
+        return httpx.AsyncClient(transport=AsyncRateLimitedTransport(limiter), **kwargs)
+    return httpx.Client(transport=RateLimitedTransport(limiter), **kwargs)
+
+
+def azure_openai_client(
+    endpoint: str,
+    api_key: str,
+    api_version: str = AZURE_OPENAI_API_VERSION,
+    async_client: bool = False,
+    limiter: Optional[RateLimiter] = None,
+):
+    """
+    Cliente 'AzureOpenAI' (o 'AsyncAzureOpenAI') con el limitador del proceso.
+
+    Con Semantic Kernel: AzureChatCompletion(..., async_client=azure_openai_client(endpoint, api_key, async_client=True)).
+    """
+    from openai import AsyncAzureOpenAI, AzureOpenAI
+
+    client_class = AsyncAzureOpenAI if async_client else AzureOpenAI
+    return client_class(
+        azure_endpoint=endpoint,
+        api_key=api_key,
+        api_version=api_version,
+        http_client=rate_limited_http_client(limiter, async_client=async_client),
+    )
+
+
+# --- Enganche con azure-core (AIProjectClient y project_client.agents) ---
+
+class _Slot:
+    """Hueco de concurrencia de un intento de petición; se libera una sola vez."""
+
+    def __init__(self, limiter: RateLimiter):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter.release()
+
+    def __del__(self):
+        # Si la tarea se cancela, azure-core no llama a 'on_exception' (CancelledError no es una
+        # 'Exception'): el hueco se libera cuando se descarta la petición.
+        self.release()
+
+
+class RateLimitPolicy(SansIOHTTPPolicy):
+    """
+    Política del pipeline de azure-core que pasa cada intento de petición por el limitador.
+
+    Es una política "sans I/O": 'AIProjectClient' reparte la misma instancia entre los pipelines de
+    todos sus subclientes ('agents', 'connections', 'evaluations'...), y azure-core envuelve una
+    política de este tipo en un ejecutor propio por pipeline. Una 'HTTPPolicy' guarda en 'next' el
+    siguiente paso, así que compartida entre pipelines acabaría enviando las peticiones al último.
+    """
+
+    def __init__(self, limiter: Optional[RateLimiter] = None):
+        super().__init__()
+        # El Servicio de Agentes tiene su propia cuota: no gasta la del despliegue de Azure OpenAI.
+        self.limiter = limiter or get_limiter(AGENTS)
+
+    def on_request(self, request):
+        self.limiter.acquire(estimate_request_tokens(request.http_request.body))
+        request.context[_SLOT_KEY] = _Slot(self.limiter)
+
+    def on_response(self, request, response):
+        self.limiter.observe(response.http_response.status_code, response.http_response.headers)
+        self._release(request)
+
+    def on_exception(self, request):
+        self._release(request)
+
+    @staticmethod
+    def _release(request):
+        slot = request.context.pop(_SLOT_KEY, None)
+        if slot is not None:
+            slot.release()
+
+
+class AsyncRateLimitPolicy(RateLimitPolicy):
+    """Versión asíncrona de 'RateLimitPolicy' (para 'azure.ai.projects.aio.AIProjectClient')."""
+
+    async def on_request(self, request):
+        # El ejecutor asíncrono de azure-core espera el resultado de 'on_request' si es una corrutina.
+        await self.limiter.acquire_async(estimate_request_tokens(request.http_request.body))
+        request.context[_SLOT_KEY] = _Slot(self.limiter)
+
+
+_SLOT_KEY = "rate_limit_slot"
+
+
+def azure_pipeline_kwargs(limiter: Optional[RateLimiter] = None, async_client: bool = False) -> Dict:
+    """
+    Argumentos para añadir el limitador al pipeline de un cliente de Azure.
+
+    Se añade como política "por reintento": la política de reintentos de azure-core sigue respetando
+    'retry-after', y cada reintento vuelve a pasar por el limitador.
+
+    Uso:
+        AIProjectClient.from_connection_string(credential=..., conn_str=..., **azure_pipeline_kwargs())
+    """
+    policy = AsyncRateLimitPolicy(limiter) if async_client else RateLimitPolicy(limiter)
+    return {"per_retry_policies": [policy]}
+
+
+def check_pipelines(project_client) -> List[str]:
+    """
+    Comprueba que cada subcliente de 'AIProjectClient' envía sus peticiones por su propio pipeline.
+
+    Recorre la cadena 'next' de las políticas de cada '_clientN._pipeline' hasta el transporte. Si
+    una política con estado se comparte entre pipelines, alguna cadena salta a la de otro subcliente
+    (p. ej. 'connections' acabaría pidiendo un token para el ámbito de 'evaluations').
+
+    Returns:
+        Los nombres de los subclientes cuya cadena está rota (lista vacía si todo está bien).
+    """
+    broken = []
+    for name, client in sorted(vars(project_client).items()):
+        pipeline = getattr(client, "_pipeline", None)
+        policies = getattr(pipeline, "_impl_policies", None)
+        if not name.startswith("_client") or not policies:
+            continue
+        step, visited = policies[0], []
+        while getattr(step, "next", None) is not None and len(visited) <= len(policies):
+            visited.append(step)
+            step = step.next
+        # La cadena debe pasar exactamente por las políticas de este pipeline y acabar en su transporte.
+        if visited != policies or getattr(step, "_sender", None) is not pipeline._transport:
+            broken.append(name)
+    return broken
@@ -0,0 +1,227 @@
+# Evaluación local y segura de expresiones aritméticas, y operaciones vectorizadas con NumPy.
+#
+# El plugin 'Math' de los ejemplos de Semantic Kernel expone una función por operación (Add,
+# Subtract, Multiply, Divide, Sqrt), así que un cálculo de varios pasos obliga al modelo a
+# encadenar una llamada a herramienta por operación, y algo tan simple como "suma 5 y 2" cuesta
+# una ida y vuelta al LLM. Este módulo permite:
+#   - 'evaluate': evaluar una expresión completa (con variables intermedias, p. ej.
+#     "base = 1200 * 1.21; base - 50") en una sola llamada. No usa 'eval': se recorre el árbol
+#     sintáctico y solo se admiten números, operadores aritméticos y un conjunto cerrado de funciones.
+#   - 'to_expression': traducir peticiones sencillas en español ("suma 5 y 2", "raíz cuadrada de 16")
+#     a una expresión, para responderlas en local sin llamar al modelo.
+#   - 'elementwise': aplicar una operación a listas de números con NumPy (versiones vectorizadas
+#     de las funciones del plugin).
+import ast
+import math
+import operator
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+MAX_EXPRESSION_LENGTH = 2000
+MAX_NODES = 500
+MAX_EXPONENT = 1000
+# Dígitos máximos de un resultado entero: así cualquier resultado cabe en un 'float', que es lo que
+# devuelve 'Math.Evaluate'.
+MAX_RESULT_DIGITS = 308
+
+BINARY_OPERATORS: Dict[type, Callable] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+UNARY_OPERATORS: Dict[type, Callable] = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+FUNCTIONS: Dict[str, Callable] = {
+    "sqrt": math.sqrt,
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "log": math.log,
+    "log10": math.log10,
+    "exp": math.exp,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "floor": math.floor,
+    "ceil": math.ceil,
+}
+CONSTANTS: Dict[str, float] = {"pi": math.pi, "e": math.e}
+
+# Operaciones para 'elementwise' (las mismas que las funciones del plugin 'Math').
+VECTOR_OPERATIONS: Dict[str, Callable] = {
+    "add": np.add,
+    "subtract": np.subtract,
+    "multiply": np.multiply,
+    "divide": np.divide,
+    "sqrt": np.sqrt,
+}
+
+Number = Union[int, float]
+
+
+def evaluate(expression: str) -> Number:
+    """
+    Evalúa una expresión aritmética y devuelve su valor.
+
+    Admite números, + - * / // % ** (también '^' y los signos '×' y '÷'), paréntesis, las funciones
+    de FUNCTIONS, las constantes 'pi' y 'e', y varios pasos separados por ';' o saltos de línea con
+    asignaciones a variables ("x = 3 * 4; x + 2"); se devuelve el valor del último paso.
+
+    Raises:
+        ValueError: Si la expresión no es válida, usa algo no permitido o no tiene un resultado numérico
+            real y finito (también si un resultado intermedio es demasiado grande).
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"La expresión supera los {MAX_EXPRESSION_LENGTH} caracteres")
+    source = expression.replace("^", "**").replace("×", "*").replace("÷", "/")
+    try:
+        tree = ast.parse(source, mode="exec")
+    except SyntaxError as e:
+        raise ValueError(f"Expresión no válida: {expression!r}") from e
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise ValueError("La expresión es demasiado larga")
+    if not tree.body:
+        raise ValueError("La expresión está vacía")
+
+    variables: Dict[str, Number] = {}
+    result: Optional[Number] = None
+    for statement in tree.body:
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+            name = statement.targets[0].id
+            if name in FUNCTIONS or name in CONSTANTS:
+                raise ValueError(f"No se puede redefinir '{name}'")
+            result = variables[name] = _evaluate_node(statement.value, variables)
+        elif isinstance(statement, ast.Expr):
+            result = _evaluate_node(statement.value, variables)
+        else:
+            raise ValueError(f"Instrucción no permitida: {ast.dump(statement)[:60]}")
+    return result
+
+
+def _evaluate_node(node: ast.AST, variables: Dict[str, Number]) -> Number:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in variables:
+            return variables[node.id]
+        if node.id in CONSTANTS:
+            return CONSTANTS[node.id]
+        raise ValueError(f"Variable no definida: '{node.id}'")
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        return UNARY_OPERATORS[type(node.op)](_evaluate_node(node.operand, variables))
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        left = _evaluate_node(node.left, variables)
+        right = _evaluate_node(node.right, variables)
+        if isinstance(node.op, ast.Pow):
+            if abs(right) > MAX_EXPONENT:
+                raise ValueError(f"El exponente no puede superar {MAX_EXPONENT}")
+            # Se comprueba antes de calcular: con enteros, la potencia construiría el número entero.
+            if abs(left) > 1 and right > 0 and math.log10(abs(left)) * right > MAX_RESULT_DIGITS:
+                raise ValueError(f"El resultado supera los {MAX_RESULT_DIGITS} dígitos")
+        try:
+            return _check_result(BINARY_OPERATORS[type(node.op)](left, right))
+        except ZeroDivisionError as e:
+            raise ValueError("División entre cero") from e
+        except OverflowError as e:
+            raise ValueError("El resultado es demasiado grande") from e
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+        arguments = [_evaluate_node(argument, variables) for argument in node.args]
+        try:
+            result = FUNCTIONS[node.func.id](*arguments)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Argumentos no válidos para {node.func.id}: {e}") from e
+        except OverflowError as e:
+            raise ValueError(f"El resultado de {node.func.id} es demasiado grande") from e
+        return _check_result(result)
+    raise ValueError(f"Elemento no permitido en la expresión: {type(node).__name__}")
+
+
+def _check_result(value) -> Number:
+    """Rechaza los resultados que no son números reales finitos o enteros con demasiados dígitos."""
+    if isinstance(value, complex):
+        # Por ejemplo, (-8) ** 0.5.
+        raise ValueError("El resultado no es un número real")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError("El resultado no es un número finito")
+    if isinstance(value, int) and value.bit_length() > MAX_RESULT_DIGITS * math.log2(10):
+        raise ValueError(f"El resultado supera los {MAX_RESULT_DIGITS} dígitos")
+    return value
+
+
+# Peticiones sencillas en español que se traducen a una expresión (los números se capturan tal cual).
+_NUMBER = r"(-?\d+(?:[.,]\d+)?)"
+_SPANISH_PATTERNS = [
+    (re.compile(rf"^(?:suma|sumar|añade|añadir)\s+{_NUMBER}((?:\s*(?:,|y|más|mas|\+)\s*{_NUMBER})+)$"), "sum"),
+    (re.compile(rf"^(?:resta|restar)\s+{_NUMBER}\s+(?:de|a)\s+{_NUMBER}$"), "{1} - {0}"),
+    (re.compile(rf"^(?:resta|restar)\s+{_NUMBER}\s+(?:y|menos|-)\s+{_NUMBER}$"), "{0} - {1}"),
+    (re.compile(rf"^(?:multiplica|multiplicar)\s+{_NUMBER}\s+(?:por|y|x|\*)\s+{_NUMBER}$"), "{0} * {1}"),
+    (re.compile(rf"^(?:divide|dividir)\s+{_NUMBER}\s+(?:entre|por|y|/)\s+{_NUMBER}$"), "{0} / {1}"),
+    (re.compile(rf"^(?:calcula\s+)?(?:la\s+)?ra[ií]z\s+cuadrada\s+de\s+{_NUMBER}$"), "sqrt({0})"),
+]
+
+
+def to_expression(text: str) -> Optional[str]:
+    """
+    Devuelve la expresión aritmética equivalente a la petición, o None si no es un cálculo sencillo.
+
+    Reconoce expresiones escritas directamente ("(5 + 2) * 3", "cuánto es 7*6") y órdenes como
+    "suma 5 y 2", "resta 3 de 10", "multiplica 4 por 2.5", "divide 9 entre 3" o "raíz cuadrada de 16".
+    También devuelve None si la expresión no se puede evaluar ("divide 9 entre 0").
+    """
+    normalized = " ".join(text.strip().lower().rstrip("?.!").lstrip("¿¡").split())
+    normalized = re.sub(r"^(?:cu[aá]nto\s+es|calcula|resuelve)\s+", "", normalized)
+    expression = None
+    for pattern, template in _SPANISH_PATTERNS:
+        match = pattern.match(normalized)
+        if match:
+            if template == "sum":
+                numbers = [match.group(1)] + re.findall(_NUMBER, match.group(2))
+                expression = " + ".join(number.replace(",", ".") for number in numbers)
+            else:
+                expression = template.format(*(group.replace(",", ".") for group in match.groups()))
+            break
+    else:
+        if re.fullmatch(r"[\d\s.+\-*/()^×÷%]+", normalized) and re.search(r"\d", normalized):
+            expression = normalized
+    if expression is None:
+        return None
+    try:
+        evaluate(expression)
+    except ValueError:
+        return None
+    return expression
+
+
+def elementwise(operation: str, numbers1: Sequence[float], numbers2: Optional[Sequence[float]] = None) -> List[float]:
+    """
+    Aplica una operación elemento a elemento con NumPy.
+
+    Args:
+        operation: 'add', 'subtract', 'multiply', 'divide' o 'sqrt'.
+        numbers1: Primera lista de números.
+        numbers2: Segunda lista (no se usa con 'sqrt'); puede tener un solo número, que se aplica a todos.
+
+    Raises:
+        ValueError: Si las longitudes no son compatibles o algún resultado no es finito (p. ej. división entre cero).
+    """
+    if operation not in VECTOR_OPERATIONS:
+        raise ValueError(f"Operación desconocida: {operation}")
+    first = np.asarray(numbers1, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if operation == "sqrt":
+            result = VECTOR_OPERATIONS[operation](first)
+        else:
+            second = np.asarray(numbers2 if numbers2 is not None else [], dtype=float)
+            try:
+                result = VECTOR_OPERATIONS[operation](first, second)
+            except ValueError as e:
+                raise ValueError(f"Las listas tienen longitudes incompatibles: {first.size} y {second.size}") from e
+    if not np.all(np.isfinite(result)):
+        raise ValueError("Algún resultado no es un número finito (división entre cero o raíz de un negativo)")
+    return result.tolist()
@@ -0,0 +1,151 @@
+# Invocación en streaming con métricas de latencia (tiempo hasta el primer token).
+#
+# Los ejemplos esperaban el resultado completo de 'kernel.invoke' o de 'agent.get_response' antes
+# de mostrar nada, así que el usuario veía la respuesta de golpe al final. Con 'stream_function'
+# (funciones del kernel) y 'stream_agent' (agentes) los fragmentos se devuelven a medida que llegan
+# y, para cada llamada, se registra:
+#   - el tiempo hasta el primer token (TTFT),
+#   - la latencia entre fragmentos consecutivos (ITL),
+#   - la duración total y el número de fragmentos.
+# Las métricas se acumulan por nombre de función o de agente en un registro ('metrics' por defecto)
+# que muestra percentiles con 'summary()'.
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelArguments, KernelFunction
+
+
+@dataclass
+class StreamMetrics:
+    """Métricas de una llamada en streaming."""
+    name: str
+    ttft: Optional[float] = None  # Segundos hasta el primer fragmento con texto (None si no hubo texto).
+    total: float = 0.0
+    chunks: int = 0
+    inter_chunk: List[float] = field(default_factory=list)
+
+    @property
+    def mean_itl(self) -> Optional[float]:
+        return statistics.fmean(self.inter_chunk) if self.inter_chunk else None
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class MetricsRegistry:
+    """Registro de métricas de streaming por función o agente (conserva las últimas 'max_calls' llamadas de cada uno)."""
+
+    def __init__(self, max_calls: int = 1000):
+        self.max_calls = max_calls
+        self._calls: Dict[str, Deque[StreamMetrics]] = {}
+
+    def record(self, metrics: StreamMetrics):
+        self._calls.setdefault(metrics.name, deque(maxlen=self.max_calls)).append(metrics)
+
+    def calls(self, name: str) -> List[StreamMetrics]:
+        return list(self._calls.get(name, []))
+
+    def summary(self) -> str:
+        """Tabla con TTFT (p50/p95), latencia media entre fragmentos y duración total (p50) por nombre."""
+        lines = [f"{'Función / agente':<36}{'Llamadas':>9}{'TTFT p50':>10}{'TTFT p95':>10}{'ITL media':>11}{'Total p50':>11}"]
+        for name, calls in sorted(self._calls.items()):
+            ttfts = [call.ttft for call in calls if call.ttft is not None]
+            itls = [itl for call in calls for itl in call.inter_chunk]
+            totals = [call.total for call in calls]
+            ttft_p50 = f"{_percentile(ttfts, 0.5):.2f}s" if ttfts else "-"
+            ttft_p95 = f"{_percentile(ttfts, 0.95):.2f}s" if ttfts else "-"
+            itl = f"{statistics.fmean(itls) * 1000:.0f}ms" if itls else "-"
+            lines.append(f"{name:<36}{len(calls):>9}{ttft_p50:>10}{ttft_p95:>10}{itl:>11}{_percentile(totals, 0.5):>10.2f}s")
+        return "\n".join(lines)
+
+    def clear(self):
+        self._calls = {}
+
+
+# Registro compartido por defecto.
+metrics = MetricsRegistry()
+
+
+async def timed_stream(
+    source: AsyncIterable,
+    name: str,
+    text: Callable[[object], str] = str,
+    registry: Optional[MetricsRegistry] = None,
+) -> AsyncIterator:
+    """
+    Devuelve los elementos de 'source' sin modificarlos y registra sus métricas al terminar.
+
+    Args:
+        source: Iterable asíncrono de fragmentos.
+        name: Nombre con el que se registran las métricas.
+        text: Extrae el texto de un fragmento (los fragmentos sin texto no cuentan para TTFT ni ITL).
+        registry: Registro de métricas (por defecto, 'metrics').
+    """
+    call = StreamMetrics(name)
+    start = time.perf_counter()
+    last = None
+    try:
+        async for chunk in source:
+            if text(chunk):
+                now = time.perf_counter()
+                if last is None:
+                    call.ttft = now - start
+                else:
+                    call.inter_chunk.append(now - last)
+                last = now
+                call.chunks += 1
+            yield chunk
+    finally:
+        call.total = time.perf_counter() - start
+        (registry or metrics).record(call)
+
+
+def _chunk_text(chunk) -> str:
+    # 'invoke_stream' devuelve listas de contenidos en streaming (una por opción de respuesta).
+    if isinstance(chunk, list):
+        return "".join(str(content) for content in chunk[:1])
+    return str(chunk)
+
+
+async def stream_function(
+    kernel: Kernel,
+    function: KernelFunction,
+    arguments: Optional[KernelArguments] = None,
+    registry: Optional[MetricsRegistry] = None,
+) -> AsyncIterator[str]:
+    """
+    Invoca una función del kernel en streaming y devuelve el texto de cada fragmento.
+
+    Uso:
+        async for text in stream_function(kernel, plugin["greeting"], KernelArguments(name="Raul")):
+            print(text, end="", flush=True)
+        print(metrics.summary())
+    """
+    source = kernel.invoke_stream(function, arguments or KernelArguments())
+    async for chunk in timed_stream(source, function.fully_qualified_name, _chunk_text, registry):
+        text = _chunk_text(chunk)
+        if text:
+            yield text
+
+
+async def stream_agent(agent, messages, thread=None, registry: Optional[MetricsRegistry] = None, **kwargs) -> AsyncIterator:
+    """
+    Equivalente en streaming a 'agent.get_response': devuelve cada 'AgentResponseItem' en cuanto llega.
+
+    El texto del fragmento está en 'item.content' y el hilo, en 'item.thread', para continuar la
+    conversación.
+
+    Uso:
+        async for item in stream_agent(agent, "Hola", thread=thread):
+            print(item.content, end="", flush=True)
+            thread = item.thread
+    """
+    source = agent.invoke_stream(messages=messages, thread=thread, **kwargs)
+    async for item in timed_stream(source, agent.name, lambda item: str(item.content), registry):
+        yield item
@@ -0,0 +1,22 @@
+# Normalización de texto para las claves de las cachés de respuestas y la búsqueda léxica.
+#
+# Las cachés reconocen como la misma pregunta "¿Qué hoteles hay en Las Vegas?" y
+# "que hoteles hay en las vegas": la clave se calcula sobre el texto normalizado. La usan
+# 'grounding_cache.py', '008_RAG_Azure_AI_Search/semantic_cache.py',
+# '009_Code_Interpreter/result_cache.py' y, para dividir los textos en términos, la búsqueda
+# BM25 de '008_RAG_Azure_AI_Search/local_search.py' y 'tool_router.py'. 'fold_text' solo quita
+# tildes y mayúsculas, para quien necesita conservar algún signo (la caché de planes de '011'
+# conserva los '$' de las variables).
+import re
+import unicodedata
+
+
+def fold_text(text: str) -> str:
+    """Minúsculas y sin tildes, conservando la puntuación y los espacios."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sin tildes, sin signos de puntuación y con espacios simples."""
+    return " ".join(re.findall(r"\w+", fold_text(text)))
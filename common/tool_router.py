@@ -0,0 +1,191 @@
+# Selección de herramientas según la consulta para agentes con muchas herramientas.
+#
+# Cuando un agente tiene todas sus herramientas en un único 'ToolSet' (funciones, Bing, OpenAPI,
+# Intérprete de Código), cada ejecución paga en tokens de prompt las definiciones de todas ellas
+# (la especificación OpenAPI completa, por ejemplo) y el modelo tarda más en planificar.
+# 'ToolRouter' puntúa cada herramienta frente al mensaje del usuario con un clasificador local
+# barato (coincidencia de raíces de palabras ponderada por IDF sobre la descripción y palabras
+# clave de cada herramienta, y opcionalmente similitud de embeddings) y devuelve solo el
+# subconjunto relevante, que se pasa a la ejecución en lugar del conjunto completo.
+# El agente se sigue creando con todas las herramientas; la selección se aplica por ejecución.
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+from azure.ai.projects.models import ToolSet
+
+from common.text import normalize_text
+
+# Palabras vacías frecuentes (en español e inglés) que no aportan información para elegir herramientas.
+STOPWORDS = {
+    "que", "cual", "cuales", "como", "para", "por", "con", "sin", "sobre", "una", "uno", "unos", "unas",
+    "los", "las", "del", "al", "el", "la", "lo", "de", "en", "es", "son", "esta", "este", "ese", "esa",
+    "mi", "me", "te", "se", "su", "sus", "hay", "y", "o", "a", "the", "and", "for", "with", "what", "is",
+}
+
+
+def stems(text: str) -> List[str]:
+    """Minúsculas, sin tildes, sin palabras vacías y recortadas a 6 caracteres (raíz aproximada)."""
+    return [word[:6] for word in normalize_text(text).split() if len(word) > 2 and word not in STOPWORDS]
+
+
+def estimate_tokens(definitions: Iterable) -> int:
+    """Estimación aproximada de los tokens que ocupan las definiciones de herramientas (~4 caracteres por token)."""
+    serialized = json.dumps(
+        [definition.as_dict() if hasattr(definition, "as_dict") else definition for definition in definitions],
+        ensure_ascii=False,
+    )
+    return len(serialized) // 4
+
+
+@dataclass
+class RegisteredTool:
+    """Herramienta registrada en el enrutador."""
+    name: str
+    tool: object
+    description: str
+    always: bool = False
+    stems: List[str] = field(default_factory=list)
+    vector: Optional[List[float]] = None
+
+
+@dataclass
+class RoutingDecision:
+    """Resultado de enrutar un mensaje."""
+    selected: List[str]
+    scores: Dict[str, float]
+    toolset: ToolSet
+    tokens_full: int
+    tokens_selected: int
+    route_seconds: float
+    fallback: bool = False
+
+    @property
+    def definitions(self) -> List:
+        """Definiciones de las herramientas seleccionadas (para el parámetro 'tools' de una ejecución)."""
+        return self.toolset.definitions
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_full - self.tokens_selected
+
+    def report(self) -> str:
+        saved_ratio = self.tokens_saved / self.tokens_full if self.tokens_full else 0.0
+        scores = ", ".join(f"{name}={score:.2f}" for name, score in self.scores.items())
+        return (
+            f"🧭 Herramientas: {self.selected}{' (sin coincidencias: se usan todas)' if self.fallback else ''} | "
+            f"puntuaciones: {scores} | tokens de definiciones ~{self.tokens_selected}/{self.tokens_full} "
+            f"(ahorro ~{self.tokens_saved}, {saved_ratio:.0%}) | enrutado en {self.route_seconds * 1000:.2f} ms"
+        )
+
+
+class ToolRouter:
+    """
+    Elige, para cada mensaje, el subconjunto de herramientas relevante.
+
+    Uso:
+        router = ToolRouter()
+        router.register("usuarios", FunctionTool(user_functions), keywords=["usuario", "email"])
+        router.register("bing", bing, description="Búsqueda en internet", keywords=["web", "noticias"])
+        decision = router.route(mensaje)
+        run = project_client.agents.create_and_process_run(..., toolset=decision.toolset)
+        print(decision.report())
+    """
+
+    def __init__(self, min_score: float = 0.05, embed: Optional[Callable[[List[str]], List[List[float]]]] = None, embed_threshold: float = 0.35):
+        """
+        Args:
+            min_score: Puntuación léxica mínima (0-1) para seleccionar una herramienta.
+            embed: Función opcional que convierte textos en embeddings; si se indica, una herramienta
+                también se selecciona cuando la similitud coseno supera 'embed_threshold'.
+            embed_threshold: Similitud coseno mínima con embeddings.
+        """
+        self.min_score = min_score
+        self.embed = embed
+        self.embed_threshold = embed_threshold
+        self.tools: Dict[str, RegisteredTool] = {}
+
+    def register(self, name: str, tool, description: Optional[str] = None, keywords: Iterable[str] = (), always: bool = False):
+        """
+        Registra una herramienta.
+
+        Args:
+            name: Nombre con el que aparece en los informes.
+            tool: Herramienta del SDK (FunctionTool, BingGroundingTool, OpenApiTool, CodeInterpreterTool...).
+            description: Descripción de lo que hace; si es None se extrae de sus definiciones.
+            keywords: Palabras clave adicionales que suelen aparecer en las consultas que la necesitan.
+            always: Si True, se incluye en todas las ejecuciones.
+        """
+        description = description or self._describe(tool)
+        text = " ".join([name, description, *keywords])
+        self.tools[name] = RegisteredTool(name=name, tool=tool, description=description, always=always, stems=stems(text))
+        if self.embed is not None:
+            self.tools[name].vector = self.embed([text])[0]
+
+    def route(self, message: str) -> RoutingDecision:
+        """Devuelve las herramientas relevantes para el mensaje y el ahorro estimado de tokens."""
+        start = time.perf_counter()
+        scores = self._lexical_scores(message)
+        selected = [name for name, entry in self.tools.items() if entry.always or scores[name] >= self.min_score]
+        if self.embed is not None:
+            query = self.embed([message])[0]
+            for name, entry in self.tools.items():
+                similarity = self._cosine(query, entry.vector)
+                scores[name] = max(scores[name], similarity)
+                if similarity >= self.embed_threshold and name not in selected:
+                    selected.append(name)
+
+        # Si ninguna herramienta encaja, se usan todas: es preferible no ahorrar a dejar al agente sin la herramienta necesaria.
+        fallback = not any(not self.tools[name].always for name in selected)
+        if fallback:
+            selected = list(self.tools)
+
+        toolset = ToolSet()
+        for name in selected:
+            toolset.add(self.tools[name].tool)
+        all_definitions = [definition for entry in self.tools.values() for definition in entry.tool.definitions]
+        return RoutingDecision(
+            selected=selected,
+            scores=scores,
+            toolset=toolset,
+            tokens_full=estimate_tokens(all_definitions),
+            tokens_selected=estimate_tokens(toolset.definitions),
+            route_seconds=time.perf_counter() - start,
+            fallback=fallback,
+        )
+
+    # --- Implementación ---
+
+    def _lexical_scores(self, message: str) -> Dict[str, float]:
+        """Fracción (ponderada por IDF) de las raíces del mensaje que aparecen en la descripción de cada herramienta."""
+        query = set(stems(message))
+        vocabularies = {name: set(entry.stems) for name, entry in self.tools.items()}
+        total = len(vocabularies)
+        idf = {
+            stem: math.log(1 + total / (1 + sum(stem in vocabulary for vocabulary in vocabularies.values())))
+            for stem in query
+        }
+        weight = sum(idf.values()) or 1.0
+        return {name: sum(idf[stem] for stem in query & vocabulary) / weight for name, vocabulary in vocabularies.items()}
+
+    @staticmethod
+    def _describe(tool) -> str:
+        """Construye una descripción a partir de las definiciones de la herramienta (funciones y OpenAPI)."""
+        parts = []
+        for definition in tool.definitions:
+            data = definition.as_dict() if hasattr(definition, "as_dict") else dict(definition)
+            parts.append(data.get("type", ""))
+            for key in ("function", "openapi"):
+                if key in data:
+                    parts.extend([data[key].get("name", ""), data[key].get("description", "")])
+        return " ".join(part.replace("_", " ") for part in parts if part)
+
+    @staticmethod
+    def _cosine(a: Optional[List[float]], b: Optional[List[float]]) -> float:
+        if not a or not b:
+            return 0.0
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return dot / norm if norm else 0.0